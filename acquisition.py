@@ -0,0 +1,306 @@
+# acquisition.py
+"""Live acquisition of A samples from a sensor.
+
+A background thread reads A samples from a pluggable source (serial port,
+TCP socket, or a file/pipe stand-in), converts each batch to C with the
+current CalibrationModel and writes both into a fixed-size NumPy ring
+buffer. Consumers (the GUI) poll the buffer at their own frame rate instead
+of being signalled per sample. With a ReadingStore (timeseries.py) every
+batch is also appended to disk with its channel and model version.
+Qt-free, so it also runs headless.
+"""
+import socket
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CAPACITY = 1 << 20
+READ_BLOCK = 64 * 1024
+
+
+# -----------------------------
+# Ring buffer
+# -----------------------------
+class RingBuffer:
+    """Fixed-size buffer of (t, A, C) samples; the oldest samples are overwritten."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = int(capacity)
+        self.t = np.zeros(self.capacity, dtype=np.float64)
+        self.a = np.zeros(self.capacity, dtype=np.float64)
+        self.c = np.zeros(self.capacity, dtype=np.float64)
+        self.total = 0  # samples written since creation/clear
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+
+    def extend(self, t, a, c):
+        """Append arrays of equal length (t may be a scalar for the whole batch)."""
+        a = np.asarray(a, dtype=np.float64)
+        n = len(a)
+        if n == 0:
+            return
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+        c = np.asarray(c, dtype=np.float64)
+        if n > self.capacity:
+            t, a, c = t[-self.capacity:], a[-self.capacity:], c[-self.capacity:]
+            skipped = n - self.capacity
+            n = self.capacity
+        else:
+            skipped = 0
+        with self._lock:
+            start = (self.total + skipped) % self.capacity
+            first = min(n, self.capacity - start)
+            for dst, src in ((self.t, t), (self.a, a), (self.c, c)):
+                dst[start:start + first] = src[:first]
+                dst[:n - first] = src[first:]
+            self.total += skipped + n
+
+    def latest(self, n=None):
+        """Copies of the last n samples (all buffered ones by default), oldest first."""
+        with self._lock:
+            size = min(self.total, self.capacity)
+            n = size if n is None else min(int(n), size)
+            end = self.total % self.capacity
+            idx = (np.arange(end - n, end)) % self.capacity
+            return self.t[idx], self.a[idx], self.c[idx]
+
+
+# -----------------------------
+# Sample sources
+# -----------------------------
+def _parse_text(pending, data):
+    """Split complete lines off (pending + data); returns (values, new_pending)."""
+    buf = pending + data
+    cut = buf.rfind(b'\n')
+    if cut < 0:
+        return np.empty(0), buf
+    head, rest = buf[:cut], buf[cut + 1:]
+    head = head.replace(b',', b' ').replace(b';', b' ')
+    try:
+        values = np.array(head.split(), dtype=np.float64)
+    except ValueError:
+        # rare garbage on the line: fall back to per-token parsing
+        vals = []
+        for tok in head.split():
+            try:
+                vals.append(float(tok))
+            except ValueError:
+                pass
+        values = np.array(vals, dtype=np.float64)
+    return values, rest
+
+
+class SampleSource:
+    """Base class: read() returns a float64 array of A samples (possibly empty),
+    or None once the source is exhausted.
+
+    fmt is 'text' (numbers separated by newlines/whitespace/commas) or a NumPy
+    dtype string for raw binary samples ('<f4', '<f8', ...).
+    """
+
+    def __init__(self, fmt='text'):
+        self.fmt = fmt
+        self._pending = b''
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _read_bytes(self):
+        raise NotImplementedError
+
+    def read(self):
+        data = self._read_bytes()
+        if data is None:
+            if self.fmt == 'text' and self._pending.strip():
+                # last line without a trailing newline: flush it, end on the next read
+                values, self._pending = _parse_text(self._pending, b'\n')
+                return values
+            return None
+        if self.fmt == 'text':
+            values, self._pending = _parse_text(self._pending, data)
+            return values
+        dtype = np.dtype(self.fmt)
+        buf = self._pending + data
+        usable = len(buf) - len(buf) % dtype.itemsize
+        self._pending = buf[usable:]
+        return np.frombuffer(buf[:usable], dtype=dtype).astype(np.float64)
+
+
+class FileSource(SampleSource):
+    """Local file or named pipe. With follow=True, waits for more data at EOF
+    (like ``tail -f``); otherwise the source ends at EOF."""
+
+    def __init__(self, path, fmt='text', follow=False, poll_interval=0.01):
+        super().__init__(fmt)
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self._f = None
+
+    def open(self):
+        self._f = open(self.path, 'rb', buffering=0)
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _read_bytes(self):
+        data = self._f.read(READ_BLOCK)
+        if data:
+            return data
+        if not self.follow:
+            return None
+        time.sleep(self.poll_interval)
+        return b''
+
+
+class TcpSource(SampleSource):
+    """TCP client; the sensor (or a bridge) streams samples over the socket."""
+
+    def __init__(self, host, port, fmt='text', timeout=0.2):
+        super().__init__(fmt)
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+        self._sock = None
+
+    def open(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=5.0)
+        self._sock.settimeout(self.timeout)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _read_bytes(self):
+        try:
+            data = self._sock.recv(READ_BLOCK)
+        except socket.timeout:
+            return b''
+        return data if data else None
+
+
+class SerialSource(SampleSource):
+    """Serial port via pyserial (optional dependency, imported on open())."""
+
+    def __init__(self, port, baudrate=115200, fmt='text', timeout=0.05):
+        super().__init__(fmt)
+        self.port = port
+        self.baudrate = int(baudrate)
+        self.timeout = timeout
+        self._ser = None
+
+    def open(self):
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("Для чтения с COM-порта нужен пакет pyserial (pip install pyserial)")
+        self._ser = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+
+    def close(self):
+        if self._ser is not None:
+            self._ser.close()
+            self._ser = None
+
+    def _read_bytes(self):
+        return self._ser.read(max(1, min(self._ser.in_waiting, READ_BLOCK)))
+
+
+def source_from_spec(spec, fmt='text'):
+    """Build a source from a short spec string:
+
+    ``file:PATH`` (``follow:PATH`` to wait at EOF), ``tcp:HOST:PORT``,
+    ``serial:PORT[:BAUD]``. A bare path is treated as ``file:``.
+    """
+    kind, _, rest = spec.partition(':')
+    if kind == 'tcp':
+        host, _, port = rest.rpartition(':')
+        return TcpSource(host or 'localhost', port, fmt=fmt)
+    if kind == 'serial':
+        port, _, baud = rest.partition(':')
+        return SerialSource(port, int(baud) if baud else 115200, fmt=fmt)
+    if kind == 'follow':
+        return FileSource(rest, fmt=fmt, follow=True)
+    if kind == 'file':
+        return FileSource(rest, fmt=fmt)
+    return FileSource(spec, fmt=fmt)
+
+
+# -----------------------------
+# Reader thread
+# -----------------------------
+class Acquisition(threading.Thread):
+    """Reads batches from a source, converts A → C and fills a RingBuffer.
+
+    The model can be swapped at any time with set_model(); each batch is
+    converted with whichever model is current when it arrives. An optional
+    store keeps every batch on disk under ``channel``.
+
+    Samples of a batch get timestamps spread evenly from the previous batch
+    (or the start) to its arrival, or 1/sample_rate apart ending at the
+    arrival when the instrument's rate is known.
+    """
+
+    def __init__(self, source, model, buffer=None, store=None, channel=0, sample_rate=None):
+        super().__init__(name="acquisition", daemon=True)
+        self.source = source
+        self.model = model
+        self.buffer = buffer if buffer is not None else RingBuffer()
+        self.store = store
+        self.channel = channel
+        self.sample_rate = sample_rate
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def set_model(self, model):
+        self.model = model
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def _timestamps(self, t_prev, t, n):
+        if self.sample_rate:
+            return t - np.arange(n - 1, -1, -1) / float(self.sample_rate)
+        return t_prev + (t - t_prev) * np.arange(1, n + 1) / n
+
+    def run(self):
+        try:
+            self.source.open()
+            t_prev = time.time()
+            while not self._stop_event.is_set():
+                a = self.source.read()
+                if a is None:
+                    break
+                if len(a) == 0:
+                    continue
+                model = self.model
+                c = model.predict_C(a)
+                if c is None:
+                    c = np.full(len(a), np.nan)
+                now = time.time()
+                t = self._timestamps(t_prev, now, len(a))
+                t_prev = now
+                self.buffer.extend(t, a, c)
+                if self.store is not None:
+                    self.store.append(t, self.channel, a, c, self.store.model_version(model))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.source.close()
+            self._stop_event.set()
@@ -1,19 +1,61 @@
 # signal_correlation.py
+import time
+STARTUP_T0 = time.perf_counter()  # reference for the startup timing (--startup-timing)
+import os
 import sys
 import math
-import json
 import numpy as np
 
+from calibration import CalibrationTable, CalibrationModel, RunningFit, fit_curve
+from csv_loader import load_points, LoadCancelled
+from acquisition import Acquisition, source_from_spec
+from timeseries import ReadingStore
+from table_model import CalibrationTableModel
+from points_model import PointListModel
+from calib_format import detach, load_table, save_table
+from cache import LRUCache
+from robust import METHODS, METHOD_OLS
+from models import FAMILIES, FAMILY_AUTO, FAMILY_LINEAR
+from uncertainty import analytic_intervals, bootstrap_intervals, DEFAULT_N_BOOT
+from lod import LODScatter
+from recalibration import RecursiveFit, DriftMonitor, DEFAULT_FORGETTING
+import jobs
+import tracing
+from tracing import traced
+
+# GUI refresh rate for live acquisition and the window it averages over
+ACQ_POLL_FPS = 20
+ACQ_AVERAGE_SAMPLES = 1000
+# minimum delay between plot redraws (~one frame at 60 Hz)
+REDRAW_INTERVAL_MS = 16
+CURVE_CACHE_SIZE = 128
+# bootstrap work per click (resamples × points), run on the GUI thread;
+# beyond it fewer resamples, then analytic only
+CI_BOOTSTRAP_BUDGET = 2_000_000
+CI_MIN_BOOT = 200
+# refresh period of the trace overlay (F12)
+TRACE_OVERLAY_MS = 250
+# --startup-timing output of windowed builds, which have no stderr
+STARTUP_LOG = os.path.join(os.path.expanduser("~"), "calib_startup_timing.log")
+# how often the GUI polls a running file job for progress/completion
+JOB_POLL_MS = 50
+# stored readings and results (timeseries.py) and their channels there
+READINGS_DIR = os.environ.get("CALIB_READINGS") or os.path.join(os.path.expanduser("~"), ".calib_readings")
+CHANNEL_MANUAL = 0  # 'Вычислить C'
+CHANNEL_STREAM = 1  # live acquisition
+CALIBRATION_FILE_FILTER = "JSON Files (*.json);;Binary calibration (*.scal);;All files (*)"
+
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QPushButton, QComboBox, QCheckBox, QLineEdit, QListWidget,
-    QFileDialog, QMessageBox, QGroupBox, QTextEdit, QSizePolicy,
-    QTabWidget, QTableWidget, QTableWidgetItem, QInputDialog, QSpinBox
+    QPushButton, QComboBox, QCheckBox, QLineEdit, QListView,
+    QFileDialog, QMessageBox, QGroupBox, QTextEdit,
+    QTabWidget, QTableView, QInputDialog, QDoubleSpinBox, QProgressDialog, QShortcut
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont, QKeySequence
 
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+# matplotlib is imported when the plots are built, after the first paint (see _build_plots)
+STARTUP_T_IMPORTS = time.perf_counter()
 
 # -----------------------------
 # Main application
@@ -25,40 +67,43 @@ class CorrelationApp(QWidget):
         self.resize(1100, 720)
 
         # -------------------------
-        # встроенные "заводские" значения (твоё текущее состояние)
+        # данные: встроенные "заводские" значения и активная (редактируемая) копия
         # -------------------------
-        self._builtin_symbols = ['Ceftr', 'Cef', 'Cefot', 'Cefur', 'Strep', 'Neo', 'Sulf']
-        self._builtin_c_values = [0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1]
-        self._builtin_valueWater = [
-            [0.9, 1.03, 0.9, 0.8, 0.7, 0.8, 1],
-            [1.3, 1.46, 1.1, 1, 1, 1.26666666666667, 1.5],
-            [1.63, 1.88, 1.56, 1.3, 1.3, 1.66666666666667, 1.8],
-            [2.03, 2.31, 1.96, 1.6, 1.7, 2.13333333333333, 2.2],
-            [2.39, 2.79, 2.32, 1.9, 2, 2.5, 2.5],
-            [2.63, 3.2, 2.87, 2.3, 2.3, 3.06666666666667, 2.72],
-        ]
-        self._builtin_valueNoWater = [
-            [2.4, 1.76, 1.7, 1.8, 2.1, 1.7, 2.3],
-            [2.7, 2.19, 2, 2.1, 2.5, 2.16666666666667, 2.8],
-            [3, 2.62, 2.3, 2.4, 2.8, 2.56666666666667, 3.1],
-            [3.4, 3.07, 2.7, 2.7, 3.1, 3.033, 3.5],
-            [3.8, 3.54, 3.1, 3, 3.5, 3.4, 3.8],
-            [4.1, 4, 3.7, 3.4, 3.8, 3.96, 4],
-        ]
-
-        # активные (редактируемые) данные — по умолчанию заводские копии
-        self.symbols = list(self._builtin_symbols)
-        self.c_values = list(self._builtin_c_values)
-        # deep copy arrays of arrays
-        self.valueWater = [list(r) for r in self._builtin_valueWater]
-        self.valueNoWater = [list(r) for r in self._builtin_valueNoWater]
+        self._builtin_table = CalibrationTable.builtin()
+        self.table = self._builtin_table.copy()
 
         # текущее состояние для расчётов
-        self.selected_symbol = self.symbols[0] if self.symbols else ''
+        self.selected_symbol = self.table.symbols[0] if self.table.symbols else ''
         self.with_water = False
-        self.selected_points = []  # list of (A, C)
-        self.k = None
-        self.b = None
+        self.selected_points = np.empty((0, 2))  # (n, 2) array of (A, C)
+        self.fit_method = METHOD_OLS
+        self.fit_family = FAMILY_LINEAR
+        # refitted model of the loaded points: (method, family, points array, model)
+        self._points_model = None
+        self.points_from_table = True  # False after a CSV load
+        self.point_fit = RunningFit()  # running fit of loaded (non-table) points
+        # online recalibration (recalibration.py): RLS over the points in order,
+        # started from the current points when switched on or when they are replaced
+        self.online_mode = False
+        self.online_fit = None
+        self.drift = None
+        self.model = CalibrationModel()
+        # plotted arrays per table curve, keyed by CalibrationTable.curve_key()
+        self.curve_cache = LRUCache(CURVE_CACHE_SIZE)
+
+        # file job in progress (see _run_job); the GUI polls it like the acquisition buffer
+        self._job = None
+
+        # live acquisition (see acquisition.py); the GUI polls its ring buffer
+        self.acquisition = None
+        self._acq_last_total = 0
+        self._acq_timer = QTimer(self)
+        self._acq_timer.setInterval(int(1000 / ACQ_POLL_FPS))
+        self._acq_timer.timeout.connect(self.poll_acquisition)
+
+        # readings store, opened on the first result to keep (see _readings_store)
+        self.readings = None
+        self._readings_error = None
 
         # --- UI: вкладки ---
         main_layout = QVBoxLayout(self)
@@ -76,13 +121,24 @@ class CorrelationApp(QWidget):
         # --- build calc tab ---
         self._build_calc_tab()
 
-        # --- build editor tab ---
-        self._build_editor_tab()
+        # --- editor tab: built when first shown ---
+        self.table_model = None
+        self.tabs = tabs
+        tabs.currentChanged.connect(self._on_tab_changed)
+
+        # --- instrumentation overlay (see tracing.py) ---
+        self._build_trace_overlay()
 
         # --- initial populate and plot ---
         self.populate_points_from_tables()
         self.update_regression_and_plots()
 
+        # startup milestones (seconds since STARTUP_T0), printed with --startup-timing
+        self.startup_timing = {"imports": STARTUP_T_IMPORTS - STARTUP_T0,
+                               "window": time.perf_counter() - STARTUP_T0}
+        self.report_startup = False
+        self._painted = False
+
     # --------------------
     # Build calculation tab (left controls + right plots)
     # --------------------
@@ -100,7 +156,7 @@ class CorrelationApp(QWidget):
         h1 = QHBoxLayout()
         lbl_sym = QLabel("Вещество:")
         self.combo = QComboBox()
-        self.combo.addItems(self.symbols)
+        self.combo.addItems(self.table.symbols)
         self.combo.currentTextChanged.connect(self.on_symbol_change)
         h1.addWidget(lbl_sym)
         h1.addWidget(self.combo)
@@ -111,8 +167,51 @@ class CorrelationApp(QWidget):
         self.chk_water = QCheckBox("С учётом воды")
         self.chk_water.stateChanged.connect(self.on_water_toggle)
         h2.addWidget(self.chk_water)
+        # fit method (least squares or a robust estimator)
+        h2.addWidget(QLabel("Метод:"))
+        self.combo_method = QComboBox()
+        for key, label in METHODS.items():
+            self.combo_method.addItem(label, key)
+        self.combo_method.currentIndexChanged.connect(self.on_method_change)
+        h2.addWidget(self.combo_method)
+        # curve family; "авто" picks the lowest AIC per curve
+        h2.addWidget(QLabel("Модель:"))
+        self.combo_family = QComboBox()
+        for key, label in FAMILIES.items():
+            self.combo_family.addItem(label, key)
+        self.combo_family.addItem("авто (AIC)", FAMILY_AUTO)
+        self.combo_family.currentIndexChanged.connect(self.on_family_change)
+        h2.addWidget(self.combo_family)
         ctrl_layout.addLayout(h2)
 
+        # online recalibration: reference samples update k, b by RLS, older ones fade out
+        h_rls = QHBoxLayout()
+        self.chk_online = QCheckBox("Онлайн-перекалибровка (RLS)")
+        self.chk_online.stateChanged.connect(self.on_online_toggle)
+        h_rls.addWidget(self.chk_online)
+        h_rls.addWidget(QLabel("λ:"))
+        self.spin_forgetting = QDoubleSpinBox()
+        self.spin_forgetting.setDecimals(4)
+        self.spin_forgetting.setRange(0.9, 1.0)
+        self.spin_forgetting.setSingleStep(0.001)
+        self.spin_forgetting.setValue(DEFAULT_FORGETTING)
+        self.spin_forgetting.setToolTip("Коэффициент забывания: память ≈ 1/(1 − λ) эталонов; 1 — без забывания")
+        self.spin_forgetting.valueChanged.connect(self.on_forgetting_change)
+        h_rls.addWidget(self.spin_forgetting)
+        h_rls.addWidget(QLabel("Эталон A:"))
+        self.edit_ref_A = QLineEdit()
+        h_rls.addWidget(self.edit_ref_A)
+        h_rls.addWidget(QLabel("C:"))
+        self.edit_ref_C = QLineEdit()
+        self.edit_ref_C.returnPressed.connect(self.on_add_reference)
+        h_rls.addWidget(self.edit_ref_C)
+        btn_ref = QPushButton("Добавить")
+        btn_ref.clicked.connect(self.on_add_reference)
+        h_rls.addWidget(btn_ref)
+        ctrl_layout.addLayout(h_rls)
+        self.lbl_drift = QLabel("")
+        ctrl_layout.addWidget(self.lbl_drift)
+
         # Load CSV (kept)
         h3 = QHBoxLayout()
         self.btn_load = QPushButton("Загрузить CSV (A,C)")
@@ -120,9 +219,36 @@ class CorrelationApp(QWidget):
         h3.addWidget(self.btn_load)
         ctrl_layout.addLayout(h3)
 
-        # points list
-        ctrl_layout.addWidget(QLabel("Текущие точки (A, C):"))
-        self.lst_points = QListWidget()
+        # points list: a view over the points array, rows formatted only when visible
+        pts_header = QHBoxLayout()
+        pts_header.addWidget(QLabel("Текущие точки (A, C):"))
+        self.lbl_points_count = QLabel("")
+        pts_header.addWidget(self.lbl_points_count)
+        pts_header.addStretch(1)
+        pts_header.addWidget(QLabel("Сортировка:"))
+        self.combo_sort = QComboBox()
+        for key, label in (("none", "как загружено"), ("a_asc", "A ↑"), ("a_desc", "A ↓"),
+                           ("c_asc", "C ↑"), ("c_desc", "C ↓")):
+            self.combo_sort.addItem(label, key)
+        self.combo_sort.currentIndexChanged.connect(self.on_point_sort_change)
+        pts_header.addWidget(self.combo_sort)
+        ctrl_layout.addLayout(pts_header)
+
+        filt_layout = QHBoxLayout()
+        self.edit_filter = {}
+        for key, label in (("a_min", "A от"), ("a_max", "до"), ("c_min", "C от"), ("c_max", "до")):
+            filt_layout.addWidget(QLabel(label))
+            edit = QLineEdit()
+            edit.setPlaceholderText("—")
+            edit.editingFinished.connect(self.on_point_filter_change)
+            filt_layout.addWidget(edit)
+            self.edit_filter[key] = edit
+        ctrl_layout.addLayout(filt_layout)
+
+        self.points_model = PointListModel(self.selected_points, parent=self)
+        self.lst_points = QListView()
+        self.lst_points.setUniformItemSizes(True)
+        self.lst_points.setModel(self.points_model)
         ctrl_layout.addWidget(self.lst_points)
 
         # equation and inverse input
@@ -144,6 +270,9 @@ class CorrelationApp(QWidget):
 
         self.lbl_result = QLabel("C = ")
         ctrl_layout.addWidget(self.lbl_result)
+        self.lbl_ci = QLabel("")
+        self.lbl_ci.setWordWrap(True)
+        ctrl_layout.addWidget(self.lbl_ci)
 
         # ввод C → вычисление A
         inv_layout2 = QHBoxLayout()
@@ -162,6 +291,22 @@ class CorrelationApp(QWidget):
         self.lbl_result_A = QLabel("A = ")
         ctrl_layout.addWidget(self.lbl_result_A)
 
+        # live acquisition: source spec + start/stop, status polled by a timer
+        acq_layout = QHBoxLayout()
+        acq_layout.addWidget(QLabel("Поток A:"))
+        self.edit_source = QLineEdit()
+        self.edit_source.setPlaceholderText("file:путь | follow:путь | tcp:host:port | serial:COM3:115200")
+        acq_layout.addWidget(self.edit_source)
+        self.btn_acq = QPushButton("Старт")
+        self.btn_acq.clicked.connect(self.on_acquisition_toggle)
+        acq_layout.addWidget(self.btn_acq)
+        btn_history = QPushButton("История...")
+        btn_history.clicked.connect(self.show_history)
+        acq_layout.addWidget(btn_history)
+        ctrl_layout.addLayout(acq_layout)
+
+        self.lbl_acq = QLabel("Измерение: остановлено")
+        ctrl_layout.addWidget(self.lbl_acq)
 
         # Apply editor changes quickly button
         btn_apply_editor = QPushButton("Применить последние изменения из редактора")
@@ -187,12 +332,49 @@ class CorrelationApp(QWidget):
             "3) На вкладке 'Расчёт' выбери вещество и режим (с/без воды). Графики и уравнение обновятся автоматически.\n"
             "4) Введи значение A и нажми 'Вычислить C' — приложение использует найденную регрессию A = k·log10(C) + b и выдаст C.\n"
             "5) Можно импортировать/экспортировать таблицы в JSON на вкладке редактора.\n"
+            "6) F12 — включить профилирование и показать разбивку последнего действия по времени; "
+            "Shift+F12 — сохранить трассу (Chrome trace).\n"
+            "7) Вычисленные C и потоковые измерения сохраняются на диск (каталог CALIB_READINGS, "
+            "по умолчанию ~/.calib_readings); 'История...' показывает их за любой период.\n"
+            "8) 'Онлайн-перекалибровка (RLS)': каждый добавленный эталон (A при известном C) сразу уточняет k и b, "
+            "старые эталоны забываются (λ); при уходе k или b за допуск появится предупреждение о дрейфе.\n"
         )
         info_layout.addWidget(info_text)
         info.setLayout(info_layout)
         left.addWidget(info, stretch=1)
 
         # --- графики справа ---
+        # built after the first paint (see _build_plots): matplotlib and the two
+        # figures are the slowest part of the startup
+        self.plot_area = QWidget()
+        self._plot_layout = QVBoxLayout(self.plot_area)
+        self._plot_layout.setContentsMargins(0, 0, 0, 0)
+        self._plot_layout.addWidget(QLabel("Загрузка графиков..."), alignment=Qt.AlignCenter)
+        self._plots_ready = False
+        right.addWidget(self.plot_area, stretch=1)
+
+        # bursts of symbol/water changes collapse into one redraw per frame
+        self._redraw_timer = QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.setInterval(REDRAW_INTERVAL_MS)
+        self._redraw_timer.timeout.connect(self._redraw_plots)
+
+        layout.addLayout(left, 30)
+        layout.addLayout(right, 70)
+
+        self.calc_tab.setLayout(layout)
+
+    # --------------------
+    # Plots (built after the first paint)
+    # --------------------
+    @traced("ui.build_plots")
+    def _build_plots(self):
+        if self._plots_ready:
+            return
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+        from matplotlib.figure import Figure
+
         # Figure A vs C
         self.fig1 = Figure(figsize=(5, 4))
         self.canvas1 = FigureCanvas(self.fig1)
@@ -201,6 +383,10 @@ class CorrelationApp(QWidget):
         self.ax1.set_xlabel("C")
         self.ax1.set_ylabel("A")
         self.ax1.grid(True)
+        # artists are created once and updated in place by _redraw_plots()
+        self.sc1 = self.ax1.scatter([], [], label="данные", zorder=3)
+        self.line1, = self.ax1.plot([], [], label="регрессия", linewidth=2)
+        self.leg1 = self.ax1.legend()
 
         # Figure A vs -log10(C)
         self.fig2 = Figure(figsize=(5, 4))
@@ -210,14 +396,33 @@ class CorrelationApp(QWidget):
         self.ax2.set_xlabel("-log10(C)")
         self.ax2.set_ylabel("A")
         self.ax2.grid(True)
-
-        right.addWidget(self.canvas1, stretch=1)
-        right.addWidget(self.canvas2, stretch=1)
-
-        layout.addLayout(left, 30)
-        layout.addLayout(right, 70)
-
-        self.calc_tab.setLayout(layout)
+        self.sc2 = self.ax2.scatter([], [], label="данные", zorder=3)
+        self.line2, = self.ax2.plot([], [], label="линейная регрессия", linewidth=2)
+        self.leg2 = self.ax2.legend()
+
+        # large point sets are drawn at one marker per pixel (or as a density
+        # image), recomputed for the visible range on zoom/pan
+        self.lod1 = LODScatter(self.ax1, self.sc1, log_x=True)
+        self.lod2 = LODScatter(self.ax2, self.sc2)
+        self._lod_timer = QTimer(self)
+        self._lod_timer.setSingleShot(True)
+        self._lod_timer.setInterval(REDRAW_INTERVAL_MS)
+        self._lod_timer.timeout.connect(self._update_lod)
+        for ax in (self.ax1, self.ax2):
+            ax.callbacks.connect('xlim_changed', self._on_view_changed)
+            ax.callbacks.connect('ylim_changed', self._on_view_changed)
+
+        # canvas paints are spans of their own (they run from the Qt event loop)
+        self.canvas1.draw = traced("plot.canvas1.draw")(self.canvas1.draw)
+        self.canvas2.draw = traced("plot.canvas2.draw")(self.canvas2.draw)
+
+        self._plot_layout.takeAt(0).widget().deleteLater()  # the placeholder label
+        self._plot_layout.addWidget(NavigationToolbar(self.canvas1, self))
+        self._plot_layout.addWidget(self.canvas1, stretch=1)
+        self._plot_layout.addWidget(NavigationToolbar(self.canvas2, self))
+        self._plot_layout.addWidget(self.canvas2, stretch=1)
+        self._plots_ready = True
+        self._redraw_plots()
 
     # --------------------
     # Build editor tab
@@ -249,10 +454,13 @@ class CorrelationApp(QWidget):
         btns_rowcol.addWidget(btn_col_add)
         btns_rowcol.addWidget(btn_col_del)
 
-        # Table widget
-        self.table_widget = QTableWidget()
-        self.table_widget.setEditTriggers(QTableWidget.DoubleClicked | QTableWidget.SelectedClicked | QTableWidget.EditKeyPressed)
-        self.table_widget.cellChanged.connect(self._on_table_cell_changed)
+        # Table view over the NumPy arrays (cells are formatted lazily by the model)
+        self.table_model = CalibrationTableModel(self.table, with_water=False, parent=self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        self.table_view.setEditTriggers(QTableView.DoubleClicked | QTableView.SelectedClicked | QTableView.EditKeyPressed)
+        self.table_view.horizontalHeader().sectionDoubleClicked.connect(self._on_symbol_header_double_clicked)
+        self.table_view.verticalHeader().sectionDoubleClicked.connect(self._on_c_header_double_clicked)
 
         # Buttons for save/apply/reset/export/import
         bottom_row = QHBoxLayout()
@@ -275,54 +483,30 @@ class CorrelationApp(QWidget):
 
         layout.addLayout(top_row)
         layout.addLayout(btns_rowcol)
-        layout.addWidget(self.table_widget, stretch=1)
+        layout.addWidget(self.table_view, stretch=1)
         layout.addLayout(bottom_row)
 
         self.editor_tab.setLayout(layout)
 
-        # fill table initially with 'Без учета воды'
-        self._load_table_into_widget(which='no_water')
-
-        # guard variable to prevent recursive cellChanged handling while populating
-        self._suspend_table_change = False
-
     # -------------------------
     # Editor helpers
     # -------------------------
+    def _on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.editor_tab:
+            self._ensure_editor()
+
+    def _ensure_editor(self):
+        """Build the editor tab on first use (it shows self.table as of then)."""
+        if self.table_model is None:
+            self._build_editor_tab()
+
+    @traced("ui.load_table_into_widget")
     def _load_table_into_widget(self, which='no_water'):
-        """Load either 'no_water' or 'with_water' table into QTableWidget for editing."""
-        self._suspend_table_change = True
-        if which == 'with_water':
-            table = self.valueWater
-        else:
-            table = self.valueNoWater
-
-        rows = len(self.c_values)
-        cols = len(self.symbols)
-        self.table_widget.clear()
-        self.table_widget.setRowCount(rows)
-        self.table_widget.setColumnCount(cols)
-
-        # set horizontal headers as symbols
-        for j, sym in enumerate(self.symbols):
-            it = QTableWidgetItem(str(sym))
-            it.setFlags(it.flags() | Qt.ItemIsEditable)
-            self.table_widget.setHorizontalHeaderItem(j, it)
-
-        # fill rows: show C as leftmost (we'll show C in vertical header)
-        for i, c_val in enumerate(self.c_values):
-            # vertical header = C value
-            self.table_widget.setVerticalHeaderItem(i, QTableWidgetItem(str(c_val)))
-            for j in range(cols):
-                val = ''
-                try:
-                    val = table[i][j]
-                except Exception:
-                    val = ''
-                item = QTableWidgetItem("" if val is None else str(val))
-                self.table_widget.setItem(i, j, item)
-
-        self._suspend_table_change = False
+        """Show either 'no_water' or 'with_water' table of self.table in the editor view."""
+        if self.table_model is None:
+            return  # not built yet; _build_editor_tab() starts from self.table
+        self.table_model.set_table(self.table)
+        self.table_model.set_condition(which == 'with_water')
 
     def on_compute_A(self):
         """Вычисление A по введённому C."""
@@ -334,26 +518,32 @@ class CorrelationApp(QWidget):
             QMessageBox.warning(self, "Ошибка", "Введите корректное значение C (> 0)")
             return
 
-        if self.k is None or self.b is None:
+        if not self.model.is_valid:
             QMessageBox.warning(self, "Ошибка", "Сначала выберите вещество — нет регрессии.")
             return
 
-        A = self.k * math.log10(C) + self.b
+        A = self.model.predict_A(C)
         self.lbl_result_A.setText(f"A = {A:.6f}")
 
 
+    @traced("ui.on_editor_table_switch")
     def on_editor_table_switch(self, idx):
-        which = 'no_water' if idx == 0 else 'with_water'
-        self._load_table_into_widget(which=which)
+        # both tables live in the model; switching keeps unsaved edits of each
+        self.table_model.set_condition(idx == 1)
+
+    def _on_symbol_header_double_clicked(self, col):
+        old = self.table_model.headerData(col, Qt.Horizontal)
+        text, ok = QInputDialog.getText(self, "Переименовать вещество", "Новое имя вещества:", text=old)
+        if ok and not self.table_model.setHeaderData(col, Qt.Horizontal, text):
+            QMessageBox.warning(self, "Ошибка", "Имя вещества не может быть пустым.")
 
-    def _on_table_cell_changed(self, row, col):
-        # ignore while populating programmatically
-        if getattr(self, '_suspend_table_change', False):
+    def _on_c_header_double_clicked(self, row):
+        if self.table_model.is_quality_row(row):
             return
-        # if header was edited via double click on header, that goes through different path;
-        # here handle cell changes (A values)
-        # nothing to do instantly — saved on Save button or Apply
-        pass
+        old = self.table_model.headerData(row, Qt.Vertical)
+        text, ok = QInputDialog.getText(self, "Изменить C", "Новое значение C:", text=old)
+        if ok and not self.table_model.setHeaderData(row, Qt.Vertical, text):
+            QMessageBox.warning(self, "Ошибка", "Неправильное значение C.")
 
     def editor_add_row(self):
         # prompt for new C value
@@ -366,29 +556,20 @@ class CorrelationApp(QWidget):
             QMessageBox.warning(self, "Ошибка", "Неправильное значение C.")
             return
         # add to c_values and add default zeros to both tables
-        insert_at = len(self.c_values)
-        self.c_values.append(c_val)
-        for tbl in (self.valueWater, self.valueNoWater):
-            # ensure row length = current columns
-            new_row = [0.0 for _ in range(len(self.symbols))]
-            tbl.append(new_row)
+        self.table.add_row(c_val)
         # reload editor view for current table
         self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
 
     def editor_delete_selected_row(self):
-        row = self.table_widget.currentRow()
-        if row < 0:
+        row = self.table_view.currentIndex().row()
+        if row < 0 or self.table_model.is_quality_row(row):
             QMessageBox.information(self, "Удаление строки", "Выберите строку для удаления (клик по строке).")
             return
-        confirm = QMessageBox.question(self, "Удалить строку", f"Удалить строку с C={self.c_values[row]}?", QMessageBox.Yes | QMessageBox.No)
+        confirm = QMessageBox.question(self, "Удалить строку", f"Удалить строку с C={self.table.c_values[row]}?", QMessageBox.Yes | QMessageBox.No)
         if confirm != QMessageBox.Yes:
             return
-        # remove row
-        self.c_values.pop(row)
-        # remove corresponding row in both tables
-        for tbl in (self.valueWater, self.valueNoWater):
-            if row < len(tbl):
-                tbl.pop(row)
+        # remove row (C value and corresponding row in both tables)
+        self.table.delete_row(row)
         self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
 
     def editor_add_column(self):
@@ -396,119 +577,33 @@ class CorrelationApp(QWidget):
         text, ok = QInputDialog.getText(self, "Добавить столбец", "Введите имя вещества (например New):", text="New")
         if not ok:
             return
-        name = text.strip() or f"col{len(self.symbols)+1}"
-        # append symbol
-        self.symbols.append(name)
-        # add default values to each row in both tables
-        for tbl in (self.valueWater, self.valueNoWater):
-            # if table has shorter rows, extend; otherwise append
-            for i in range(len(self.c_values)):
-                if i < len(tbl):
-                    tbl[i].append(0.0)
-                else:
-                    # row missing for some reason
-                    tbl.append([0.0 for _ in range(len(self.symbols))])
+        name = text.strip() or f"col{len(self.table.symbols)+1}"
+        # append symbol with default values in both tables
+        self.table.add_column(name)
         # reload editor
         self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
         # update combo in calc tab
         self._refresh_symbol_combo()
 
     def editor_delete_selected_column(self):
-        col = self.table_widget.currentColumn()
+        col = self.table_view.currentIndex().column()
         if col < 0:
             QMessageBox.information(self, "Удаление столбца", "Выберите столбец (клик по заголовку или ячейке).")
             return
-        confirm = QMessageBox.question(self, "Удалить столбец", f"Удалить столбец '{self.symbols[col]}' ?", QMessageBox.Yes | QMessageBox.No)
+        confirm = QMessageBox.question(self, "Удалить столбец", f"Удалить столбец '{self.table.symbols[col]}' ?", QMessageBox.Yes | QMessageBox.No)
         if confirm != QMessageBox.Yes:
             return
         # remove symbol and remove column entries in tables
-        self.symbols.pop(col)
-        for tbl in (self.valueWater, self.valueNoWater):
-            for row in tbl:
-                if col < len(row):
-                    row.pop(col)
+        self.table.delete_column(col)
         self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
         self._refresh_symbol_combo()
 
     def editor_save_changes(self):
-        """Save changes from the editor widget into the internal arrays (but do not auto-apply to calc)."""
-        # read headers (symbols)
-        headers = []
-        for j in range(self.table_widget.columnCount()):
-            it = self.table_widget.horizontalHeaderItem(j)
-            name = it.text() if it is not None else f"col{j+1}"
-            headers.append(str(name))
-        # read vertical headers as c_values
-        cvals = []
-        for i in range(self.table_widget.rowCount()):
-            vhi = self.table_widget.verticalHeaderItem(i)
-            if vhi is not None and vhi.text() != '':
-                try:
-                    cv = float(vhi.text().replace(',', '.'))
-                except Exception:
-                    # if vertical header isn't numeric, check if first column holds C? We'll keep previous c_values
-                    cv = self.c_values[i] if i < len(self.c_values) else 0.0
-            else:
-                # try to read from first column cell as fallback
-                item0 = self.table_widget.item(i, 0)
-                if item0:
-                    try:
-                        cv = float(item0.text().replace(',', '.'))
-                    except Exception:
-                        cv = self.c_values[i] if i < len(self.c_values) else 0.0
-                else:
-                    cv = self.c_values[i] if i < len(self.c_values) else 0.0
-            cvals.append(float(cv))
-
-        # read table values
-        rows = self.table_widget.rowCount()
-        cols = self.table_widget.columnCount()
-        tbl_vals = []
-        for i in range(rows):
-            row_vals = []
-            for j in range(cols):
-                item = self.table_widget.item(i, j)
-                if item is None:
-                    row_vals.append(0.0)
-                else:
-                    text = item.text().strip()
-                    try:
-                        row_vals.append(float(text.replace(',', '.')))
-                    except Exception:
-                        # leave as 0 if cannot parse
-                        row_vals.append(0.0)
-            tbl_vals.append(row_vals)
-
-        # commit to internal structures depending on selected editor table
-        # We update symbols and c_values globally
-        self.symbols = headers
-        self.c_values = cvals
-        # ensure both tables have the correct shape: rows x cols
-        rows = len(self.c_values)
-        cols = len(self.symbols)
-        def normalize(tbl):
-            # ensure number of rows
-            while len(tbl) < rows:
-                tbl.append([0.0 for _ in range(cols)])
-            while len(tbl) > rows:
-                tbl.pop()
-            # ensure each row length
-            for r in tbl:
-                while len(r) < cols:
-                    r.append(0.0)
-                while len(r) > cols:
-                    r.pop()
-        # replace edited table only; but ensure other table has consistent shape
-        if self.tbl_selector.currentIndex() == 0:
-            # saved 'no water' table
-            self.valueNoWater = [list(r) for r in tbl_vals]
-            normalize(self.valueNoWater)
-            normalize(self.valueWater)
-        else:
-            # saved 'with water' table
-            self.valueWater = [list(r) for r in tbl_vals]
-            normalize(self.valueWater)
-            normalize(self.valueNoWater)
+        """Save changes from the editor into the internal arrays (but do not auto-apply to calc).
+
+        Only the cells and headers edited since the last save are written.
+        """
+        self.table_model.commit()
 
         QMessageBox.information(self, "Сохранено", "Изменения сохранены во внутренние данные. Чтобы использовать их в расчётах, нажмите 'Применить к расчёту'.")
 
@@ -520,68 +615,64 @@ class CorrelationApp(QWidget):
         if confirm != QMessageBox.Yes:
             return
         # reset active data to builtin copies
-        self.symbols = list(self._builtin_symbols)
-        self.c_values = list(self._builtin_c_values)
-        self.valueWater = [list(r) for r in self._builtin_valueWater]
-        self.valueNoWater = [list(r) for r in self._builtin_valueNoWater]
+        self.table = self._builtin_table.copy()
         # reload editor and calc
         self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
         self._refresh_symbol_combo()
         QMessageBox.information(self, "Сброшено", "Данные восстановлены к заводским значениям.")
 
     def editor_export_json(self):
-        fname, _ = QFileDialog.getSaveFileName(self, "Сохранить JSON", "tables_export.json", "JSON Files (*.json);;All files (*)")
+        fname, _ = QFileDialog.getSaveFileName(self, "Сохранить JSON", "tables_export.json", CALIBRATION_FILE_FILTER)
         if not fname:
             return
-        out = {
-            "symbols": self.symbols,
-            "c_values": self.c_values,
-            "valueWater": self.valueWater,
-            "valueNoWater": self.valueNoWater
-        }
-        try:
-            with open(fname, 'w', encoding='utf-8') as f:
-                json.dump(out, f, indent=2, ensure_ascii=False)
+
+        def done(_):
             QMessageBox.information(self, "Экспорт", f"Таблицы экспортированы в {fname}")
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка экспорта", str(e))
+
+        # the job reads self.table on the worker thread: the editor stays disabled
+        # until it finishes (the progress dialog only appears after 300 ms), and a
+        # memory map of the target file is dropped here rather than on the worker
+        detach(self.table, fname)
+        self.editor_tab.setEnabled(False)
+        self._run_job("Экспорт", "Запись файла...", save_table, (self.table, fname), done,
+                      error_title="Ошибка экспорта",
+                      on_finished=lambda: self.editor_tab.setEnabled(True))
 
     def editor_import_json(self):
-        fname, _ = QFileDialog.getOpenFileName(self, "Открыть JSON", "", "JSON Files (*.json);;All files (*)")
+        fname, _ = QFileDialog.getOpenFileName(self, "Открыть JSON", "", CALIBRATION_FILE_FILTER)
         if not fname:
             return
-        try:
-            with open(fname, 'r', encoding='utf-8') as f:
-                obj = json.load(f)
-            # basic validation
-            if not all(k in obj for k in ("symbols", "c_values", "valueWater", "valueNoWater")):
-                QMessageBox.warning(self, "Ошибка", "JSON должен содержать keys: symbols, c_values, valueWater, valueNoWater")
-                return
-            self.symbols = list(obj["symbols"])
-            self.c_values = [float(x) for x in obj["c_values"]]
-            self.valueWater = [list(map(float, row)) for row in obj["valueWater"]]
-            self.valueNoWater = [list(map(float, row)) for row in obj["valueNoWater"]]
+
+        def done(table):
+            self.table = table
             # reload widget
             self._load_table_into_widget(which='with_water' if self.tbl_selector.currentIndex() else 'no_water')
             self._refresh_symbol_combo()
             QMessageBox.information(self, "Импорт", "JSON успешно импортирован.")
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка импорта", str(e))
+
+        def failed(e):
+            if isinstance(e, (ValueError, KeyError, TypeError)):
+                # basic validation: schema keys, binary header
+                QMessageBox.warning(self, "Ошибка", str(e))
+            else:
+                QMessageBox.critical(self, "Ошибка импорта", str(e))
+
+        self._run_job("Импорт", "Чтение файла...", load_table, (fname,), done, on_error=failed)
 
     def _refresh_symbol_combo(self):
         # refresh combo options in calc tab while preserving selection if possible
         current = self.combo.currentText()
         self.combo.blockSignals(True)
         self.combo.clear()
-        self.combo.addItems(self.symbols)
+        self.combo.addItems(self.table.symbols)
         # restore selection
-        if current in self.symbols:
+        if current in self.table.symbols:
             self.combo.setCurrentText(current)
             self.selected_symbol = current
         else:
-            if self.symbols:
+            if self.table.symbols:
                 self.combo.setCurrentIndex(0)
-                self.selected_symbol = self.symbols[0]
+                self.selected_symbol = self.table.symbols[0]
         self.combo.blockSignals(False)
         # repopulate points and plots, since symbols changed
         self.populate_points_from_tables()
@@ -594,9 +685,9 @@ class CorrelationApp(QWidget):
         # this simply re-populates the calculation data from (possibly modified) internal arrays
         # and redraws everything
         # ensure selected_symbol exists
-        if self.selected_symbol not in self.symbols:
-            if self.symbols:
-                self.selected_symbol = self.symbols[0]
+        if self.selected_symbol not in self.table.symbols:
+            if self.table.symbols:
+                self.selected_symbol = self.table.symbols[0]
         # update combobox list
         self._refresh_symbol_combo()
         self.populate_points_from_tables()
@@ -606,172 +697,512 @@ class CorrelationApp(QWidget):
     # -------------------------
     # data & UI handlers for calc
     # -------------------------
+    @traced("ui.populate_points_from_tables")
     def populate_points_from_tables(self):
         """Fill selected_points using current symbol and with_water flag."""
-        self.selected_points = []
-        if self.selected_symbol not in self.symbols:
-            if self.symbols:
-                self.selected_symbol = self.symbols[0]
+        self.selected_points = np.empty((0, 2))
+        if self.selected_symbol not in self.table.symbols:
+            if self.table.symbols:
+                self.selected_symbol = self.table.symbols[0]
             else:
                 return
-        idx = self.symbols.index(self.selected_symbol)
-        table = self.valueWater if self.with_water else self.valueNoWater
-        # safe handling: if table smaller, pad
-        for i, c in enumerate(self.c_values):
-            a = 0.0
-            try:
-                a = table[i][idx]
-            except Exception:
-                a = 0.0
-            try:
-                self.selected_points.append((float(a), float(c)))
-            except Exception:
-                # skip non-numeric rows
-                pass
+        self.selected_points = self.table.points(self.selected_symbol, self.with_water)
+        self.points_from_table = True
+        self.online_fit = None  # restarted from the new points
+        # cell edits of the shown curve then update its fit in O(1)
+        self.table.track(self.selected_symbol, self.with_water)
         self.refresh_point_list()
 
+    @traced("ui.refresh_point_list")
     def refresh_point_list(self):
-        self.lst_points.clear()
-        for a, c in self.selected_points:
-            self.lst_points.addItem(f"A={a}    C={c}")
+        self.points_model.set_points(self.selected_points)
+        self._update_points_count()
+
+    def _update_points_count(self):
+        shown, total = self.points_model.rowCount(), self.points_model.total
+        self.lbl_points_count.setText(f"{total}" if shown == total else f"{shown} из {total}")
 
+    def on_point_sort_change(self, index):
+        self.points_model.set_sort(self.combo_sort.itemData(index))
+
+    def on_point_filter_change(self):
+        bounds = {}
+        for key, edit in self.edit_filter.items():
+            text = edit.text().strip().replace(',', '.')
+            try:
+                bounds[key] = float(text) if text else None
+            except ValueError:
+                edit.clear()
+                bounds[key] = None
+        a_range = (bounds["a_min"], bounds["a_max"])
+        c_range = (bounds["c_min"], bounds["c_max"])
+        self.points_model.set_filter(a_range, c_range)
+        self._update_points_count()
+
+    @traced("ui.on_symbol_change")
     def on_symbol_change(self, txt):
         self.selected_symbol = txt
         self.populate_points_from_tables()
         self.update_regression_and_plots()
 
+    @traced("ui.on_water_toggle")
     def on_water_toggle(self, state):
         self.with_water = bool(state == Qt.Checked)
         self.populate_points_from_tables()
         self.update_regression_and_plots()
 
+    @traced("ui.on_method_change")
+    def on_method_change(self, index):
+        self.fit_method = self.combo_method.itemData(index)
+        self.update_regression_and_plots()
+
+    @traced("ui.on_family_change")
+    def on_family_change(self, index):
+        self.fit_family = self.combo_family.itemData(index)
+        self.update_regression_and_plots()
+
     def load_csv(self):
         fname, _ = QFileDialog.getOpenFileName(self, "Выбрать CSV файл", "", "CSV Files (*.csv);;All Files (*)")
         if not fname:
             return
-        try:
-            pts = []
-            with open(fname, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if ',' in line:
-                        parts = [p.strip() for p in line.split(',') if p.strip() != '']
-                    else:
-                        parts = [p.strip() for p in line.split() if p.strip() != '']
-                    if len(parts) < 2:
-                        continue
-                    a = float(parts[0])
-                    c = float(parts[1])
-                    pts.append((a, c))
+
+        def done(pts):
             if len(pts) < 2:
                 QMessageBox.warning(self, "Ошибка", "В файле должно быть как минимум 2 пары A,C.")
                 return
             self.selected_points = pts
+            self.points_from_table = False
+            self.point_fit = RunningFit.from_points(pts)
+            self.online_fit = None
             self.refresh_point_list()
             self.update_regression_and_plots()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка чтения файла", str(e))
+
+        self._run_job("Загрузка CSV", "Чтение файла...", load_points, (fname,), done,
+                      error_title="Ошибка чтения файла")
+
+    # ---------- background file I/O ----------
+    def _run_job(self, title, label, fn, args, on_done, on_error=None, error_title="Ошибка",
+                 on_finished=None):
+        """Run fn(*args) on the I/O pool (see jobs.py) behind a cancellable progress dialog.
+
+        The event loop keeps running, so the window never freezes. The job is
+        polled every JOB_POLL_MS; when it has finished, on_done(result) runs
+        here on the GUI thread and applies the result in one step. A cancelled
+        job applies nothing; errors go to on_error(exc) or a message box.
+        on_finished() runs first in every case (done, failed or cancelled).
+        """
+        job = jobs.submit(fn, *args)
+        dialog = QProgressDialog(label, "Отмена", 0, 1000, self)
+        dialog.setWindowTitle(title)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(300)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(job.cancel)
+        timer = QTimer(self)
+        timer.setInterval(JOB_POLL_MS)
+
+        def poll():
+            if not job.done():
+                dialog.setValue(int(job.progress * 1000))
+                return
+            timer.stop()
+            dialog.canceled.disconnect(job.cancel)
+            dialog.close()
+            dialog.deleteLater()
+            timer.deleteLater()
+            self._job = None
+            if on_finished is not None:
+                on_finished()
+            try:
+                result = job.result()
+            except LoadCancelled:
+                return
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+                else:
+                    QMessageBox.critical(self, error_title, str(e))
+                return
+            try:
+                on_done(result)
+            except Exception as e:
+                QMessageBox.critical(self, error_title, str(e))
+
+        timer.timeout.connect(poll)
+        timer.start()
+        self._job = job
+        return job
 
     # ---------- math: regression and inverse ----------
+    @traced("fit.compute_regression")
     def compute_regression(self):
-        """Compute linear regression A = k * log10(C) + b using numpy.polyfit"""
-        if not self.selected_points or len(self.selected_points) < 2:
-            self.k = None
-            self.b = None
+        """Compute linear regression A = k * log10(C) + b (see CalibrationModel.fit).
+
+        Points taken from the tables are looked up in the table's batch fit of all
+        symbols, so switching symbol/condition does not refit anything; loaded
+        points use their running fit, which append_points() keeps up to date.
+        Robust methods and nonlinear families refit loaded points only when
+        the point array changes. In online mode the model is the RLS fit of
+        the points in order (linear only), see recalibration.py.
+        """
+        if self.online_mode:
+            if self.online_fit is None:
+                self._start_online()
+            self.model = self.online_fit.model()
+            return
+        if self.table.method != self.fit_method:
+            self.table.set_method(self.fit_method)
+        if self.table.family != self.fit_family:
+            self.table.set_family(self.fit_family)
+        if self.points_from_table and self.selected_symbol in self.table.symbols:
+            self.model = self.table.model(self.selected_symbol, self.with_water)
+        elif self.fit_method == METHOD_OLS and self.fit_family == FAMILY_LINEAR:
+            self.model = self.point_fit.model()
+        else:
+            key = (self.fit_method, self.fit_family)
+            cached = self._points_model
+            if cached is None or cached[:2] != key or cached[2] is not self.selected_points:
+                model = fit_curve(self.selected_points, method=self.fit_method, family=self.fit_family)
+                cached = self._points_model = key + (self.selected_points, model)
+            self.model = cached[3]
+
+    def append_points(self, points):
+        """Append (A, C) pairs to the loaded points; the fit is updated, not redone."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.points_from_table:
+            self.point_fit = RunningFit.from_points(self.selected_points)
+            self.points_from_table = False
+        self.selected_points = np.vstack((self.selected_points, points))
+        self.point_fit.add_many(points[:, 0], points[:, 1])
+        if self.online_fit is not None:
+            self.online_fit.add_many(points[:, 0], points[:, 1])
+            self.drift.check(self.online_fit.k, self.online_fit.b)
+        self.refresh_point_list()
+        self.update_regression_and_plots()
+
+    # ---------- online recalibration ----------
+    def _start_online(self):
+        """RLS over the current points; drift is measured from where it starts."""
+        self.online_fit = RecursiveFit.from_points(self.selected_points, self.spin_forgetting.value())
+        self.drift = DriftMonitor(np.nan if self.online_fit.k is None else self.online_fit.k,
+                                  np.nan if self.online_fit.b is None else self.online_fit.b)
+
+    @traced("ui.on_online_toggle")
+    def on_online_toggle(self, state):
+        self.online_mode = state == Qt.Checked
+        self.online_fit = None
+        self.drift = None
+        self.update_regression_and_plots()
+
+    def on_forgetting_change(self, value):
+        if self.online_fit is not None:
+            self.online_fit.forgetting = value  # applies to the samples that follow
+            self.update_regression_and_plots()
+
+    def on_add_reference(self):
+        """A reference sample (A measured at a known C): one O(1) update of the online fit."""
+        try:
+            A = float(self.edit_ref_A.text().replace(",", "."))
+            C = float(self.edit_ref_C.text().replace(",", "."))
+            if C <= 0 or not np.isfinite(A):
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка ввода", "Введите A и C > 0 эталонного образца.")
             return
-        A = np.array([p[0] for p in self.selected_points], dtype=float)
-        C = np.array([p[1] for p in self.selected_points], dtype=float)
-        # ignore non-positive C
-        mask = C > 0
-        if mask.sum() < 2:
-            self.k = None
-            self.b = None
+        self.append_points([[A, C]])
+        self.edit_ref_A.clear()
+        self.edit_ref_C.clear()
+
+    def _update_drift_label(self):
+        drift = self.drift
+        if not self.online_mode or drift is None or not np.isfinite(drift.k_ref[0]):
+            self.lbl_drift.setText("")
             return
-        logC = np.log10(C[mask])
-        A_masked = A[mask]
-        # linear fit: A = k * logC + b
-        k, b = np.polyfit(logC, A_masked, 1)
-        self.k = float(k)
-        self.b = float(b)
+        state = "ДРЕЙФ — проверьте электрод" if drift.flagged[0] else "в пределах допуска"
+        self.lbl_drift.setText(f"Дрейф от начала: k {drift.dk[0]:+.1%}, b {drift.db[0]:+.4f} — {state}")
+        self.lbl_drift.setStyleSheet("color: #c00000;" if drift.flagged[0] else "")
 
     def predict_A_from_C(self, Cs):
-        """Given array-like C, return predicted A using k,b (or None)."""
-        if self.k is None:
-            return None
-        Cs = np.array(Cs, dtype=float)
-        logC = np.log10(Cs)
-        return self.k * logC + self.b
+        """Given array-like C, return predicted A using the current model (or None)."""
+        return self.model.predict_A(Cs)
 
     def predict_C_from_A(self, A_value):
-        """Inverse: given A, return C = 10^((A-b)/k). Returns None on fail."""
-        if self.k is None or self.k == 0:
-            return None
-        try:
-            logC = (A_value - self.b) / self.k
-            C = 10 ** (logC)
-            return C
-        except Exception:
-            return None
+        """Inverse: given A, return C (10^((A-b)/k) or the model's lookup table). Returns None on fail."""
+        return self.model.predict_C(A_value)
 
     # ---------- plotting ----------
+    @traced("ui.update_regression_and_plots")
     def update_regression_and_plots(self):
         self.compute_regression()
+        if self.acquisition is not None:
+            self.acquisition.set_model(self.model)
         # update equation label
-        if self.k is None:
+        if not self.model.is_valid:
             self.lbl_eq.setText("Уравнение: нет данных/ошибка регрессии")
+        elif self.online_mode:
+            self.lbl_eq.setText(f"{self.model.describe()}  (онлайн, λ = {self.online_fit.forgetting:g})")
         else:
-            self.lbl_eq.setText(f"A = {self.k:.6f}·log10(C) + {self.b:.6f}")
+            self.lbl_eq.setText(self.model.describe())
+        self._update_drift_label()
+
+        # plots are redrawn at most once per frame, see _redraw_plots()
+        if not self._redraw_timer.isActive():
+            self._redraw_timer.start()
+
+    @staticmethod
+    def _set_limits(ax, xs, ys, log_x=False):
+        """Fit axis limits to the given data with a 5% margin (relim ignores scatters)."""
+        xs = xs[np.isfinite(xs) & ((xs > 0) if log_x else True)]
+        ys = ys[np.isfinite(ys)]
+        if not len(xs) or not len(ys):
+            return
+        if log_x:
+            lo, hi = np.log10(xs.min()), np.log10(xs.max())
+            pad = (hi - lo) * 0.05 or 0.5
+            ax.set_xlim(10 ** (lo - pad), 10 ** (hi + pad))
+        else:
+            lo, hi = xs.min(), xs.max()
+            pad = (hi - lo) * 0.05 or 0.5
+            ax.set_xlim(lo - pad, hi + pad)
+        lo, hi = ys.min(), ys.max()
+        pad = (hi - lo) * 0.05 or 0.5
+        ax.set_ylim(lo - pad, hi + pad)
+
+    def _plot_data(self):
+        """Arrays for both plots: scatter offsets and regression curves."""
+        A = self.selected_points[:, 0]
+        C = self.selected_points[:, 1]
+        Cs = A_pred = np.empty(0)
+        if len(C) and self.model.is_valid:
+            # make C axis log-spaced for clarity
+            Cmin = max(C.min() / 2, 1e-12)
+            Cmax = C.max() * 2
+            Cs = np.logspace(math.log10(Cmin), math.log10(Cmax), 200)
+            A_pred = self.predict_A_from_C(Cs)
+        valid = C > 0
+        x = -np.log10(C[valid])
+        y = A[valid]
+        x_line = y_line = np.empty(0)
+        if len(x) and self.model.is_valid:
+            # x = -log10(C), so the curve is A(C = 10^-x) (a line for the log-linear model)
+            x_line = np.linspace(x.min() * 1.2, x.max() * 1.2, 200)
+            y_line = self.predict_A_from_C(10.0 ** -x_line)
+        return {"points1": (C, A), "curve1": (Cs, A_pred),
+                "points2": (x, y), "curve2": (x_line, y_line)}
+
+    @traced("plot.redraw")
+    def _redraw_plots(self):
+        """Update the existing scatter/line artists and request an idle redraw."""
+        if not self._plots_ready:
+            return  # _build_plots() draws once they exist
+        if self.points_from_table and self.selected_symbol in self.table.symbols and not self.online_mode:
+            # repeated views of a table curve are served from the cache (the
+            # online RLS model depends on λ and its samples, so it is not cached)
+            key = self.table.curve_key(self.selected_symbol, self.with_water)
+            data = self.curve_cache.get_or_compute(key, self._plot_data)
+        else:
+            data = self._plot_data()
+        has_points = len(self.selected_points) > 0
 
         # plot A vs C (scatter + fitted curve)
-        self.ax1.clear()
-        self.ax1.set_title("A vs C")
-        self.ax1.set_xlabel("C")
-        self.ax1.set_ylabel("A")
-        self.ax1.grid(True)
-        if self.selected_points:
-            A = np.array([p[0] for p in self.selected_points], dtype=float)
-            C = np.array([p[1] for p in self.selected_points], dtype=float)
-            # scatter
-            self.ax1.scatter(C, A, label="данные", zorder=3)
-            # fitted curve if possible: plot A_pred over C range
-            if self.k is not None:
-                # make C axis log-spaced for clarity
-                Cmin = max(C.min() / 2, 1e-12)
-                Cmax = C.max() * 2
-                Cs = np.logspace(math.log10(Cmin), math.log10(Cmax), 200)
-                A_pred = self.predict_A_from_C(Cs)
-                self.ax1.plot(Cs, A_pred, label="регрессия", linewidth=2)
-                self.ax1.set_xscale('log')
-            self.ax1.legend()
-
-        self.canvas1.draw()
+        C, A = data["points1"]
+        Cs, A_pred = data["curve1"]
+        self.line1.set_data(Cs, A_pred)
+        log_x = len(Cs) > 0
+        self.ax1.set_xscale('log' if log_x else 'linear')
+        self.lod1.set_data(C, A, source=self.selected_points, log_x=log_x)
+        self._set_limits(self.ax1, np.concatenate((C, Cs)), np.concatenate((A, A_pred)), log_x=log_x)
+        self.lod1.update()
+        self.leg1.set_visible(has_points)
+        self.canvas1.draw_idle()
 
         # plot A vs -log10(C)
-        self.ax2.clear()
-        self.ax2.set_title("A vs -log10(C)")
-        self.ax2.set_xlabel("-log10(C)")
-        self.ax2.set_ylabel("A")
-        self.ax2.grid(True)
-        if self.selected_points:
-            A = np.array([p[0] for p in self.selected_points], dtype=float)
-            C = np.array([p[1] for p in self.selected_points], dtype=float)
-            valid = C > 0
-            x = -np.log10(C[valid])
-            y = A[valid]
-            self.ax2.scatter(x, y, label="данные", zorder=3)
-            if self.k is not None:
-                # line eq: since A = k*log10(C) + b, and x = -log10(C), we have A = -k*x + b
-                x_line = np.linspace(x.min() * 1.2, x.max() * 1.2, 200)
-                y_line = -self.k * x_line + self.b
-                self.ax2.plot(x_line, y_line, label="линейная регрессия", linewidth=2)
-            self.ax2.legend()
-        self.canvas2.draw()
+        x, y = data["points2"]
+        x_line, y_line = data["curve2"]
+        self.line2.set_data(x_line, y_line)
+        self.lod2.set_data(x, y, source=self.selected_points)
+        self._set_limits(self.ax2, np.concatenate((x, x_line)), np.concatenate((y, y_line)))
+        self.lod2.update()
+        self.leg2.set_visible(has_points)
+        self.canvas2.draw_idle()
+
+    def _on_view_changed(self, ax):
+        # zoom/pan fire both xlim and ylim changes: one LOD update per frame
+        if not self._lod_timer.isActive():
+            self._lod_timer.start()
+
+    @traced("plot.update_lod")
+    def _update_lod(self):
+        if self.lod1.update():
+            self.canvas1.draw_idle()
+        if self.lod2.update():
+            self.canvas2.draw_idle()
+
+    # ---------- startup ----------
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            self.startup_timing["first_paint"] = time.perf_counter() - STARTUP_T0
+            # the plots come right after the first frame is on screen
+            QTimer.singleShot(0, self._finish_startup)
+
+    def _finish_startup(self):
+        self._build_plots()
+        self.startup_timing["plots"] = time.perf_counter() - STARTUP_T0
+        if self.report_startup:
+            line = "startup: " + ", ".join(
+                f"{name} {t * 1000:.0f} ms" for name, t in self.startup_timing.items()) + "\n"
+            if sys.stderr is not None:
+                sys.stderr.write(line)
+            else:
+                # windowed (console=False) builds have no stderr
+                with open(STARTUP_LOG, 'a', encoding='utf-8') as f:
+                    f.write(line)
+
+    # ---------- instrumentation ----------
+    def _build_trace_overlay(self):
+        self.trace_overlay = QLabel(self)
+        self.trace_overlay.setFont(QFont("Monospace", 8))
+        self.trace_overlay.setStyleSheet("background: rgba(0, 0, 0, 170); color: #d0ffd0; padding: 6px;")
+        self.trace_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.trace_overlay.hide()
+        self._trace_timer = QTimer(self)
+        self._trace_timer.setInterval(TRACE_OVERLAY_MS)
+        self._trace_timer.timeout.connect(self._refresh_trace_overlay)
+        QShortcut(QKeySequence("F12"), self, self.toggle_trace_overlay)
+        QShortcut(QKeySequence("Shift+F12"), self, self.export_trace)
+
+    def toggle_trace_overlay(self):
+        """F12: show/hide the last action's time breakdown; showing it turns tracing on."""
+        if self.trace_overlay.isVisible():
+            self.trace_overlay.hide()
+            self._trace_timer.stop()
+            return
+        tracing.enable()
+        self._refresh_trace_overlay()
+        self.trace_overlay.show()
+        self.trace_overlay.raise_()
+        self._trace_timer.start()
+
+    def _refresh_trace_overlay(self):
+        top = sorted(tracing.stats().items(), key=lambda kv: -kv[1]["total_ms"])[:6]
+        lines = ["последнее действие:", tracing.format_frame() or "  (нет данных)", "", "всего, мс / p90, мс / вызовов:"]
+        lines += [f"{name:<36}{st['total_ms']:9.1f} {st['p90_ms']:8.2f}  ×{st['count']}" for name, st in top]
+        self.trace_overlay.setText("\n".join(lines))
+        self.trace_overlay.adjustSize()
+        self.trace_overlay.move(self.width() - self.trace_overlay.width() - 10, 10)
+
+    def export_trace(self):
+        """Shift+F12: save the Chrome trace (and span histograms next to it)."""
+        if not tracing.is_enabled():
+            QMessageBox.information(self, "Трасса", "Профилирование выключено: нажмите F12, чтобы включить.")
+            return
+        fname, _ = QFileDialog.getSaveFileName(self, "Сохранить трассу", "trace.json", "Chrome trace (*.json)")
+        if not fname:
+            return
+        try:
+            tracing.export_chrome(fname)
+            stats_name = os.path.splitext(fname)[0] + ".stats.json"
+            tracing.export_json(stats_name)
+            QMessageBox.information(self, "Трасса", f"Трасса сохранена в {fname}\nгистограммы: {stats_name}")
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка записи", str(e))
+
+    # ---------- live acquisition ----------
+    def on_acquisition_toggle(self):
+        if self.acquisition is not None:
+            self.stop_acquisition()
+            return
+        spec = self.edit_source.text().strip()
+        if not spec:
+            QMessageBox.warning(self, "Ошибка", "Укажите источник данных (например file:data.txt или tcp:localhost:5000).")
+            return
+        self.acquisition = Acquisition(source_from_spec(spec), self.model,
+                                       store=self._readings_store(), channel=CHANNEL_STREAM)
+        self._acq_last_total = 0
+        self._acq_last_time = time.monotonic()
+        self.acquisition.start()
+        self._acq_timer.start()
+        self.btn_acq.setText("Стоп")
+
+    def stop_acquisition(self):
+        if self.acquisition is None:
+            return
+        self.acquisition.stop()
+        self.acquisition.join(timeout=1.0)
+        self.poll_acquisition()
+        self._acq_timer.stop()
+        self.acquisition = None
+        self.btn_acq.setText("Старт")
+
+    def poll_acquisition(self):
+        """Timer tick (ACQ_POLL_FPS per second): summarize what arrived since the last tick."""
+        acq = self.acquisition
+        if acq is None:
+            return
+        buf = acq.buffer
+        total = buf.total
+        now = time.monotonic()
+        rate = (total - self._acq_last_total) / max(now - self._acq_last_time, 1e-6)
+        self._acq_last_total, self._acq_last_time = total, now
+        if total:
+            _, a, c = buf.latest(ACQ_AVERAGE_SAMPLES)
+            with np.errstate(invalid='ignore'):
+                c_mean = np.nanmean(c) if np.isfinite(c).any() else float('nan')
+            text = (f"Измерение: {total} отсчётов, {rate:.0f}/с; "
+                    f"A = {a[-1]:.6g}, C = {c[-1]:.6g}, среднее C = {c_mean:.6g}")
+        else:
+            text = "Измерение: ожидание данных..."
+        if acq.error is not None:
+            text = f"Измерение: ошибка — {acq.error}"
+        elif acq.stopped:
+            text += " (поток завершён)"
+        self.lbl_acq.setText(text)
+        if acq.stopped:
+            self._acq_timer.stop()
+            self.acquisition = None
+            self.btn_acq.setText("Старт")
+
+    # ---------- stored readings ----------
+    def _readings_store(self):
+        """The readings store, opened on first use; None (with one warning) if it cannot be opened."""
+        if self.readings is None and self._readings_error is None:
+            try:
+                self.readings = ReadingStore(READINGS_DIR)
+            except Exception as e:
+                self._readings_error = e
+                QMessageBox.warning(self, "Хранилище измерений",
+                                    f"Результаты не будут сохраняться ({READINGS_DIR}):\n{e}")
+        return self.readings
+
+    def _record_result(self, A_val, C):
+        store = self._readings_store()
+        if store is None:
+            return
+        try:
+            store.append(time.time(), CHANNEL_MANUAL, A_val, C, store.model_version(self.model))
+        except Exception as e:
+            self.lbl_ci.setText(f"Не сохранено: {e}")
+
+    def show_history(self):
+        store = self._readings_store()
+        if store is None:
+            return
+        from history_dialog import HistoryDialog
+        names = {CHANNEL_MANUAL: "вычисления", CHANNEL_STREAM: "поток"}
+        HistoryDialog(store, names, self).show()
+
+    def closeEvent(self, event):
+        self.stop_acquisition()
+        if self.readings is not None:
+            self.readings.close()
+        super().closeEvent(event)
 
     # ---------- UI actions ----------
     def on_compute_C(self):
         text = self.edit_A.text().strip()
+        self.lbl_ci.setText("")
         if not text:
             self.lbl_result.setText("C = ")
             return
@@ -786,16 +1217,97 @@ class CorrelationApp(QWidget):
             QMessageBox.information(self, "Результат", "Невозможно вычислить C (проверьте данные и регрессию).")
             return
         self.lbl_result.setText(f"C = {C:.8g}")
+        self.lbl_ci.setText(self.confidence_text(A_val))
+        self._record_result(A_val, C)
+
+    def confidence_text(self, A_val):
+        """95% intervals for C(A), k and b from the current points (analytic + bootstrap).
+
+        Both are intervals of the least-squares line, so they are shown only
+        when that is the model C came from (not for robust methods, the
+        online RLS fit or nonlinear families).
+        """
+        if self.model.family != FAMILY_LINEAR:
+            return ""
+        if self.online_mode or self.fit_method != METHOD_OLS:
+            return "Доверительные интервалы вычисляются только для МНК."
+        pts = self.selected_points
+        A, C = pts[:, 0], pts[:, 1]
+        ci = analytic_intervals(A, C, A0=A_val)
+        if ci is None:
+            return ""
+        lines = []
+        n_boot = min(DEFAULT_N_BOOT, CI_BOOTSTRAP_BUDGET // max(len(pts), 1))
+        boot = bootstrap_intervals(A, C, A0=A_val, n_boot=n_boot, seed=0) if n_boot >= CI_MIN_BOOT else None
+        if ci["C"] is not None:
+            line = f"95% ДИ C: [{ci['C'][0]:.4g}; {ci['C'][1]:.4g}]"
+            if boot is not None and boot["C"] is not None:
+                line += f", бутстрэп [{boot['C'][0]:.4g}; {boot['C'][1]:.4g}]"
+            lines.append(line)
+        lines.append(f"k ∈ [{ci['k'][0]:.4f}; {ci['k'][1]:.4f}], b ∈ [{ci['b'][0]:.4f}; {ci['b'][1]:.4f}]")
+        return "\n".join(lines)
 
 # -------------------------
 # run
 # -------------------------
 def main():
-    app = QApplication(sys.argv)
+    # --startup-timing: print import / window / first paint / plots milestones to stderr
+    report = "--startup-timing" in sys.argv or bool(os.environ.get("CALIB_STARTUP_TIMING"))
+    app = QApplication([a for a in sys.argv if a != "--startup-timing"])
     w = CorrelationApp()
+    w.report_startup = report
     w.show()
     sys.exit(app.exec_())
 
 
+def predict_main(argv=None):
+    """Command line: batch A → C conversion without the GUI (see batch_predict.py)."""
+    import batch_predict
+    return batch_predict.main(argv)
+
+
+def fleet_main(argv=None):
+    """Command line: fit a directory of calibration files in parallel (see fleet.py)."""
+    import fleet
+    return fleet.main(argv)
+
+
+def unmix_main(argv=None):
+    """Command line: multi-channel readings → concentration vectors (see unmixing.py)."""
+    import unmixing
+    return unmixing.main(argv)
+
+
+def serve_main(argv=None):
+    """Command line: local HTTP / Unix-socket prediction service (see service.py)."""
+    import service
+    return service.main(argv)
+
+
+def readings_main(argv=None):
+    """Command line: info and CSV export of stored readings (see timeseries.py)."""
+    import timeseries
+    return timeseries.main(argv)
+
+
+def recal_main(argv=None):
+    """Command line: online recalibration of many channels from reference samples (see recalibration.py)."""
+    import recalibration
+    return recalibration.main(argv)
+
+
+# subcommands: python app.py <name> ...
+COMMANDS = {
+    "predict": predict_main,
+    "fleet": fleet_main,
+    "unmix": unmix_main,
+    "serve": serve_main,
+    "readings": readings_main,
+    "recal": recal_main,
+}
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
     main()
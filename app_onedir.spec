@@ -0,0 +1,74 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Startup-optimized build: one-dir (nothing is unpacked to a temp dir at
+# launch), no UPX (compressed Qt/NumPy libraries are slower to load) and
+# modules the app never imports are left out.
+#
+#     pyinstaller app_onedir.spec      ->  dist/app/app(.exe)
+#
+# Run the result with --startup-timing to record the startup milestones; the
+# build is windowed (no console), so they are appended to
+# ~/calib_startup_timing.log (app.STARTUP_LOG).
+
+EXCLUDES = [
+    # other GUI toolkits and matplotlib backends
+    'tkinter', '_tkinter', 'PySide2', 'PySide6', 'PyQt6', 'wx', 'gi',
+    'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_tkcairo',
+    'matplotlib.backends.backend_gtk3agg', 'matplotlib.backends.backend_gtk4agg',
+    'matplotlib.backends.backend_wxagg', 'matplotlib.backends.backend_macosx',
+    'matplotlib.backends.backend_webagg', 'matplotlib.backends.backend_nbagg',
+    # (pdf/svg/ps stay: the navigation toolbar's "Save figure" writes through them)
+    # Qt modules the app does not use
+    'PyQt5.QtWebEngine', 'PyQt5.QtWebEngineCore', 'PyQt5.QtWebEngineWidgets',
+    'PyQt5.QtQml', 'PyQt5.QtQuick', 'PyQt5.QtQuickWidgets', 'PyQt5.QtMultimedia',
+    'PyQt5.QtMultimediaWidgets', 'PyQt5.QtBluetooth', 'PyQt5.QtNfc', 'PyQt5.QtSql',
+    'PyQt5.QtDesigner', 'PyQt5.QtHelp', 'PyQt5.QtLocation', 'PyQt5.QtPositioning',
+    'PyQt5.QtSensors', 'PyQt5.QtSerialPort', 'PyQt5.QtTest', 'PyQt5.QtXmlPatterns',
+    'PyQt5.Qt3DCore', 'PyQt5.Qt3DRender', 'PyQt5.QtOpenGL', 'PyQt5.QtNetwork',
+    # optional dependencies of numpy/pandas/matplotlib and dev tooling
+    'scipy', 'IPython', 'jupyter_client', 'notebook', 'sqlalchemy', 'pyarrow',
+    'numexpr', 'bottleneck', 'tables', 'openpyxl', 'xlrd', 'lxml', 'bs4', 'html5lib',
+    'jinja2', 'pytest', 'lib2to3', 'test',
+    'numpy.tests', 'pandas.tests', 'matplotlib.tests', 'setuptools', 'pip',
+]
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='app',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='app',
+)
@@ -0,0 +1,179 @@
+# batch_predict.py
+"""Batch inverse prediction: a file of A readings → concentrations C.
+
+Input is CSV with the columns ``symbol,condition,A`` (an optional header row
+with those names is recognized). ``condition`` is water/no_water (also
+1/0, true/false, yes/no, "с водой"/"без воды"). Output is the same rows with
+a ``C`` column added. The file is streamed chunk by chunk and C is computed
+with one vectorized 10 ** ((A - b) / k) per chunk, so memory stays flat on
+multi-GB inputs. With a nonlinear --family the rows of each curve go through
+that curve's inverse lookup table (one np.interp per curve and chunk).
+Unknown symbols/conditions and impossible values give an empty C.
+
+    python app.py predict CALIBRATION INPUT OUTPUT [--chunk-rows N] [--method theil_sen] [--family auto]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from calib_format import load_table
+from csv_loader import LoadCancelled
+from jobs import run_cli
+from robust import METHODS, METHOD_OLS
+from models import FAMILIES, FAMILY_AUTO, FAMILY_LINEAR
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+COLUMNS = ["symbol", "condition", "A"]
+
+_CONDITIONS = {
+    "1": True, "true": True, "yes": True, "water": True, "with_water": True, "с водой": True,
+    "0": False, "false": False, "no": False, "no_water": False, "without_water": False, "без воды": False,
+}
+
+
+def coefficient_matrix(table):
+    """k and b as (2, n_symbols) arrays; row 0 = no water, row 1 = with water."""
+    fits = [table.fit_all(False), table.fit_all(True)]
+    return np.vstack([f.k for f in fits]), np.vstack([f.b for f in fits])
+
+
+def curve_models(table):
+    """Per-condition lists of per-symbol models, or None for the log-linear family."""
+    if table.family == FAMILY_LINEAR:
+        return None
+    return [[table.fit_curves(cond)[s] for s in table.symbols] for cond in (False, True)]
+
+
+def condition_index(value):
+    """Row of the k/b matrices for a condition value: 1 with water, 0 without, -1 unknown."""
+    cond = _CONDITIONS.get(str(value).strip().lower())
+    return -1 if cond is None else int(cond)
+
+
+def predict_codes(row, col, A, K, B, curves=None):
+    """C for readings A of the curves (row = condition, col = symbol index).
+
+    Rows with a negative row or col (unknown curve) and impossible values
+    give NaN. ``curves`` (from curve_models()) replaces the k/b matrices by
+    the inverse of each curve's model; rows are grouped by curve, not looped over.
+    """
+    known = (col >= 0) & (row >= 0)
+    row = np.where(known, row, 0)
+    col = np.where(known, col, 0)
+    A = np.asarray(A, dtype=np.float64)
+    if curves is None:
+        k = np.where(known, K[row, col], np.nan)
+        b = np.where(known, B[row, col], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            C = np.power(10.0, (A - b) / k)
+    else:
+        n_symbols = K.shape[1]
+        C = np.full(len(A), np.nan)
+        code = np.where(known, row * n_symbols + col, -1)
+        order = np.argsort(code, kind='stable')
+        uniq, starts = np.unique(code[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for c, i0, i1 in zip(uniq, starts, ends):
+            if c < 0:
+                continue
+            model = curves[c // n_symbols][c % n_symbols]
+            if model.is_valid:
+                sel = order[i0:i1]
+                C[sel] = model.predict_C(A[sel])
+    C[~np.isfinite(C) | (C <= 0)] = np.nan
+    return C
+
+
+def predict_frame(frame, symbols, K, B, curves=None):
+    """Add a C column to a chunk with columns symbol, condition, A (vectorized).
+
+    See predict_codes(); ``curves`` comes from curve_models().
+    """
+    import pandas as pd
+
+    # symbol and condition are categorical: only their few distinct values are
+    # looked up, then the per-row codes index the (2, n_symbols) k/b matrices
+    sym = frame["symbol"].astype('category').cat
+    sym_index = {s: i for i, s in enumerate(symbols)}
+    sym_map = np.array([sym_index.get(str(s).strip(), -1) for s in sym.categories] + [-1], dtype=np.intp)
+    col = sym_map[sym.codes]
+    cond = frame["condition"].astype('category').cat
+    cond_map = np.array([condition_index(c) for c in cond.categories] + [-1], dtype=np.intp)
+    row = cond_map[cond.codes]
+    A = pd.to_numeric(frame["A"], errors='coerce').to_numpy(dtype=np.float64)
+    frame["C"] = predict_codes(row, col, A, K, B, curves)
+    return frame
+
+
+def _has_header(path, sep):
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+    return [p.strip() for p in first.split(sep)][:3] == COLUMNS
+
+
+def predict_file(table, src, dst, chunk_rows=DEFAULT_CHUNK_ROWS, sep=',', progress=None, cancel=None):
+    """Stream src → dst; returns the number of rows written.
+
+    progress(fraction) is called per chunk; cancel() returning True stops with
+    LoadCancelled (the partial output is left in place).
+    """
+    import pandas as pd
+
+    K, B = coefficient_matrix(table)
+    curves = curve_models(table)
+    symbols = list(table.symbols)
+    total = os.path.getsize(src) or 1
+    rows = 0
+    out = sys.stdout if dst == '-' else open(dst, 'w', encoding='utf-8', newline='')
+    try:
+        with open(src, 'rb') as fh:
+            reader = pd.read_csv(
+                fh, sep=sep, header=0 if _has_header(src, sep) else None, names=COLUMNS,
+                usecols=[0, 1, 2], dtype={"symbol": "category", "condition": "category"},
+                chunksize=chunk_rows, skip_blank_lines=True, engine='c',
+            )
+            for i, frame in enumerate(reader):
+                if cancel is not None and cancel():
+                    raise LoadCancelled()
+                predict_frame(frame, symbols, K, B, curves)
+                frame.to_csv(out, header=(i == 0), index=False)
+                rows += len(frame)
+                if progress is not None:
+                    progress(min(fh.tell() / total, 1.0))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py predict", description="A readings → concentrations C")
+    parser.add_argument("calibration", help="calibration library (.json or .scal)")
+    parser.add_argument("input", help="CSV with symbol,condition,A")
+    parser.add_argument("output", help="output CSV ('-' for stdout)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--sep", default=",", help="input delimiter (default ',')")
+    parser.add_argument("--method", choices=list(METHODS), default=METHOD_OLS, help="fit method (default ols)")
+    parser.add_argument("--family", choices=list(FAMILIES) + [FAMILY_AUTO], default=FAMILY_LINEAR,
+                        help="curve family (default linear; auto = lowest AIC per curve)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    args = parser.parse_args(argv)
+
+    table = load_table(args.calibration)
+    table.set_method(args.method)
+    table.set_family(args.family)
+    try:
+        rows = run_cli(predict_file, table, args.input, args.output, chunk_rows=args.chunk_rows, sep=args.sep,
+                       quiet=args.quiet)
+    except LoadCancelled:
+        sys.stderr.write("cancelled\n")
+        return 130
+    if not args.quiet:
+        sys.stderr.write(f"{rows} rows\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+"""Reproducible benchmarks of the calibration app (see __main__.py).
+
+    python -m benchmarks [--preset quick|full] [-k NAME] [--baseline FILE]
+"""
@@ -0,0 +1,159 @@
+# benchmarks/__main__.py
+"""Benchmark runner: times every (benchmark, size), writes JSON, compares to a baseline.
+
+    python -m benchmarks                              # quick preset, compare to benchmarks/baseline.json
+    python -m benchmarks --preset full -o full.json
+    python -m benchmarks -k fit. -k plot. --save-baseline
+
+Every case is run once untimed (imports, first-touch allocations), then
+timed --repeat times (fewer when one run exceeds --budget seconds); the
+median is what is compared. A case is a regression when its median is more
+than --threshold times the baseline's and slower by at least --min-delta
+seconds (timer noise on microsecond cases is not a regression). The exit
+code is 1 when any case regressed, so the runner can gate CI. Without a
+baseline file the comparison is skipped with a notice; an explicit
+--baseline that does not exist exits with 2.
+
+Qt runs offscreen; data files for the ingestion benchmarks are generated
+once into --data-dir and reused.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from benchmarks import suite  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET_S = 10.0
+DEFAULT_THRESHOLD = 1.25
+DEFAULT_MIN_DELTA_S = 0.002
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def time_case(run, reset, repeat, budget):
+    """Per-repetition wall times (s) of run(), with reset() untimed before each."""
+    if reset is not None:
+        reset()
+    start = time.perf_counter()
+    run()   # warm-up
+    first = time.perf_counter() - start
+    repeat = max(1, min(repeat, int(budget / max(first, 1e-9))))
+    times = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_suite(names, preset, repeat, budget, data_dir, max_size=None, log=None):
+    ctx = {"data_dir": data_dir}
+    results = []
+    for name in names:
+        for size in suite.sizes_for(name, preset, max_size):
+            run, reset = suite.make(name, size, ctx)
+            times = time_case(run, reset, repeat, budget)
+            res = {"name": name, "size": size, "repeat": len(times),
+                   "median_s": statistics.median(times), "min_s": min(times),
+                   "mean_s": statistics.fmean(times)}
+            results.append(res)
+            if log is not None:
+                log(f"{name:<20} {size:>10}  {res['median_s'] * 1e3:10.3f} ms  (min {res['min_s'] * 1e3:.3f}, n={len(times)})")
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA_S):
+    """Rows (name, size, baseline s, current s, ratio, regressed) for cases in both runs."""
+    base = {(r["name"], r["size"]): r["median_s"] for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        old = base.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        new = r["median_s"]
+        ratio = new / old if old > 0 else float('inf')
+        rows.append((r["name"], r["size"], old, new, ratio, ratio > threshold and new - old > min_delta))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Calibration app benchmarks")
+    parser.add_argument("--preset", choices=["quick", "full"], default="quick", help="size ladder (default quick)")
+    parser.add_argument("-k", dest="patterns", action="append", help="only benchmarks whose name contains this")
+    parser.add_argument("--max-size", type=int, default=None, help="skip larger sizes")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_S, help="seconds per case (limits repeats)")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=None,
+                        help="baseline JSON to compare with (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown ratio flagged (default 1.25)")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_S, help="ignore slowdowns below this (s)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "calib-bench-data"))
+    parser.add_argument("--list", action="store_true", help="list benchmarks and sizes")
+    args = parser.parse_args(argv)
+    explicit_baseline = args.baseline is not None
+    if not explicit_baseline:
+        args.baseline = DEFAULT_BASELINE
+
+    names = suite.selected(args.patterns)
+    if args.list:
+        for name in names:
+            print(f"{name:<20} {suite.sizes_for(name, args.preset, args.max_size)}")
+        return 0
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = run_suite(names, args.preset, args.repeat, args.budget, args.data_dir, args.max_size, log=print)
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "preset": args.preset,
+              "machine": machine_info(), "results": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}: nothing to compare (record one with --save-baseline)")
+        if explicit_baseline:
+            status = 2
+    elif not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print("note: baseline was recorded on a different machine/environment")
+        rows = compare(results, baseline, args.threshold, args.min_delta)
+        print(f"\nvs baseline {args.baseline} ({baseline.get('created', '?')}):")
+        for name, size, old, new, ratio, regressed in rows:
+            mark = "REGRESSION" if regressed else ("faster" if ratio < 1 / args.threshold else "")
+            print(f"{name:<20} {size:>10}  {old * 1e3:10.3f} → {new * 1e3:10.3f} ms  ×{ratio:5.2f}  {mark}")
+        if any(r[5] for r in rows):
+            status = 1
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# benchmarks/suite.py
+"""The benchmarks: fitting, prediction, ingestion, readings store, editor load and plotting.
+
+Each benchmark is make(size, ctx) → (run, reset): run() is the timed call,
+reset() (or None) runs untimed before every repetition to drop caches, so
+every repetition measures the cold path the user sees after a change.
+Sizes come in two presets, "quick" for everyday use and "full" up to
+10⁷ points / 10⁴ substances.
+"""
+import os
+import shutil
+
+import numpy as np
+
+from benchmarks import synthetic
+
+POINTS = {"quick": [10, 1_000, 100_000], "full": [10, 1_000, 100_000, 1_000_000, 10_000_000]}
+SUBSTANCES = {"quick": [7, 100, 1_000], "full": [7, 100, 1_000, 10_000]}
+TABLE_ROWS = 12
+
+BENCHMARKS = {}
+
+
+def bench(name, sizes):
+    """Register make(size, ctx) under ``name`` for the given size ladder."""
+    def register(make):
+        BENCHMARKS[name] = (make, sizes)
+        return make
+    return register
+
+
+# -----------------------------
+# Fitting / prediction (no Qt)
+# -----------------------------
+@bench("fit.points", POINTS)
+def fit_points(size, ctx):
+    """Loaded points: the running fit compute_regression() starts from."""
+    from calibration import RunningFit
+
+    pts = synthetic.points(size)
+    return (lambda: RunningFit.from_points(pts).model()), None
+
+
+@bench("fit.points_huber", POINTS)
+def fit_points_huber(size, ctx):
+    """Loaded points with a robust method (refit of the whole array)."""
+    from calibration import fit_curve
+
+    pts = synthetic.points(size)
+    return (lambda: fit_curve(pts, method="huber")), None
+
+
+@bench("fit.table", SUBSTANCES)
+def fit_table(size, ctx):
+    """Batch fit of every curve of both conditions."""
+    table = synthetic.calibration_table(TABLE_ROWS, size)
+
+    def run():
+        table.fit_all(False)
+        table.fit_all(True)
+    return run, table.touch
+
+
+@bench("fit.rls", POINTS)
+def fit_rls(size, ctx):
+    """Online recalibration: one RLS update per reference sample, in order."""
+    from recalibration import RecursiveFit
+
+    pts = synthetic.points(size)
+
+    def run():
+        RecursiveFit(0.99).add_many(pts[:, 0], pts[:, 1])
+    return run, None
+
+
+@bench("fit.rls_bank", SUBSTANCES)
+def fit_rls_bank(size, ctx):
+    """100 rounds of one reference sample per channel for ``size`` channels."""
+    from recalibration import RecursiveFitBank
+
+    pts = synthetic.points(100 * size).reshape(100, size, 2)
+
+    def run():
+        RecursiveFitBank(size, 0.99).update_series(pts[:, :, 0], pts[:, :, 1])
+    return run, None
+
+
+@bench("predict.points", POINTS)
+def predict_points(size, ctx):
+    """Inverse prediction A → C for a batch of readings."""
+    from calibration import RunningFit
+
+    pts = synthetic.points(size)
+    model = RunningFit.from_points(pts).model()
+    A = pts[:, 0].copy()
+    return (lambda: model.predict_C(A)), None
+
+
+# -----------------------------
+# Ingestion
+# -----------------------------
+@bench("ingest.csv", POINTS)
+def ingest_csv(size, ctx):
+    """load_points() of an "A,C" CSV (the GUI's CSV load)."""
+    from csv_loader import load_points
+
+    path = os.path.join(ctx["data_dir"], f"points_{size}.csv")
+    if not os.path.exists(path):
+        synthetic.write_points_csv(path, size)
+    return (lambda: load_points(path)), None
+
+
+@bench("ingest.json", SUBSTANCES)
+def ingest_json(size, ctx):
+    """Calibration import from the editor JSON schema."""
+    from calib_format import load_table, save_table
+
+    path = os.path.join(ctx["data_dir"], f"table_{size}.json")
+    if not os.path.exists(path):
+        save_table(synthetic.calibration_table(TABLE_ROWS, size), path)
+    return (lambda: load_table(path)), None
+
+
+# -----------------------------
+# Readings store
+# -----------------------------
+STORE_RATE = 1000.0  # samples per second of the synthetic stream
+STORE_BATCH = 10_000
+
+
+def _stream(size):
+    """Timestamps, A and C of ``size`` samples at STORE_RATE."""
+    pts = synthetic.points(size)
+    return 1.7e9 + np.arange(size) / STORE_RATE, pts[:, 0], pts[:, 1]
+
+
+@bench("store.append", POINTS)
+def store_append(size, ctx):
+    """Appending acquisition batches (raw segments and all rollups) to a fresh store."""
+    from timeseries import ReadingStore
+
+    t, a, c = _stream(size)
+    state = {}
+
+    def reset():
+        path = os.path.join(ctx["data_dir"], f"store_append_{size}")
+        shutil.rmtree(path, ignore_errors=True)
+        state["store"] = ReadingStore(path)
+
+    def run():
+        store = state["store"]
+        for start in range(0, size, STORE_BATCH):
+            end = start + STORE_BATCH
+            store.append(t[start:end], 1, a[start:end], c[start:end], 1)
+        store.close()
+    return run, reset
+
+
+@bench("store.query", POINTS)
+def store_query(size, ctx):
+    """A one-minute window and a whole-range overview from a reopened store."""
+    from timeseries import ReadingStore
+
+    path = os.path.join(ctx["data_dir"], f"store_{size}")
+    if not os.path.isdir(path):
+        t, a, c = _stream(size)
+        with ReadingStore(path) as store:
+            for start in range(0, size, STORE_BATCH):
+                store.append(t[start:start + STORE_BATCH], 1, a[start:start + STORE_BATCH],
+                             c[start:start + STORE_BATCH], 1)
+    store = ReadingStore(path, readonly=True)
+    mid = sum(store.time_range) / 2
+
+    def run():
+        store.query(mid, mid + 60.0, channel=1)
+        store.overview(channel=1)
+    return run, None
+
+
+# -----------------------------
+# GUI (offscreen Qt)
+# -----------------------------
+def _window(ctx):
+    """One offscreen CorrelationApp shared by the GUI benchmarks."""
+    if "window" not in ctx:
+        from PyQt5.QtWidgets import QApplication
+        import app
+
+        ctx["qapp"] = QApplication.instance() or QApplication(["benchmarks"])
+        w = app.CorrelationApp()
+        w.resize(1100, 720)
+        w.show()
+        ctx["qapp"].processEvents()
+        # both are built lazily in the app (first paint / first visit of the tab)
+        w._build_plots()
+        w._ensure_editor()
+        ctx["window"] = w
+    return ctx["qapp"], ctx["window"]
+
+
+@bench("editor.load", SUBSTANCES)
+def editor_load(size, ctx):
+    """_load_table_into_widget() and one paint of the table view."""
+    qa, w = _window(ctx)
+    table = synthetic.calibration_table(TABLE_ROWS, size)
+
+    def run():
+        w.table = table
+        w._load_table_into_widget('no_water')
+        w.table_view.grab()
+        qa.processEvents()
+    return run, table.touch
+
+
+@bench("plot.redraw", POINTS)
+def plot_redraw(size, ctx):
+    """update_regression_and_plots() with freshly loaded points, drawn to both canvases."""
+    from calibration import RunningFit
+
+    qa, w = _window(ctx)
+    pts = synthetic.points(size)
+    state = {}
+
+    def reset():
+        # a new array, as after a CSV load: nothing derived from it is cached
+        state["pts"] = pts.copy()
+
+    def run():
+        w.selected_points = state["pts"]
+        w.points_from_table = False
+        w.point_fit = RunningFit.from_points(w.selected_points)
+        w.update_regression_and_plots()
+        w._redraw_timer.stop()
+        w._redraw_plots()
+        w.canvas1.draw()
+        w.canvas2.draw()
+    return run, reset
+
+
+def selected(patterns=None):
+    """Benchmark names matching any of the substrings (all when empty)."""
+    names = list(BENCHMARKS)
+    if patterns:
+        names = [n for n in names if any(p in n for p in patterns)]
+    return names
+
+
+def sizes_for(name, preset, max_size=None):
+    sizes = BENCHMARKS[name][1][preset]
+    return [s for s in sizes if max_size is None or s <= max_size]
+
+
+def make(name, size, ctx):
+    return BENCHMARKS[name][0](size, ctx)
+
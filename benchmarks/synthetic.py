@@ -0,0 +1,46 @@
+# benchmarks/synthetic.py
+"""Synthetic calibration data at arbitrary sizes, reproducible from a seed.
+
+Curves follow the app's model A = k·log10(C) + b with per-substance k, b and
+Gaussian noise, over concentrations log-spaced from 1e-7 to 1e-1 — the same
+shape as the built-in tables, only bigger.
+"""
+import numpy as np
+
+from calibration import CalibrationTable
+
+C_RANGE = (-7.0, -1.0)
+NOISE = 0.02
+
+
+def symbols(n):
+    return [f"S{i:05d}" for i in range(n)]
+
+
+def calibration_table(n_conc, n_symbols, seed=0):
+    """CalibrationTable with n_conc concentrations × n_symbols substances."""
+    rng = np.random.default_rng(seed)
+    c = np.logspace(C_RANGE[0], C_RANGE[1], n_conc)
+    x = np.log10(c)[:, None]
+    k = rng.uniform(0.2, 0.6, (2, n_symbols))
+    b = rng.uniform(2.0, 5.0, (2, n_symbols))
+    water = k[0] * x + b[0] + rng.normal(0, NOISE, (n_conc, n_symbols))
+    no_water = k[1] * x + b[1] + rng.normal(0, NOISE, (n_conc, n_symbols))
+    return CalibrationTable(symbols(n_symbols), c, water, no_water)
+
+
+def points(n, seed=0, k=0.35, b=4.0):
+    """(n, 2) array of (A, C) points on one noisy curve."""
+    rng = np.random.default_rng(seed)
+    c = 10.0 ** rng.uniform(C_RANGE[0], C_RANGE[1], n)
+    a = k * np.log10(c) + b + rng.normal(0, NOISE, n)
+    return np.column_stack((a, c))
+
+
+def write_points_csv(path, n, seed=0, chunk=1_000_000):
+    """Write n points as an "A,C" CSV the way instrument exports look."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for start in range(0, n, chunk):
+            pts = points(min(chunk, n - start), seed=seed + start)
+            np.savetxt(f, pts, delimiter=',', fmt='%.9g')
+    return path
@@ -0,0 +1,282 @@
+# calib_format.py
+"""Calibration library files: the editor's JSON schema and a compact binary container.
+
+Binary layout (all little-endian):
+
+    offset 0   magic   b"SCALIB\\0\\0"            8 bytes
+    offset 8   version uint16                    (FORMAT_VERSION)
+    offset 10  flags   uint16                    (reserved, 0)
+    offset 12  hlen    uint32                    length of the JSON header
+    offset 16  header  UTF-8 JSON                {"symbols", "rows", "cols", "dtype", "order", "blocks"}
+    ...        padding to DATA_ALIGN
+    blocks     contiguous float64 data: c_values (rows), valueWater and
+               valueNoWater (rows × cols each, column-major)
+
+Column-major blocks keep every substance's column contiguous, so a memory
+map of a file with thousands of substances only reads the columns that are
+actually touched. Round-trips with the JSON schema are lossless (float64 ↔
+shortest repr).
+
+Readers and writers take optional progress(fraction) / cancel() callbacks
+(see jobs.py); cancel() returning True raises LoadCancelled between chunks.
+Writes go to a temporary file that replaces the target only when complete,
+so a cancelled or failed export never leaves a truncated library behind.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from calibration import CalibrationTable
+from csv_loader import LoadCancelled
+from tracing import traced
+
+MAGIC = b"SCALIB\0\0"
+FORMAT_VERSION = 1
+DATA_ALIGN = 64
+BINARY_SUFFIX = ".scal"
+
+_PREFIX = struct.Struct("<8sHHI")
+_BLOCKS = ("c_values", "valueWater", "valueNoWater")
+IO_CHUNK = 4 << 20
+
+
+class FormatError(ValueError):
+    """The file is not a calibration library this version can read."""
+
+
+# -----------------------------
+# Chunked, cancellable I/O
+# -----------------------------
+def _check(cancel):
+    if cancel is not None and cancel():
+        raise LoadCancelled()
+
+
+def _read_bytes(path, progress=None, cancel=None, share=1.0):
+    """Whole file in IO_CHUNK reads; progress goes from 0 to ``share``."""
+    total = os.path.getsize(path) or 1
+    parts = []
+    done = 0
+    with open(path, 'rb') as f:
+        while True:
+            _check(cancel)
+            chunk = f.read(IO_CHUNK)
+            if not chunk:
+                break
+            parts.append(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(share * done / total)
+    return b"".join(parts)
+
+
+class _AtomicWriter:
+    """Binary file written next to the target and moved over it on success."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp = f"{path}.{os.getpid()}.tmp"
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.tmp, 'wb')
+        return self.f
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+        else:
+            try:
+                os.remove(self.tmp)
+            except OSError:
+                pass
+        return False
+
+
+# -----------------------------
+# JSON (editor export/import schema)
+# -----------------------------
+def read_json(path, progress=None, cancel=None):
+    raw = _read_bytes(path, progress, cancel, share=0.5)
+    obj = json.loads(raw.decode('utf-8'))
+    _check(cancel)
+    table = CalibrationTable.from_dict(obj)
+    if progress is not None:
+        progress(1.0)
+    return table
+
+
+def write_json(table, path, progress=None, cancel=None):
+    raw = json.dumps(table.to_dict(), indent=2, ensure_ascii=False).encode('utf-8')
+    if progress is not None:
+        progress(0.5)
+    total = len(raw) or 1
+    with _AtomicWriter(path) as f:
+        for start in range(0, len(raw), IO_CHUNK):
+            _check(cancel)
+            f.write(raw[start:start + IO_CHUNK])
+            if progress is not None:
+                progress(0.5 + 0.5 * min(start + IO_CHUNK, total) / total)
+
+
+# -----------------------------
+# Binary container
+# -----------------------------
+def _align(n):
+    return (n + DATA_ALIGN - 1) // DATA_ALIGN * DATA_ALIGN
+
+
+def _mapping(arr):
+    """The np.memmap an array is (or is a view of), or None."""
+    while arr is not None:
+        if isinstance(arr, np.memmap):
+            return arr
+        arr = getattr(arr, "base", None)
+    return None
+
+
+def _maps_file(mapped, path):
+    filename = getattr(mapped, "filename", None)
+    if filename is None or not os.path.exists(path):
+        return False
+    try:
+        return os.path.samefile(filename, path)
+    except OSError:
+        return False
+
+
+def detach(table, path=None):
+    """Copy the table's memory-mapped arrays (those mapping ``path``, or all) into memory.
+
+    A table read with read_binary(mmap=True) keeps its file mapped; the file
+    cannot be replaced while it is (Windows refuses the rename), so writing
+    a table back over its own file detaches it first. Plain views of a map
+    (e.g. c_values after CalibrationTable's ravel()) count as mapped too.
+    """
+    for name in ("c_values", "value_water", "value_no_water"):
+        arr = getattr(table, name)
+        mapped = _mapping(arr)
+        if mapped is not None and (path is None or _maps_file(mapped, path)):
+            setattr(table, name, np.array(arr, order='F' if arr.ndim == 2 else 'C'))
+
+
+def write_binary(table, path, progress=None, cancel=None):
+    detach(table, path)
+    rows, cols = table.shape
+    header = {"symbols": list(table.symbols), "rows": rows, "cols": cols,
+              "dtype": "<f8", "order": "F", "blocks": {}}
+    sizes = {"c_values": rows * 8, "valueWater": rows * cols * 8, "valueNoWater": rows * cols * 8}
+    # offsets depend on the header length, which depends on the offsets: reserve
+    # room for the largest offsets first, then fill them in
+    header["blocks"] = {name: 10 ** 15 for name in _BLOCKS}
+    hlen = len(json.dumps(header, ensure_ascii=False).encode('utf-8'))
+    offset = _align(_PREFIX.size + hlen)
+    for name in _BLOCKS:
+        header["blocks"][name] = offset
+        offset = _align(offset + sizes[name])
+    raw = json.dumps(header, ensure_ascii=False).encode('utf-8').ljust(hlen)
+
+    with _AtomicWriter(path) as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(raw)))
+        f.write(raw)
+        data = {"c_values": table.c_values,
+                "valueWater": table.value_water,
+                "valueNoWater": table.value_no_water}
+        total = sum(sizes.values()) or 1
+        done = 0
+        for name in _BLOCKS:
+            f.seek(header["blocks"][name])
+            flat = np.asarray(data[name], dtype='<f8').ravel(order='F')
+            step = IO_CHUNK // 8
+            for start in range(0, len(flat), step):
+                _check(cancel)
+                flat[start:start + step].tofile(f)
+                done += min(step, len(flat) - start) * 8
+                if progress is not None:
+                    progress(done / total)
+        f.truncate(max(f.tell(), _PREFIX.size + len(raw)))
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise FormatError("файл слишком короткий")
+        magic, version, _flags, hlen = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise FormatError("не файл калибровки (неверная сигнатура)")
+        if version > FORMAT_VERSION:
+            raise FormatError(f"версия формата {version} новее поддерживаемой ({FORMAT_VERSION})")
+        header = json.loads(f.read(hlen).decode('utf-8'))
+    header["version"] = version
+    return header
+
+
+def read_binary(path, mmap=True, progress=None, cancel=None):
+    """Open a binary library as a CalibrationTable.
+
+    With mmap=True the value matrices are copy-on-write memory maps: nothing
+    is read until a column is accessed, and edits stay in memory.
+    """
+    header = read_header(path)
+    rows, cols = header["rows"], header["cols"]
+    blocks = header["blocks"]
+    if mmap:
+        def block(name, shape):
+            if not int(np.prod(shape)):
+                return np.zeros(shape)
+            return np.memmap(path, dtype='<f8', mode='c', offset=blocks[name], shape=shape, order='F')
+    else:
+        raw = _read_bytes(path, progress, cancel)
+
+        def block(name, shape):
+            count = int(np.prod(shape))
+            arr = np.frombuffer(raw, dtype='<f8', count=count, offset=blocks[name])
+            return arr.reshape(shape, order='F').copy(order='F')
+    # only rows floats: always in memory, nothing keeps the file mapped for them
+    c_values = np.array(block("c_values", (rows,)))
+    water = block("valueWater", (rows, cols))
+    no_water = block("valueNoWater", (rows, cols))
+    if progress is not None:
+        progress(1.0)
+    return CalibrationTable(header["symbols"], c_values, water, no_water)
+
+
+def is_binary(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# -----------------------------
+# Format-independent entry points
+# -----------------------------
+@traced("parse.calibration")
+def load_table(path, progress=None, cancel=None):
+    """Read a calibration library, JSON or binary (detected from the file's magic)."""
+    if is_binary(path):
+        return read_binary(path, progress=progress, cancel=cancel)
+    return read_json(path, progress=progress, cancel=cancel)
+
+
+@traced("write.calibration")
+def save_table(table, path, progress=None, cancel=None):
+    """Write binary for *.scal paths, the editor JSON schema otherwise."""
+    if os.path.splitext(path)[1].lower() == BINARY_SUFFIX:
+        write_binary(table, path, progress=progress, cancel=cancel)
+    else:
+        write_json(table, path, progress=progress, cancel=cancel)
+
+
+def convert(src, dst):
+    """Convert between JSON and binary (direction chosen by the file types)."""
+    save_table(load_table(src), dst)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit("usage: python calib_format.py SRC DST   (JSON ↔ .scal)")
+    convert(sys.argv[1], sys.argv[2])
@@ -0,0 +1,583 @@
+# calibration.py
+"""Headless calibration engine.
+
+Holds the symbols × C tables as NumPy arrays and the log-linear model
+A = k·log10(C) + b. Nothing here imports Qt or matplotlib, so the same
+calibration can run on a server without a display.
+"""
+import itertools
+import math
+
+import numpy as np
+
+from cache import LRUCache
+from robust import METHOD_OLS, check_method, robust_fit
+from models import FAMILY_LINEAR, CurveModel, check_family, select_models
+from tracing import traced
+
+# fitted models kept per (symbol, condition, column version)
+MODEL_CACHE_SIZE = 1024
+
+# -----------------------------
+# встроенные "заводские" значения
+# -----------------------------
+BUILTIN_SYMBOLS = ['Ceftr', 'Cef', 'Cefot', 'Cefur', 'Strep', 'Neo', 'Sulf']
+BUILTIN_C_VALUES = [0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1]
+BUILTIN_VALUE_WATER = [
+    [0.9, 1.03, 0.9, 0.8, 0.7, 0.8, 1],
+    [1.3, 1.46, 1.1, 1, 1, 1.26666666666667, 1.5],
+    [1.63, 1.88, 1.56, 1.3, 1.3, 1.66666666666667, 1.8],
+    [2.03, 2.31, 1.96, 1.6, 1.7, 2.13333333333333, 2.2],
+    [2.39, 2.79, 2.32, 1.9, 2, 2.5, 2.5],
+    [2.63, 3.2, 2.87, 2.3, 2.3, 3.06666666666667, 2.72],
+]
+BUILTIN_VALUE_NO_WATER = [
+    [2.4, 1.76, 1.7, 1.8, 2.1, 1.7, 2.3],
+    [2.7, 2.19, 2, 2.1, 2.5, 2.16666666666667, 2.8],
+    [3, 2.62, 2.3, 2.4, 2.8, 2.56666666666667, 3.1],
+    [3.4, 3.07, 2.7, 2.7, 3.1, 3.033, 3.5],
+    [3.8, 3.54, 3.1, 3, 3.5, 3.4, 3.8],
+    [4.1, 4, 3.7, 3.4, 3.8, 3.96, 4],
+]
+
+# unique id per table object, part of every cache key
+_table_ids = itertools.count(1)
+
+# keys of the JSON schema used by the editor export/import
+JSON_KEYS = ("symbols", "c_values", "valueWater", "valueNoWater")
+
+
+def _as_matrix(rows_data, rows, cols):
+    """Convert a (possibly ragged) list of rows into a rows × cols float array.
+
+    Missing or non-numeric cells become 0.0, the same placeholder the editor uses.
+    A float64 array that already has the right shape (e.g. a memory map) is used
+    as is, without a copy.
+    """
+    if isinstance(rows_data, np.ndarray) and rows_data.shape == (rows, cols) and rows_data.dtype == np.float64:
+        return rows_data
+    out = np.zeros((rows, cols), dtype=float)
+    if isinstance(rows_data, np.ndarray) and rows_data.ndim == 2:
+        r = min(rows, rows_data.shape[0])
+        c = min(cols, rows_data.shape[1])
+        out[:r, :c] = rows_data[:r, :c]
+        return out
+    for i, row in enumerate(rows_data[:rows]):
+        for j, val in enumerate(list(row)[:cols]):
+            try:
+                out[i, j] = float(val)
+            except (TypeError, ValueError):
+                out[i, j] = 0.0
+    return out
+
+
+# -----------------------------
+# Calibration tables
+# -----------------------------
+class CalibrationTable:
+    """Calibration data: rows are C values, columns are symbols (substances).
+
+    ``value_water`` and ``value_no_water`` are float arrays of shape
+    (len(c_values), len(symbols)).
+    """
+
+    def __init__(self, symbols, c_values, value_water, value_no_water):
+        self.symbols = [str(s) for s in symbols]
+        self.c_values = np.asarray(c_values, dtype=float).ravel()
+        rows, cols = len(self.c_values), len(self.symbols)
+        self.value_water = _as_matrix(value_water, rows, cols)
+        self.value_no_water = _as_matrix(value_no_water, rows, cols)
+        # global edit counter; every column also remembers the counter value of
+        # its last change, so caches keyed by (symbol, condition, column version)
+        # are invalidated per column
+        self.uid = next(_table_ids)
+        self.version = 0
+        self._col_versions = {False: np.zeros(cols, dtype=np.int64), True: np.zeros(cols, dtype=np.int64)}
+        # fit method and curve family for every curve of this table, see
+        # robust.METHODS and models.FAMILIES
+        self.method = METHOD_OLS
+        self.family = FAMILY_LINEAR
+        self._fit_cache = {}
+        self._models = LRUCache(MODEL_CACHE_SIZE)
+        # running fits of the (symbol, with_water) curves being watched, see track()
+        self._running = {}
+
+    @classmethod
+    def builtin(cls):
+        return cls(BUILTIN_SYMBOLS, BUILTIN_C_VALUES, BUILTIN_VALUE_WATER, BUILTIN_VALUE_NO_WATER)
+
+    @classmethod
+    def from_dict(cls, obj):
+        """Build a table from the editor JSON schema (symbols, c_values, valueWater, valueNoWater)."""
+        missing = [k for k in JSON_KEYS if k not in obj]
+        if missing:
+            raise ValueError("JSON должен содержать keys: " + ", ".join(JSON_KEYS))
+        return cls(obj["symbols"], [float(x) for x in obj["c_values"]],
+                   obj["valueWater"], obj["valueNoWater"])
+
+    def to_dict(self):
+        """Inverse of from_dict(): plain lists, ready for json.dump."""
+        return {
+            "symbols": list(self.symbols),
+            "c_values": self.c_values.tolist(),
+            "valueWater": self.value_water.tolist(),
+            "valueNoWater": self.value_no_water.tolist(),
+        }
+
+    def copy(self):
+        table = CalibrationTable(self.symbols, self.c_values.copy(),
+                                 self.value_water.copy(), self.value_no_water.copy())
+        table.method = self.method
+        table.family = self.family
+        return table
+
+    @property
+    def shape(self):
+        return self.value_water.shape
+
+    def values(self, with_water):
+        """The A matrix for the given condition (a view, not a copy)."""
+        return self.value_water if with_water else self.value_no_water
+
+    def points(self, symbol, with_water):
+        """(n, 2) array of (A, C) points for one symbol and condition."""
+        idx = self.symbols.index(symbol)
+        A = self.values(with_water)[:, idx]
+        return np.column_stack((A, self.c_values))
+
+    def set_method(self, method):
+        """Switch the fit method; fits of each method are cached separately."""
+        self.method = check_method(method)
+
+    def set_family(self, family):
+        """Switch the curve family ("auto" = lowest AIC per curve)."""
+        self.family = check_family(family)
+
+    @traced("fit.table")
+    def fit_all(self, with_water):
+        """BatchFit of every symbol for one condition, cached until the next edit."""
+        key = (bool(with_water), self.method)
+        cached = self._fit_cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        fit = BatchFit(self.symbols, fit_columns(self.log_c(), self.values(key[0]), method=self.method))
+        self._fit_cache[key] = (self.version, fit)
+        return fit
+
+    @traced("fit.table_curves")
+    def fit_curves(self, with_water):
+        """{symbol: model} for the table's family, fitted over all columns at
+        once and cached until the next edit. Linear curves keep the fit method
+        (fit_all()); nonlinear ones are least squares."""
+        key = ("curves", bool(with_water), self.method, self.family)
+        cached = self._fit_cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        linear = self.fit_all(with_water)
+        chosen = select_models(self.log_c(), self.values(with_water), self.family,
+                               linear=(linear.k, linear.b))
+        curves = {sym: _make_model(*c) for sym, c in zip(self.symbols, chosen)}
+        self._fit_cache[key] = (self.version, curves)
+        return curves
+
+    def cached(self, key, compute):
+        """Memoize compute() under key until the next edit of the table."""
+        cached = self._fit_cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        value = compute()
+        self._fit_cache[key] = (self.version, value)
+        return value
+
+    def log_c(self):
+        """log10 of the C values (NaN where C <= 0)."""
+        logC = np.full(len(self.c_values), np.nan)
+        positive = self.c_values > 0
+        logC[positive] = np.log10(self.c_values[positive])
+        return logC
+
+    def column_version(self, symbol, with_water):
+        return int(self._col_versions[bool(with_water)][self.symbols.index(symbol)])
+
+    def curve_key(self, symbol, with_water):
+        """Cache key of one curve: changes whenever that column (or C) is edited."""
+        return (self.uid, symbol, bool(with_water), self.column_version(symbol, with_water),
+                self.method, self.family)
+
+    def model(self, symbol, with_water):
+        """CalibrationModel for one symbol/condition.
+
+        Tracked curves come from their RunningFit (linear least squares only);
+        the rest are memoized per curve_key(), taken from a still-valid
+        fit_all() or fitted alone. Nonlinear families come from fit_curves().
+        """
+        running = self._running.get((symbol, bool(with_water)))
+        if running is not None and self.method == METHOD_OLS and self.family == FAMILY_LINEAR:
+            return running.model()
+        return self._models.get_or_compute(self.curve_key(symbol, with_water),
+                                           lambda: self._fit_one(symbol, with_water))
+
+    def _fit_one(self, symbol, with_water):
+        if self.family != FAMILY_LINEAR:
+            return self.fit_curves(with_water)[symbol]
+        cached = self._fit_cache.get((bool(with_water), self.method))
+        if cached is not None and cached[0] == self.version:
+            return cached[1].model(symbol)
+        idx = self.symbols.index(symbol)
+        one = BatchFit([symbol], fit_columns(self.log_c(), self.values(with_water)[:, idx:idx + 1],
+                                             method=self.method))
+        return one.model(symbol)
+
+    def track(self, symbol, with_water):
+        """Keep a RunningFit for one curve so set_value() updates it in O(1)."""
+        key = (symbol, bool(with_water))
+        if key not in self._running:
+            pts = self.points(symbol, with_water)
+            self._running[key] = RunningFit.from_points(pts)
+        return self._running[key]
+
+    def _bump(self, cols=None, conditions=(False, True)):
+        self.version += 1
+        for cond in conditions:
+            if cols is None:
+                self._col_versions[cond][:] = self.version
+            else:
+                self._col_versions[cond][cols] = self.version
+
+    def set_value(self, with_water, row, col, value):
+        """Edit one cell; only that column's caches are invalidated and a
+        tracked running fit of the curve is updated in place."""
+        table = self.values(with_water)
+        old = float(table[row, col])
+        table[row, col] = float(value)
+        running = self._running.get((self.symbols[col], bool(with_water)))
+        if running is not None:
+            running.replace_point(old, self.c_values[row], float(value), self.c_values[row])
+        self._bump(col, (bool(with_water),))
+
+    def touch(self):
+        """Mark the whole table as changed after editing the arrays in place."""
+        self._bump()
+        self._running = {}
+
+    # ---------- structural edits ----------
+    def add_row(self, c_value, fill=0.0):
+        self.c_values = np.append(self.c_values, float(c_value))
+        new_row = np.full((1, len(self.symbols)), fill, dtype=float)
+        self.value_water = np.vstack((self.value_water, new_row))
+        self.value_no_water = np.vstack((self.value_no_water, new_row))
+        self.touch()
+
+    def delete_row(self, row):
+        self.c_values = np.delete(self.c_values, row)
+        self.value_water = np.delete(self.value_water, row, axis=0)
+        self.value_no_water = np.delete(self.value_no_water, row, axis=0)
+        self.touch()
+
+    def add_column(self, name, fill=0.0):
+        self.symbols.append(str(name))
+        new_col = np.full((len(self.c_values), 1), fill, dtype=float)
+        self.value_water = np.hstack((self.value_water, new_col))
+        self.value_no_water = np.hstack((self.value_no_water, new_col))
+        self.version += 1
+        for cond in (False, True):
+            self._col_versions[cond] = np.append(self._col_versions[cond], self.version)
+
+    def rename_column(self, col, name):
+        old, name = self.symbols[col], str(name)
+        self.symbols[col] = name
+        for cond in (False, True):
+            running = self._running.pop((old, cond), None)
+            if running is not None:
+                self._running[(name, cond)] = running
+        self._bump(col)
+
+    def set_c_value(self, row, c_value):
+        self.c_values[row] = float(c_value)
+        self.touch()
+
+    def delete_column(self, col):
+        name = self.symbols.pop(col)
+        self.value_water = np.delete(self.value_water, col, axis=1)
+        self.value_no_water = np.delete(self.value_no_water, col, axis=1)
+        self.version += 1
+        for cond in (False, True):
+            self._col_versions[cond] = np.delete(self._col_versions[cond], col)
+            self._running.pop((name, cond), None)
+
+
+# -----------------------------
+# Batch least squares over columns
+# -----------------------------
+@traced("fit.columns")
+def fit_columns(x, Y, mask=None, method=METHOD_OLS):
+    """Closed-form least squares Y[:, j] = k[j]·x + b[j] for every column at once.
+
+    ``x`` has shape (n,) (shared by all columns) or (n, m); ``Y`` has shape (n, m).
+    Non-finite entries and entries where ``mask`` is False are left out.
+    Returns a dict of arrays: k, b, r2, rss, n (shape (m,)) and residuals (n, m),
+    NaN where a column has fewer than two usable points or a degenerate x.
+    Any other ``method`` than "ols" takes k and b from the robust estimator
+    (robust.py); r2 and rss are then computed from its residuals.
+    """
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    x = np.asarray(x, dtype=float)
+    X = np.broadcast_to(x[:, None] if x.ndim == 1 else x, Y.shape)
+    W = np.isfinite(X) & np.isfinite(Y)
+    if mask is not None:
+        W &= np.broadcast_to(mask if np.ndim(mask) == 2 else np.asarray(mask)[:, None], Y.shape)
+    Xw = np.where(W, X, 0.0)
+    Yw = np.where(W, Y, 0.0)
+
+    n = W.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mx = Xw.sum(axis=0) / n
+        my = Yw.sum(axis=0) / n
+        dx = np.where(W, X - mx, 0.0)
+        dy = np.where(W, Y - my, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+        ok = (n >= 2) & (sxx > 0)
+        if method == METHOD_OLS:
+            k = np.where(ok, sxy / sxx, np.nan)
+            b = np.where(ok, my - k * mx, np.nan)
+        else:
+            k, b = robust_fit(X, Y, W, check_method(method))
+            ok &= np.isfinite(k)
+            k = np.where(ok, k, np.nan)
+            b = np.where(ok, b, np.nan)
+        residuals = np.where(W, Y - (k * X + b), np.nan)
+        rss = np.where(ok, np.nansum(residuals * residuals, axis=0), np.nan)
+        r2 = np.where(ok, 1.0 - rss / syy, np.nan)
+    return {"k": k, "b": b, "r2": r2, "rss": rss, "n": n, "residuals": residuals}
+
+
+class BatchFit:
+    """Result of fit_columns() labelled by symbol; lookups are O(1)."""
+
+    def __init__(self, symbols, result):
+        self.symbols = list(symbols)
+        self.k = result["k"]
+        self.b = result["b"]
+        self.r2 = result["r2"]
+        self.rss = result["rss"]
+        self.n = result["n"]
+        self.residuals = result["residuals"]
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+
+    def model(self, symbol):
+        j = self._index[symbol]
+        if not np.isfinite(self.k[j]):
+            return CalibrationModel()
+        return CalibrationModel(self.k[j], self.b[j])
+
+
+# -----------------------------
+# Running (incremental) fit
+# -----------------------------
+class RunningFit:
+    """Incremental least squares of A on x = log10(C).
+
+    Keeps n, the means and the centred co-moments (Welford updates) instead of
+    raw sums Σx, Σy, Σxy, Σx², Σy², which lose precision on long feeds.
+    Adding, removing or replacing a point is O(1). Points with C <= 0 are ignored,
+    as in CalibrationModel.fit().
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2x = 0.0   # Σ(x - x̄)²
+        self.m2y = 0.0   # Σ(y - ȳ)²
+        self.cxy = 0.0   # Σ(x - x̄)(y - ȳ)
+
+    @classmethod
+    @traced("fit.running_from_points")
+    def from_points(cls, points):
+        fit = cls()
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        fit.add_many(points[:, 0], points[:, 1])
+        return fit
+
+    # ---------- updates in (x, y) ----------
+    def add(self, x, y):
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        dy = y - self.mean_y
+        self.mean_y += dy / self.n
+        self.m2x += dx * (x - self.mean_x)
+        self.m2y += dy * (y - self.mean_y)
+        self.cxy += dx * (y - self.mean_y)
+
+    def remove(self, x, y):
+        if self.n <= 1:
+            self.__init__()
+            return
+        n_new = self.n - 1
+        mean_x_new = self.mean_x - (x - self.mean_x) / n_new
+        mean_y_new = self.mean_y - (y - self.mean_y) / n_new
+        self.m2x -= (x - mean_x_new) * (x - self.mean_x)
+        self.m2y -= (y - mean_y_new) * (y - self.mean_y)
+        self.cxy -= (x - mean_x_new) * (y - self.mean_y)
+        self.n = n_new
+        self.mean_x = mean_x_new
+        self.mean_y = mean_y_new
+
+    def merge(self, other):
+        """Combine with another RunningFit (Chan et al. pairwise update)."""
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        f = self.n * other.n / n
+        self.m2x += other.m2x + dx * dx * f
+        self.m2y += other.m2y + dy * dy * f
+        self.cxy += other.cxy + dx * dy * f
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+
+    # ---------- updates in (A, C) ----------
+    def add_point(self, A, C):
+        if C > 0:
+            self.add(math.log10(C), A)
+
+    def remove_point(self, A, C):
+        if C > 0:
+            self.remove(math.log10(C), A)
+
+    def replace_point(self, old_A, old_C, new_A, new_C):
+        self.remove_point(old_A, old_C)
+        self.add_point(new_A, new_C)
+
+    def add_many(self, A, C):
+        """Add arrays of points in one vectorized pass (merged as a block)."""
+        A = np.asarray(A, dtype=float).ravel()
+        C = np.asarray(C, dtype=float).ravel()
+        mask = C > 0
+        if not mask.any():
+            return
+        x = np.log10(C[mask])
+        y = A[mask]
+        block = RunningFit()
+        block.n = len(x)
+        block.mean_x = float(x.mean())
+        block.mean_y = float(y.mean())
+        dx = x - block.mean_x
+        dy = y - block.mean_y
+        block.m2x = float(dx @ dx)
+        block.m2y = float(dy @ dy)
+        block.cxy = float(dx @ dy)
+        self.merge(block)
+
+    # ---------- results ----------
+    @property
+    def k(self):
+        if self.n < 2 or self.m2x <= 0:
+            return None
+        return self.cxy / self.m2x
+
+    @property
+    def b(self):
+        k = self.k
+        return None if k is None else self.mean_y - k * self.mean_x
+
+    @property
+    def r2(self):
+        if self.n < 2 or self.m2x <= 0 or self.m2y <= 0:
+            return None
+        return self.cxy * self.cxy / (self.m2x * self.m2y)
+
+    def model(self):
+        return CalibrationModel(self.k, self.b)
+
+
+# -----------------------------
+# Log-linear model
+# -----------------------------
+class CalibrationModel:
+    """A = k·log10(C) + b. ``k``/``b`` are None until a fit succeeds."""
+
+    family = FAMILY_LINEAR
+
+    def __init__(self, k=None, b=None):
+        self.k = None if k is None else float(k)
+        self.b = None if b is None else float(b)
+
+    @classmethod
+    def fit(cls, A, C, method=METHOD_OLS):
+        """Fit on arrays A, C (least squares or a robust method); points with C <= 0 are ignored."""
+        A = np.asarray(A, dtype=float).ravel()
+        C = np.asarray(C, dtype=float).ravel()
+        mask = C > 0
+        if mask.sum() < 2:
+            return cls()
+        logC = np.log10(C[mask])
+        A_masked = A[mask]
+        if method != METHOD_OLS:
+            res = fit_columns(logC, A_masked, method=method)
+            if not np.isfinite(res["k"][0]):
+                return cls()
+            return cls(res["k"][0], res["b"][0])
+        # linear fit: A = k * logC + b
+        k, b = np.polyfit(logC, A_masked, 1)
+        return cls(k, b)
+
+    @classmethod
+    def fit_points(cls, points, method=METHOD_OLS):
+        """Fit from an (n, 2) array of (A, C) pairs."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) < 2:
+            return cls()
+        return cls.fit(points[:, 0], points[:, 1], method=method)
+
+    @property
+    def is_valid(self):
+        return self.k is not None and self.b is not None
+
+    def describe(self):
+        return f"A = {self.k:.6f}·log10(C) + {self.b:.6f}"
+
+    def predict_A(self, C):
+        """Given array-like C, return predicted A (or None without a fit)."""
+        if not self.is_valid:
+            return None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.k * np.log10(np.asarray(C, dtype=float)) + self.b
+
+    def predict_C(self, A):
+        """Inverse: C = 10^((A-b)/k). Returns None without a usable fit."""
+        if not self.is_valid or self.k == 0:
+            return None
+        with np.errstate(over='ignore', invalid='ignore'):
+            return 10 ** ((np.asarray(A, dtype=float) - self.b) / self.k)
+
+
+def _make_model(family, params, aic, x_range):
+    if family == FAMILY_LINEAR:
+        if not np.isfinite(params).all():
+            return CalibrationModel()
+        return CalibrationModel(*params)
+    return CurveModel(family, params, x_range, aic=aic)
+
+
+@traced("fit.curve")
+def fit_curve(points, method=METHOD_OLS, family=FAMILY_LINEAR):
+    """Model of an (n, 2) array of (A, C) points for any fit method and family."""
+    model = CalibrationModel.fit_points(points, method=method)
+    if family == FAMILY_LINEAR:
+        return model
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    points = points[points[:, 1] > 0]
+    linear = ([np.nan if model.k is None else model.k], [np.nan if model.b is None else model.b])
+    chosen = select_models(np.log10(points[:, 1]), points[:, 0], family, linear=linear)
+    return _make_model(*chosen[0])
@@ -0,0 +1,160 @@
+# csv_loader.py
+"""Streaming loader for (A, C) point files.
+
+Parses the file in fixed-size chunks straight into a preallocated float64
+buffer instead of building a Python list of tuples, so exports with tens of
+millions of rows load in bounded time and memory. Qt-free: progress and
+cancellation are plain callbacks.
+"""
+import os
+
+import numpy as np
+
+from tracing import traced
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+_SNIFF_LINES = 20
+
+
+class LoadCancelled(Exception):
+    """Raised when the cancel callback asks the loader to stop."""
+
+
+def _parse_pair(line, sep):
+    parts = [p.strip() for p in (line.split(sep) if sep else line.split()) if p.strip() != '']
+    if len(parts) < 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
+
+def sniff_format(path, encoding='utf-8'):
+    """Detect the delimiter and the number of leading lines to skip.
+
+    Like the old line-by-line reader: ',' if the first data line contains a comma,
+    otherwise any whitespace. Leading lines that are not an (A, C) pair (e.g. a
+    header) are skipped. Returns (sep, skiprows) where sep is ',' or None.
+    """
+    skip = 0
+    with open(path, 'r', encoding=encoding) as f:
+        for _ in range(_SNIFF_LINES):
+            line = f.readline()
+            if not line:
+                break
+            stripped = line.strip()
+            if stripped:
+                sep = ',' if ',' in stripped else None
+                if _parse_pair(stripped, sep) is not None:
+                    return sep, skip
+            skip += 1
+    return None, 0
+
+
+def _estimate_rows(path, skiprows, encoding='utf-8'):
+    """Rough row count from the file size and the length of the first lines."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        for _ in range(skiprows):
+            f.readline()
+        sample = [f.readline() for _ in range(_SNIFF_LINES)]
+    sample = [s for s in sample if s]
+    if not sample:
+        return 0
+    avg = sum(len(s) for s in sample) / len(sample)
+    return int(size / max(avg, 1.0) * 1.05) + 16
+
+
+def _iter_lines(path, skiprows, skip_data, chunk_rows, progress, cancel, encoding):
+    """The old line-by-line reader, for files the C parser rejects: every line
+    is split on ',' if it has one, else on whitespace; lines that are not an
+    (A, C) pair are skipped. The first skip_data non-blank lines after the
+    header are assumed to be read already."""
+    total = os.path.getsize(path) or 1
+    with open(path, 'r', encoding=encoding) as f:
+        for _ in range(skiprows):
+            f.readline()
+        block = []
+        read = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if skip_data:
+                skip_data -= 1
+                continue
+            pair = _parse_pair(line, ',' if ',' in line else None)
+            if pair is not None:
+                block.append(pair)
+            read += 1
+            if read == chunk_rows:
+                if cancel is not None and cancel():
+                    raise LoadCancelled()
+                if progress is not None:
+                    progress(min(f.buffer.tell() / total, 1.0))
+                yield np.array(block, dtype=np.float64).reshape(-1, 2)
+                block = []
+                read = 0
+        if block:
+            yield np.array(block, dtype=np.float64).reshape(-1, 2)
+
+
+def iter_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, cancel=None, encoding='utf-8'):
+    """Yield (m, 2) float64 arrays of (A, C) pairs, chunk_rows lines at a time.
+
+    progress(fraction) is called after every chunk with the share of bytes read;
+    cancel() returning True raises LoadCancelled between chunks.
+    Rows with fewer than two numbers are skipped. If the C parser rejects the
+    file (e.g. ';' delimiters, ragged or non-numeric lines), the rest of it is
+    read by the line-by-line parser instead.
+    """
+    import pandas as pd
+
+    sep, skiprows = sniff_format(path, encoding=encoding)
+    total = os.path.getsize(path) or 1
+    done = 0  # non-blank data lines already yielded
+    try:
+        with open(path, 'rb') as fh:
+            reader = pd.read_csv(
+                fh, sep=',' if sep else r'\s+', header=None, names=[0, 1], usecols=[0, 1],
+                index_col=False, skiprows=skiprows, dtype='float64', skip_blank_lines=True,
+                chunksize=chunk_rows, encoding=encoding, engine='c',
+            )
+            for frame in reader:
+                if cancel is not None and cancel():
+                    raise LoadCancelled()
+                block = frame.to_numpy(dtype=np.float64)
+                done += len(block)
+                block = block[~np.isnan(block).any(axis=1)]
+                if progress is not None:
+                    progress(min(fh.tell() / total, 1.0))
+                yield block
+    except ValueError:  # includes pandas' ParserError
+        yield from _iter_lines(path, skiprows, done, chunk_rows, progress, cancel, encoding)
+    if progress is not None:
+        progress(1.0)
+
+
+@traced("parse.csv")
+def load_points(path, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, cancel=None, encoding='utf-8'):
+    """Load a whole (A, C) file into one (n, 2) float64 array.
+
+    The buffer is preallocated from an estimate of the row count and grown
+    geometrically if the estimate was short; chunks are copied into it in place.
+    """
+    sep, skiprows = sniff_format(path, encoding=encoding)
+    buf = np.empty((max(_estimate_rows(path, skiprows, encoding), 16), 2), dtype=np.float64)
+    n = 0
+    for block in iter_chunks(path, chunk_rows, progress=progress, cancel=cancel, encoding=encoding):
+        m = len(block)
+        if n + m > len(buf):
+            grown = np.empty((max(int(len(buf) * 1.5), n + m), 2), dtype=np.float64)
+            grown[:n] = buf[:n]
+            buf = grown
+        buf[n:n + m] = block
+        n += m
+    if n < len(buf) * 0.9:
+        # give back a large overestimate instead of keeping a view on it
+        return buf[:n].copy()
+    return buf[:n]
@@ -0,0 +1,185 @@
+# fleet.py
+"""Fleet calibration: fit every sensor unit in a directory of calibration files.
+
+Each file (editor JSON export or .scal) is one unit. Files are fanned out over
+a ProcessPoolExecutor; workers get only the path and load the data themselves
+(.scal files are memory-mapped, so their arrays come from the shared OS page
+cache instead of being pickled to the worker), fit all substances × conditions
+with the batch fit and send back a few small per-curve statistics. The result
+is one consolidated CSV report with flagged units.
+
+    python app.py fleet DIR REPORT.csv [--workers N] [--min-r2 0.95] [--method huber]
+"""
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from calib_format import load_table
+from csv_loader import LoadCancelled
+from jobs import run_cli
+from robust import METHODS, METHOD_OLS
+
+PATTERNS = ("*.json", "*.scal")
+DEFAULT_MIN_R2 = 0.95
+# robust z-score (median/MAD across the fleet) above which k or b is flagged
+DEFAULT_MAX_Z = 3.5
+
+REPORT_FIELDS = ["unit", "symbol", "condition", "k", "b", "r2", "n",
+                 "resid_rms", "resid_max", "flags"]
+
+
+def list_units(directory, patterns=PATTERNS):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def calibrate_file(path, method=METHOD_OLS):
+    """Worker: fit one unit. Returns a dict of small arrays (or an error string)."""
+    try:
+        table = load_table(path)
+        table.set_method(method)
+        out = {"unit": os.path.basename(path), "symbols": list(table.symbols), "error": None}
+        for cond, name in ((False, "no_water"), (True, "water")):
+            fit = table.fit_all(cond)
+            with np.errstate(invalid='ignore'):
+                resid = fit.residuals
+                rms = np.sqrt(np.nanmean(resid * resid, axis=0)) if resid.size else np.full(len(fit.k), np.nan)
+                rmax = np.nanmax(np.abs(resid), axis=0) if resid.size else np.full(len(fit.k), np.nan)
+            out[name] = {"k": fit.k, "b": fit.b, "r2": fit.r2, "n": fit.n,
+                         "resid_rms": rms, "resid_max": rmax}
+        return out
+    except Exception as e:
+        return {"unit": os.path.basename(path), "symbols": [], "error": str(e)}
+
+
+def _robust_z(values):
+    med = np.nanmedian(values)
+    mad = np.nanmedian(np.abs(values - med)) * 1.4826
+    if not np.isfinite(mad) or mad == 0:
+        return np.zeros_like(values)
+    return (values - med) / mad
+
+
+def build_report(results, min_r2=DEFAULT_MIN_R2, max_z=DEFAULT_MAX_Z):
+    """Flatten worker results into report rows and flag bad curves.
+
+    Flags: ``error`` (file could not be read), ``no_fit``, ``low_r2``, and
+    ``k_outlier``/``b_outlier`` when a unit's coefficient is far from the fleet
+    median for the same substance and condition.
+    """
+    rows = []
+    for res in results:
+        if res["error"] is not None:
+            rows.append({"unit": res["unit"], "symbol": "", "condition": "", "flags": "error: " + res["error"]})
+            continue
+        for cond in ("no_water", "water"):
+            stats = res[cond]
+            for j, sym in enumerate(res["symbols"]):
+                row = {"unit": res["unit"], "symbol": sym, "condition": cond}
+                for key in ("k", "b", "r2", "n", "resid_rms", "resid_max"):
+                    row[key] = stats[key][j]
+                flags = []
+                if not np.isfinite(row["k"]):
+                    flags.append("no_fit")
+                elif not row["r2"] >= min_r2:
+                    flags.append("low_r2")
+                row["_flags"] = flags
+                rows.append(row)
+
+    # fleet-wide outliers per (symbol, condition)
+    groups = {}
+    for i, row in enumerate(rows):
+        if "_flags" in row:
+            groups.setdefault((row["symbol"], row["condition"]), []).append(i)
+    for idx in groups.values():
+        if len(idx) < 3:
+            continue
+        for key in ("k", "b"):
+            z = _robust_z(np.array([rows[i][key] for i in idx], dtype=float))
+            for i, zi in zip(idx, z):
+                if abs(zi) > max_z:
+                    rows[i]["_flags"].append(key + "_outlier")
+    for row in rows:
+        if "_flags" in row:
+            row["flags"] = ";".join(row.pop("_flags"))
+    return rows
+
+
+def write_report(rows, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: ("" if isinstance(v, float) and not np.isfinite(v) else v)
+                             for k, v in row.items()})
+
+
+def run_fleet(paths, workers=None, min_r2=DEFAULT_MIN_R2, max_z=DEFAULT_MAX_Z, progress=None,
+              method=METHOD_OLS, cancel=None):
+    """Fit all units in parallel; returns the report rows.
+
+    cancel() returning True stops with LoadCancelled; queued units are dropped.
+    """
+    results = []
+    workers = workers or os.cpu_count() or 1
+    worker = partial(calibrate_file, method=method)
+    if workers == 1:
+        it = map(worker, paths)
+    else:
+        # run_fleet() runs on a jobs.run_cli worker thread: forking a process
+        # with other threads alive can deadlock the child, so spawn instead
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        chunksize = max(1, len(paths) // (workers * 8))
+        it = executor.map(worker, paths, chunksize=chunksize)
+    try:
+        for i, res in enumerate(it, 1):
+            if cancel is not None and cancel():
+                raise LoadCancelled()
+            results.append(res)
+            if progress is not None:
+                progress(i / max(len(paths), 1))
+    finally:
+        if workers != 1:
+            executor.shutdown(cancel_futures=True)
+    return build_report(results, min_r2=min_r2, max_z=max_z)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py fleet", description="Calibrate every unit in a directory")
+    parser.add_argument("directory", help="directory with calibration files (.json / .scal)")
+    parser.add_argument("report", help="output CSV report")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--min-r2", type=float, default=DEFAULT_MIN_R2)
+    parser.add_argument("--max-z", type=float, default=DEFAULT_MAX_Z)
+    parser.add_argument("--method", choices=list(METHODS), default=METHOD_OLS, help="fit method (default ols)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    args = parser.parse_args(argv)
+
+    paths = list_units(args.directory)
+    if not paths:
+        sys.exit(f"no calibration files in {args.directory}")
+    try:
+        rows = run_cli(run_fleet, paths, workers=args.workers, min_r2=args.min_r2, max_z=args.max_z,
+                       method=args.method, quiet=args.quiet)
+    except LoadCancelled:
+        sys.stderr.write("cancelled\n")
+        return 130
+    write_report(rows, args.report)
+    flagged = sorted({r["unit"] for r in rows if r.get("flags")})
+    print(f"{len(paths)} units, {len(rows)} curves, {len(flagged)} flagged units")
+    for unit in flagged:
+        print("  " + unit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# history_dialog.py
+"""Window with the stored readings over time (timeseries.ReadingStore).
+
+Every view is one store.overview() of the visible time range: the raw
+readings when there are few, otherwise min–max bands and means from the
+rollup level that keeps about OVERVIEW_POINTS buckets, so zooming from
+months down to seconds stays interactive. Zoom/pan re-queries after a short
+pause; 'Обновить' picks up readings recorded since.
+"""
+import datetime
+
+import numpy as np
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton
+from PyQt5.QtCore import QTimer
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+from timeseries import OVERVIEW_POINTS
+from tracing import traced
+
+# pause after the last zoom/pan step before the store is queried again
+REQUERY_MS = 100
+WIDTH_NAMES = {0: "отдельные отсчёты", 1: "1 с", 10: "10 с", 60: "1 мин", 600: "10 мин",
+               3600: "1 ч", 86400: "1 сут"}
+
+
+def _to_num(t):
+    """Epoch seconds → matplotlib date numbers."""
+    return mdates.date2num((np.asarray(t) * 1e6).astype('datetime64[us]'))
+
+
+def _from_num(x):
+    return mdates.num2date(x).timestamp()
+
+
+class HistoryDialog(QDialog):
+    def __init__(self, store, channel_names=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("История измерений")
+        self.resize(900, 520)
+        self.store = store
+        self.channel_names = channel_names or {}
+        self._view = None       # (t0, t1) shown, None = the whole time range
+        self._artists = []
+        self._updating = False  # our own set_xlim must not trigger a re-query
+
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Канал:"))
+        self.cmb_channel = QComboBox()
+        self.cmb_channel.currentIndexChanged.connect(lambda _: self._draw(autoscale_y=True))
+        top.addWidget(self.cmb_channel)
+        top.addWidget(QLabel("Величина:"))
+        self.cmb_value = QComboBox()
+        self.cmb_value.addItems(["C", "A"])
+        self.cmb_value.currentIndexChanged.connect(lambda _: self._draw(autoscale_y=True))
+        top.addWidget(self.cmb_value)
+        btn_all = QPushButton("Весь период")
+        btn_all.clicked.connect(self.show_all)
+        top.addWidget(btn_all)
+        btn_refresh = QPushButton("Обновить")
+        btn_refresh.clicked.connect(self.refresh)
+        top.addWidget(btn_refresh)
+        self.lbl_level = QLabel("")
+        top.addWidget(self.lbl_level, stretch=1)
+        layout.addLayout(top)
+
+        self.fig = Figure(figsize=(8, 4))
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.grid(True)
+        tz = datetime.datetime.now().astimezone().tzinfo
+        locator = mdates.AutoDateLocator(tz=tz)
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=tz))
+        layout.addWidget(NavigationToolbar(self.canvas, self))
+        layout.addWidget(self.canvas)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(REQUERY_MS)
+        self._timer.timeout.connect(self._requery)
+        self.ax.callbacks.connect('xlim_changed', self._on_view_changed)
+
+        self.refresh()
+
+    def _channel_name(self, ch):
+        name = self.channel_names.get(ch)
+        return f"{ch}: {name}" if name else str(ch)
+
+    def refresh(self):
+        current = self.cmb_channel.currentData()
+        self.cmb_channel.blockSignals(True)
+        self.cmb_channel.clear()
+        self.cmb_channel.addItem("все", None)
+        for ch in self.store.channels():
+            self.cmb_channel.addItem(self._channel_name(ch), ch)
+        index = self.cmb_channel.findData(current)
+        self.cmb_channel.setCurrentIndex(max(index, 0))
+        self.cmb_channel.blockSignals(False)
+        self._draw(autoscale_y=True)
+
+    def show_all(self):
+        self._view = None
+        self._draw(autoscale_y=True)
+
+    def _on_view_changed(self, ax):
+        if not self._updating:
+            self._timer.start()
+
+    def _requery(self):
+        x0, x1 = self.ax.get_xlim()
+        self._view = (_from_num(x0), _from_num(x1))
+        self._draw()
+
+    @traced("ui.history_draw")
+    def _draw(self, autoscale_y=False):
+        for artist in self._artists:
+            artist.remove()
+        self._artists = []
+        t0, t1 = self._view if self._view is not None else (-np.inf, np.inf)
+        width, rows = self.store.overview(t0, t1, self.cmb_channel.currentData(), OVERVIEW_POINTS)
+        value = self.cmb_value.currentText().lower()
+        log_y = value == "c"
+
+        lo, hi = [], []
+        for ch in np.unique(rows["channel"]):
+            m = rows["channel"] == ch
+            x = _to_num(rows["t"][m])
+            mean, vmin, vmax = rows[value + "_mean"][m], rows[value + "_min"][m], rows[value + "_max"][m]
+            label = self._channel_name(int(ch))
+            if width == 0:
+                line, = self.ax.plot(x, mean, '.', markersize=3, label=label)
+                self._artists.append(line)
+            else:
+                line, = self.ax.plot(x, mean, drawstyle='steps-post', linewidth=1, label=label)
+                band = self.ax.fill_between(x, vmin, vmax, step='post', alpha=0.3, color=line.get_color())
+                self._artists += [line, band]
+            ok = np.isfinite(vmin) & np.isfinite(vmax) & ((vmin > 0) if log_y else True)
+            if ok.any():
+                lo.append(vmin[ok].min())
+                hi.append(vmax[ok].max())
+
+        self._updating = True
+        try:
+            self.ax.set_yscale('log' if log_y else 'linear')
+            self.ax.set_ylabel(value.upper())
+            if self._view is None and len(rows["t"]):
+                x0, x1 = _to_num([rows["t"].min(), rows["t"].max() + max(width, 1)])
+                self.ax.set_xlim(x0, x1)
+            if autoscale_y and lo:
+                y0, y1 = min(lo), max(hi)
+                if log_y:
+                    self.ax.set_ylim(y0 / 1.5, y1 * 1.5)
+                else:
+                    pad = 0.05 * (y1 - y0) or 1.0
+                    self.ax.set_ylim(y0 - pad, y1 + pad)
+        finally:
+            self._updating = False
+        if self._artists:
+            self.ax.legend(loc='upper left')
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self.lbl_level.setText(f"Шаг: {WIDTH_NAMES.get(width, f'{width} с')}, точек: {len(rows['t'])}"
+                               if len(rows["t"]) else "Нет сохранённых измерений")
+        self.canvas.draw_idle()
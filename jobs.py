@@ -0,0 +1,85 @@
+# jobs.py
+"""Background jobs for file I/O: load/parse/write off the caller's thread.
+
+A job runs ``fn(*args, progress=..., cancel=..., **kwargs)`` on a small
+shared thread pool (file reads, the pandas C parser and json/numpy writes
+release the GIL or are short). The job keeps the latest progress fraction
+and a cancel flag; the caller polls it at its own pace — the GUI from a
+QTimer, like the acquisition ring buffer, the command line from run_cli().
+The result is only handed over when the job is done, so the consumer
+applies it in one step on its own thread. Qt-free.
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+IO_WORKERS = 2
+CLI_POLL_S = 0.1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+        return _executor
+
+
+class Job:
+    """One submitted operation: progress, cancel flag and the future result."""
+
+    def __init__(self, fn, *args, **kwargs):
+        self.progress = 0.0
+        self._cancel = threading.Event()
+        self.future = _pool().submit(fn, *args, progress=self._report, cancel=self._cancel.is_set, **kwargs)
+
+    def _report(self, fraction):
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+
+    def cancel(self):
+        """Ask the job to stop at its next check; it then fails with LoadCancelled."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """The job's return value; re-raises its exception (LoadCancelled when cancelled)."""
+        return self.future.result(timeout)
+
+
+def submit(fn, *args, **kwargs):
+    """Start fn on the I/O pool; fn must accept progress= and cancel= keywords."""
+    return Job(fn, *args, **kwargs)
+
+
+def run_cli(fn, *args, quiet=False, **kwargs):
+    """Run a job from the command line: progress on stderr, Ctrl+C cancels.
+
+    Returns the job's result; after a Ctrl+C waits for the job to stop and
+    raises LoadCancelled (unless it had already finished).
+    """
+    job = submit(fn, *args, **kwargs)
+    try:
+        while True:
+            try:
+                return job.result(timeout=CLI_POLL_S)
+            except FutureTimeout:
+                if not quiet:
+                    sys.stderr.write(f"\r{job.progress * 100:5.1f}%")
+                    sys.stderr.flush()
+    except KeyboardInterrupt:
+        job.cancel()
+        if not quiet:
+            sys.stderr.write("\rcancelling...\n")
+        return job.result()
+    finally:
+        if not quiet:
+            sys.stderr.write("\r" + " " * 8 + "\r")
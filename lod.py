@@ -0,0 +1,198 @@
+# lod.py
+"""Level-of-detail rendering for the calibration scatter plots.
+
+A PointPyramid bins the points once into a square grid at FINEST_BINS per
+axis and then into every coarser power-of-two grid, keeping per occupied
+cell the number of points and one representative point. A view query picks
+the coarsest level whose cells are no larger than a screen pixel, so at most
+one marker per pixel is drawn — the drawn image is the same as with all
+points, just without the overdraw:
+
+- few points in view      → the raw points in view,
+- up to DENSITY_CELLS     → one representative per occupied pixel cell,
+- more                    → a 2-D density image (counts per DENSITY_PIXELS
+                            block, log colour scale), hexbin-style.
+
+Queries only touch the cells of one level, so zooming and panning cost the
+same for a thousand or ten million points. LODScatter wires this to a
+matplotlib scatter artist.
+"""
+import numpy as np
+
+from tracing import traced
+
+FINEST_BINS = 2048
+DIRECT_MAX = 20_000
+DENSITY_CELLS = 50_000
+DENSITY_PIXELS = 4
+
+
+class PointPyramid:
+    """Multi-resolution cell grid over (x, y) plot coordinates."""
+
+    @traced("plot.lod_pyramid")
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        ok = np.isfinite(x) & np.isfinite(y)
+        self.index = np.flatnonzero(ok)
+        x, y = x[ok], y[ok]
+        self.x, self.y = x, y
+        self.n = len(x)
+        if not self.n:
+            self.bounds = (0.0, 1.0, 0.0, 1.0)
+            self.levels = []
+            return
+        x0, x1, y0, y1 = x.min(), x.max(), y.min(), y.max()
+        if x1 <= x0:
+            x0, x1 = x0 - 0.5, x1 + 0.5
+        if y1 <= y0:
+            y0, y1 = y0 - 0.5, y1 + 0.5
+        self.bounds = (x0, x1, y0, y1)
+        bins = FINEST_BINS
+        ix = np.clip(((x - x0) / (x1 - x0) * bins).astype(np.int64), 0, bins - 1)
+        iy = np.clip(((y - y0) / (y1 - y0) * bins).astype(np.int64), 0, bins - 1)
+        codes, first, counts = np.unique(ix * bins + iy, return_index=True, return_counts=True)
+        rep = first
+        self.levels = []
+        while True:
+            cx, cy = codes // bins, codes % bins
+            self.levels.append({"bins": bins, "ix": cx, "iy": cy, "rep": rep, "count": counts})
+            if bins == 1:
+                break
+            bins //= 2
+            codes, first, inverse = np.unique((cx >> 1) * bins + (cy >> 1), return_index=True, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts).astype(np.int64)
+            rep = rep[first]
+        # x-sorted order for raw range queries
+        self._xorder = np.argsort(x, kind='stable')
+        self._xsorted = x[self._xorder]
+
+    def _level_for(self, view, width_px, height_px):
+        x0, x1, y0, y1 = self.bounds
+        vx0, vx1, vy0, vy1 = view
+        need = max((x1 - x0) / max(vx1 - vx0, 1e-300) * width_px,
+                   (y1 - y0) / max(vy1 - vy0, 1e-300) * height_px)
+        for i in range(len(self.levels) - 1, -1, -1):
+            if self.levels[i]["bins"] >= need:
+                return i
+        return 0
+
+    def _cells_in_view(self, level, view):
+        x0, x1, y0, y1 = self.bounds
+        vx0, vx1, vy0, vy1 = view
+        bins = level["bins"]
+        cw, ch = (x1 - x0) / bins, (y1 - y0) / bins
+        ix0, ix1 = np.floor((vx0 - x0) / cw), np.floor((vx1 - x0) / cw)
+        iy0, iy1 = np.floor((vy0 - y0) / ch), np.floor((vy1 - y0) / ch)
+        ix, iy = level["ix"], level["iy"]
+        return (ix >= ix0) & (ix <= ix1) & (iy >= iy0) & (iy <= iy1)
+
+    def query(self, view, width_px, height_px):
+        """What to draw for view = (x0, x1, y0, y1) on a width × height pixel axes.
+
+        Returns ("points", indices into the original arrays) or
+        ("density", x_edges, y_edges, counts[nx, ny]).
+        """
+        if not self.n:
+            return ("points", self.index)
+        li = self._level_for(view, width_px, height_px)
+        level = self.levels[li]
+        sel = self._cells_in_view(level, view)
+        if level["count"][sel].sum() <= DIRECT_MAX:
+            vx0, vx1, vy0, vy1 = view
+            lo = np.searchsorted(self._xsorted, vx0, side='left')
+            hi = np.searchsorted(self._xsorted, vx1, side='right')
+            cand = self._xorder[lo:hi]
+            yc = self.y[cand]
+            return ("points", self.index[cand[(yc >= vy0) & (yc <= vy1)]])
+        if sel.sum() <= DENSITY_CELLS:
+            return ("points", self.index[level["rep"][sel]])
+        # density image a few pixels per block
+        coarse = min(li + int(np.log2(DENSITY_PIXELS)), len(self.levels) - 1)
+        level = self.levels[coarse]
+        sel = self._cells_in_view(level, view)
+        ix, iy, cnt = level["ix"][sel], level["iy"][sel], level["count"][sel]
+        bx0, by0 = ix.min(), iy.min()
+        img = np.zeros((ix.max() - bx0 + 1, iy.max() - by0 + 1))
+        img[ix - bx0, iy - by0] = cnt
+        x0, x1, y0, y1 = self.bounds
+        bins = level["bins"]
+        x_edges = x0 + (x1 - x0) / bins * np.arange(bx0, bx0 + img.shape[0] + 1)
+        y_edges = y0 + (y1 - y0) / bins * np.arange(by0, by0 + img.shape[1] + 1)
+        return ("density", x_edges, y_edges, img)
+
+
+class LODScatter:
+    """Keeps a matplotlib scatter artist at one marker per pixel (or a density
+    image) for the current view of its axes.
+
+    ``log_x`` means the axes x scale is logarithmic: the pyramid is built on
+    log10(x) so that cells are square on screen.
+    """
+
+    def __init__(self, ax, scatter, log_x=False):
+        self.ax = ax
+        self.scatter = scatter
+        self.log_x = log_x
+        self.mesh = None
+        self._x = self._y = np.empty(0)
+        self._source = None
+        self._pyramid = None
+        self._last_view = None
+
+    def set_data(self, x, y, source=None, log_x=None):
+        """New points; the pyramid is rebuilt only when ``source`` (the array
+        the points were derived from) is a different object or the x scale
+        changed."""
+        self._x, self._y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if log_x is not None and log_x != self.log_x:
+            self.log_x = log_x
+            self._source = None
+        if source is None or source is not self._source or self._pyramid is None:
+            self._source = source
+            self._pyramid = None
+            if len(self._x) > DIRECT_MAX:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    px = np.log10(self._x) if self.log_x else self._x
+                self._pyramid = PointPyramid(px, self._y)
+        self._last_view = None
+
+    def _clear_mesh(self):
+        if self.mesh is not None:
+            self.mesh.remove()
+            self.mesh = None
+
+    @traced("plot.lod_update")
+    def update(self):
+        """Recompute what is drawn for the current view; True if anything changed."""
+        if self._pyramid is None:
+            if self._last_view == "direct":
+                return False
+            self._clear_mesh()
+            self.scatter.set_offsets(np.column_stack((self._x, self._y)) if len(self._x) else np.empty((0, 2)))
+            self._last_view = "direct"
+            return True
+        (vx0, vx1), (vy0, vy1) = self.ax.get_xlim(), self.ax.get_ylim()
+        if self.log_x:
+            vx0, vx1 = np.log10(max(vx0, 1e-300)), np.log10(max(vx1, 1e-300))
+        bbox = self.ax.bbox
+        view = (min(vx0, vx1), max(vx0, vx1), min(vy0, vy1), max(vy0, vy1), int(bbox.width), int(bbox.height))
+        if view == self._last_view:
+            return False
+        self._last_view = view
+        result = self._pyramid.query(view[:4], max(view[4], 1), max(view[5], 1))
+        self._clear_mesh()
+        if result[0] == "points":
+            idx = result[1]
+            self.scatter.set_offsets(np.column_stack((self._x[idx], self._y[idx])))
+        else:
+            from matplotlib.colors import LogNorm
+            _, x_edges, y_edges, img = result
+            if self.log_x:
+                x_edges = 10.0 ** x_edges
+            self.scatter.set_offsets(np.empty((0, 2)))
+            self.mesh = self.ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(img.T, 0),
+                                           norm=LogNorm(vmin=1, vmax=max(img.max(), 1)),
+                                           cmap='viridis', zorder=2)
+        return True
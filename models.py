@@ -0,0 +1,332 @@
+# models.py
+"""Nonlinear calibration curves for sensors that saturate at high C.
+
+Families, with x = log10(C):
+
+    logquad   A = q·x² + k·x + b
+    hill      A = top / (1 + 10^(h·(x50 - x)))
+    4pl       A = bottom + (top - bottom) / (1 + 10^(h·(x50 - x)))
+
+log-quadratic is linear in its parameters and solved in closed form; Hill and
+4PL are fitted by Levenberg–Marquardt with every column of the table in the
+same iteration (stacked Jacobians, one batched solve of the damped normal
+equations per step). Families are compared by AIC.
+
+The inverse C(A) of a fitted curve is not solved per sample: CurveModel
+tabulates A on a dense log10(C) grid once, keeps the monotone branch that
+contains the data, and answers predict_C() with np.interp plus one
+vectorized Newton correction.
+"""
+import math
+
+import numpy as np
+
+from tracing import traced
+
+FAMILY_LINEAR = "linear"
+FAMILY_AUTO = "auto"
+FAMILIES = {
+    "linear": "лог-линейная",
+    "logquad": "лог-квадратичная",
+    "hill": "Хилл",
+    "4pl": "4PL",
+}
+N_PARAMS = {"linear": 2, "logquad": 3, "hill": 3, "4pl": 4}
+
+LM_MAX_ITER = 200
+LM_TOL = 1e-12
+# points of the inverse lookup table and its extension beyond the data (decades)
+INVERSE_GRID = 2049
+INVERSE_PAD = 1.0
+
+_LN10 = math.log(10.0)
+
+
+def check_family(family):
+    if family not in FAMILIES and family != FAMILY_AUTO:
+        raise ValueError(f"неизвестная модель: {family} (допустимо: {', '.join(FAMILIES)}, {FAMILY_AUTO})")
+    return family
+
+
+def aic(rss, n, p):
+    """Akaike information criterion of a least-squares fit (NaN if undefined)."""
+    rss = np.asarray(rss, dtype=float)
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # an exact fit would give -inf; floor the RSS at rounding level
+        out = n * np.log(np.maximum(rss, 1e-30) / n) + 2 * p
+    return np.where((n > p) & np.isfinite(rss), out, np.nan)
+
+
+# -----------------------------
+# Curve functions
+# -----------------------------
+def _logistic_parts(x, x50, h):
+    z = np.clip(h * (x50 - x) * _LN10, -700, 700)
+    E = np.exp(z)
+    return E, 1.0 + E
+
+
+def evaluate(family, params, x):
+    """A(x) for parameters of shape (p,) or (m, p) broadcast against x."""
+    P = np.moveaxis(np.asarray(params, dtype=float), -1, 0)
+    if family == "linear":
+        k, b = P
+        return k * x + b
+    if family == "logquad":
+        q, k, b = P
+        return (q * x + k) * x + b
+    if family == "hill":
+        top, x50, h = P
+        return top / _logistic_parts(x, x50, h)[1]
+    if family == "4pl":
+        bottom, top, x50, h = P
+        return bottom + (top - bottom) / _logistic_parts(x, x50, h)[1]
+    raise ValueError(family)
+
+
+def derivative(family, params, x):
+    """dA/dx, used for the Newton correction of the inverse."""
+    P = np.moveaxis(np.asarray(params, dtype=float), -1, 0)
+    if family == "linear":
+        return np.broadcast_to(P[0], np.shape(x)) * 1.0
+    if family == "logquad":
+        q, k, _b = P
+        return 2 * q * x + k
+    if family == "hill":
+        top, x50, h = P
+        span = top
+    else:
+        bottom, top, x50, h = P
+        span = top - bottom
+    E, D = _logistic_parts(x, x50, h)
+    return span * h * _LN10 * E / (D * D)
+
+
+def _jacobian(family, P, X):
+    """(n, m, p) Jacobian of the logistic families; P has shape (m, p)."""
+    if family == "hill":
+        top, x50, h = P.T
+        span = top
+    else:
+        bottom, top, x50, h = P.T
+        span = top - bottom
+    E, D = _logistic_parts(X, x50, h)
+    inv = 1.0 / D
+    common = -span * E * _LN10 * inv * inv
+    d_x50 = common * h
+    d_h = common * (x50 - X)
+    if family == "hill":
+        return np.stack((inv, d_x50, d_h), axis=-1)
+    return np.stack((1.0 - inv, inv, d_x50, d_h), axis=-1)
+
+
+# -----------------------------
+# Batched fits over columns
+# -----------------------------
+def _prepare(x, Y, mask):
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    x = np.asarray(x, dtype=float)
+    X = np.broadcast_to(x[:, None] if x.ndim == 1 else x, Y.shape)
+    W = np.isfinite(X) & np.isfinite(Y)
+    if mask is not None:
+        W &= np.broadcast_to(mask if np.ndim(mask) == 2 else np.asarray(mask)[:, None], Y.shape)
+    return np.where(W, X, 0.0), np.where(W, Y, 0.0), W
+
+
+def _rss(family, P, X, Y, W):
+    with np.errstate(invalid='ignore', over='ignore'):
+        r = np.where(W, Y - evaluate(family, P[None], X), 0.0)
+    return (r * r).sum(axis=0)
+
+
+def _fit_logquad(X, Y, W):
+    Wf = W.astype(float)
+    powers = [(Wf * X ** e).sum(axis=0) for e in range(5)]
+    # normal equations in the basis (x², x, 1): M[i, j] = Σ x^(4 - i - j)
+    M = np.stack([powers[4 - i - j] for i in range(3) for j in range(3)], axis=-1).reshape(-1, 3, 3)
+    rhs = np.stack([(Wf * X ** e * Y).sum(axis=0) for e in (2, 1, 0)], axis=-1)
+    P = np.einsum('mij,mj->mi', np.linalg.pinv(M), rhs)
+    P[W.sum(axis=0) < 3] = np.nan
+    return P
+
+
+def _initial_logistic(family, X, Y, W):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Yn = np.where(W, Y, np.nan)
+        Xn = np.where(W, X, np.nan)
+        lo, hi = np.nanmin(Yn, axis=0), np.nanmax(Yn, axis=0)
+        span = hi - lo
+        # slope sign from the linear fit decides which end is the top
+        xm, ym = np.nanmean(Xn, axis=0), np.nanmean(Yn, axis=0)
+        k = np.nansum((Xn - xm) * (Yn - ym), axis=0) / np.nansum((Xn - xm) ** 2, axis=0)
+        x50 = xm
+        if family == "hill":
+            top = np.where(k >= 0, hi + 0.1 * span, lo - 0.1 * span)
+            h = 4 * k / (top * _LN10)
+            return np.column_stack((top, x50, h))
+        bottom, top = lo - 0.1 * span, hi + 0.1 * span
+        h = 4 * k / ((top - bottom) * _LN10)
+        return np.column_stack((bottom, top, x50, h))
+
+
+def _fit_logistic(family, X, Y, W):
+    """Levenberg–Marquardt for all columns at once."""
+    P = _initial_logistic(family, X, Y, W)
+    m, p = P.shape
+    ok = (W.sum(axis=0) > p) & np.isfinite(P).all(axis=1)
+    P[~ok] = np.nan
+    lam = np.full(m, 1e-3)
+    rss = _rss(family, np.where(ok[:, None], P, 0.0), X, Y, W)
+    active = ok.copy()
+    eye = np.eye(p)
+    for _ in range(LM_MAX_ITER):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        Pa = P[idx]
+        Xa, Ya, Wa = X[:, idx], Y[:, idx], W[:, idx]
+        with np.errstate(invalid='ignore', over='ignore'):
+            r = np.where(Wa, Ya - evaluate(family, Pa[None], Xa), 0.0)
+            J = _jacobian(family, Pa, Xa) * Wa[..., None]
+        JTJ = np.einsum('nmp,nmq->mpq', J, J)
+        g = np.einsum('nmp,nm->mp', J, r)
+        diag = np.einsum('mpp->mp', JTJ)
+        A = JTJ + (lam[idx, None] * np.maximum(diag, 1e-12))[:, :, None] * eye
+        step = np.einsum('mij,mj->mi', np.linalg.pinv(A), g)
+        P_new = Pa + step
+        rss_new = _rss(family, P_new, Xa, Ya, Wa)
+        better = np.isfinite(rss_new) & (rss_new <= rss[idx])
+        gain = np.where(better, rss[idx] - rss_new, 0.0)
+        P[idx[better]] = P_new[better]
+        rss[idx[better]] = rss_new[better]
+        lam[idx] = np.where(better, lam[idx] / 3, lam[idx] * 3)
+        small = better & (gain <= LM_TOL * np.maximum(rss[idx], 1e-300))
+        active[idx[small | (lam[idx] > 1e12)]] = False
+    P[~ok] = np.nan
+    return P
+
+
+@traced("fit.family")
+def fit_family_columns(x, Y, family, mask=None):
+    """Fit one family to every column. Returns {"params" (m, p), "rss", "n", "aic"}."""
+    X, Yw, W = _prepare(x, Y, mask)
+    if family == "linear":
+        Wf = W.astype(float)
+        n = Wf.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mx, my = (Wf * X).sum(axis=0) / n, (Wf * Yw).sum(axis=0) / n
+            dx = np.where(W, X - mx, 0.0)
+            k = (dx * np.where(W, Yw - my, 0.0)).sum(axis=0) / (dx * dx).sum(axis=0)
+        P = np.column_stack((k, my - k * mx))
+        P[n < 2] = np.nan
+    elif family == "logquad":
+        P = _fit_logquad(X, Yw, W)
+    elif family in ("hill", "4pl"):
+        P = _fit_logistic(family, X, Yw, W)
+    else:
+        raise ValueError(f"неизвестная модель: {family}")
+    n = W.sum(axis=0)
+    rss = np.where(np.isfinite(P).all(axis=1), _rss(family, np.nan_to_num(P), X, Yw, W), np.nan)
+    return {"params": P, "rss": rss, "n": n, "aic": aic(rss, n, N_PARAMS[family])}
+
+
+# -----------------------------
+# Fitted curve with tabulated inverse
+# -----------------------------
+class CurveModel:
+    """A fitted curve of one family; same predict_A/predict_C interface as
+    calibration.CalibrationModel, with the inverse served from a lookup table."""
+
+    def __init__(self, family, params, x_range, aic=None):
+        self.family = family
+        self.params = np.asarray(params, dtype=float)
+        self.aic = aic
+        self._inv_A = self._inv_x = None
+        lo, hi = x_range
+        if np.isfinite(self.params).all() and np.isfinite(lo) and np.isfinite(hi):
+            self._build_inverse(lo, hi)
+
+    def _build_inverse(self, lo, hi):
+        grid = np.linspace(lo - INVERSE_PAD, hi + INVERSE_PAD, INVERSE_GRID)
+        A = evaluate(self.family, self.params, grid)
+        d = np.sign(np.diff(A))
+        # monotone branch around the middle of the data
+        mid = int(np.searchsorted(grid, 0.5 * (lo + hi)))
+        mid = min(max(mid, 0), len(d) - 1)
+        sign = d[mid]
+        if sign == 0 or not np.isfinite(A).all():
+            return
+        start = mid
+        while start > 0 and d[start - 1] == sign:
+            start -= 1
+        stop = mid
+        while stop < len(d) - 1 and d[stop + 1] == sign:
+            stop += 1
+        x_seg, A_seg = grid[start:stop + 2], A[start:stop + 2]
+        if sign < 0:
+            x_seg, A_seg = x_seg[::-1], A_seg[::-1]
+        self._inv_x, self._inv_A = x_seg, A_seg
+        self._x_min, self._x_max = x_seg.min(), x_seg.max()
+
+    @property
+    def is_valid(self):
+        return self._inv_A is not None
+
+    def describe(self):
+        p = self.params
+        if self.family == "logquad":
+            return f"A = {p[0]:.6f}·x² + {p[1]:.6f}·x + {p[2]:.6f}, x = log10(C)"
+        if self.family == "hill":
+            return f"A = {p[0]:.6f} / (1 + 10^({p[2]:.4f}·({p[1]:.4f} − log10 C)))"
+        if self.family == "4pl":
+            return f"A = {p[0]:.6f} + {p[1] - p[0]:.6f} / (1 + 10^({p[3]:.4f}·({p[2]:.4f} − log10 C)))"
+        return f"A = {p[0]:.6f}·log10(C) + {p[1]:.6f}"
+
+    def predict_A(self, C):
+        if not self.is_valid:
+            return None
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return evaluate(self.family, self.params, np.log10(np.asarray(C, dtype=float)))
+
+    def predict_C(self, A):
+        """Inverse by table lookup + one Newton step; NaN outside the monotone branch."""
+        if not self.is_valid:
+            return None
+        A = np.asarray(A, dtype=float)
+        x = np.interp(A, self._inv_A, self._inv_x, left=np.nan, right=np.nan)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            dx = (evaluate(self.family, self.params, x) - A) / derivative(self.family, self.params, x)
+            x = np.clip(x - np.where(np.isfinite(dx), dx, 0.0), self._x_min, self._x_max)
+            return 10 ** x
+
+
+def select_models(x, Y, family, linear=None, mask=None):
+    """Pick the curve of every column: the given family, or for "auto" the
+    family with the lowest AIC (log-linear when nothing else is defined).
+
+    ``linear`` optionally supplies (k, b) arrays of an existing linear fit
+    (e.g. a robust one) to use instead of refitting. Returns a list of
+    (family, params, aic, (x_min, x_max)) per column.
+    """
+    X, Yw, W = _prepare(x, Y, mask)
+    families = list(FAMILIES) if family == FAMILY_AUTO else [check_family(family)]
+    fits = []
+    for fam in families:
+        if fam == FAMILY_LINEAR and linear is not None:
+            P = np.column_stack([np.asarray(v, dtype=float).ravel() for v in linear])
+            n = W.sum(axis=0)
+            rss = np.where(np.isfinite(P).all(axis=1), _rss(fam, np.nan_to_num(P), X, Yw, W), np.nan)
+            fits.append({"params": P, "aic": aic(rss, n, N_PARAMS[fam])})
+        else:
+            fits.append(fit_family_columns(x, Y, fam, mask=mask))
+    scores = np.vstack([f["aic"] for f in fits])
+    best = np.argmin(np.where(np.isfinite(scores), scores, np.inf), axis=0)
+    x_min = np.min(np.where(W, X, np.inf), axis=0)
+    x_max = np.max(np.where(W, X, -np.inf), axis=0)
+    out = []
+    for j, i in enumerate(best):
+        out.append((families[i], fits[i]["params"][j], scores[i, j], (x_min[j], x_max[j])))
+    return out
@@ -0,0 +1,97 @@
+# points_model.py
+"""Qt list model over an (n, 2) array of (A, C) points.
+
+The model keeps a reference to the array, never a copy: a row is formatted
+only when the view asks for it (QListView with uniform item sizes asks only
+for the visible ones). Sorting and filtering work on an index array into
+the points, so a million points cost one argsort / one boolean mask and
+8 bytes per shown row.
+"""
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+# sort keys: (column of the points array, descending)
+SORT_KEYS = {
+    "none": None,
+    "a_asc": (0, False),
+    "a_desc": (0, True),
+    "c_asc": (1, False),
+    "c_desc": (1, True),
+}
+
+
+class PointListModel(QAbstractListModel):
+    def __init__(self, points=None, parent=None):
+        super().__init__(parent)
+        self._points = np.empty((0, 2)) if points is None else points
+        self._sort = None
+        self._ranges = (None, None)   # (A range, C range), each (lo, hi) or None
+        self._rows = None             # shown rows (indices into _points); None = all, in order
+
+    # ---------- data ----------
+    def set_points(self, points):
+        """Show a new points array (kept by reference); sort and filter stay."""
+        self.beginResetModel()
+        self._points = points
+        self._update_rows()
+        self.endResetModel()
+
+    def set_sort(self, key):
+        self.beginResetModel()
+        self._sort = SORT_KEYS[key]
+        self._update_rows()
+        self.endResetModel()
+
+    def set_filter(self, a_range=None, c_range=None):
+        """Show only points with A and C inside the given (lo, hi) ranges;
+        None (or a None bound) means unbounded."""
+        self.beginResetModel()
+        self._ranges = (a_range, c_range)
+        self._update_rows()
+        self.endResetModel()
+
+    def _update_rows(self):
+        pts = self._points
+        rows = None
+        mask = None
+        for col, rng in enumerate(self._ranges):
+            if rng is None:
+                continue
+            lo, hi = rng
+            with np.errstate(invalid='ignore'):
+                if lo is not None:
+                    m = pts[:, col] >= lo
+                    mask = m if mask is None else mask & m
+                if hi is not None:
+                    m = pts[:, col] <= hi
+                    mask = m if mask is None else mask & m
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+        if self._sort is not None:
+            col, descending = self._sort
+            keys = pts[:, col] if rows is None else pts[rows, col]
+            order = np.argsort(keys, kind='stable')
+            if descending:
+                order = order[::-1]
+            rows = order if rows is None else rows[order]
+        self._rows = rows
+
+    def source_row(self, row):
+        """Index into the points array of a shown row."""
+        return row if self._rows is None else int(self._rows[row])
+
+    @property
+    def total(self):
+        return len(self._points)
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._points) if self._rows is None else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        a, c = self._points[self.source_row(index.row())]
+        return f"A={a}    C={c}"
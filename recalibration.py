@@ -0,0 +1,384 @@
+# recalibration.py
+"""Online recalibration of drifting sensors: recursive least squares with forgetting.
+
+RunningFit weighs every point equally, forever. An electrode that drifts
+over days needs the opposite: each new reference sample (A measured at a
+known C) should pull k and b towards the present while older samples fade
+out. Recursive least squares with forgetting factor λ minimizes
+
+    Σ_i λ^(n-i) · (A_i − k·log10(C_i) − b)²
+
+so a sample's weight halves every ln 2 / (1 − λ) samples (about 1/(1 − λ)
+samples of memory: λ = 0.99 remembers ~100, λ = 1 never forgets and gives
+ordinary least squares). Each sample is an O(1) update of (k, b) and of the
+2×2 matrix P (the inverse of the weighted normal matrix, symmetric, kept as
+three numbers).
+
+- RecursiveFit: one curve, plain floats (a few µs per sample).
+- RecursiveFitBank: many channels as arrays; update() takes one sample per
+  channel (NaN where a channel has none) in one vectorized step.
+- DriftMonitor: flags channels whose k moved by more than k_tol (relative)
+  or b by more than b_tol (A units) from a reference calibration. At fixed
+  k an offset δb shifts the predicted C by the factor 10^(δb/k).
+
+Without fresh excitation (the same C over and over), forgetting lets P
+grow without bound in the unexcited direction ("windup"); the trace of P
+is capped at MAX_TRACE to keep the estimate stable.
+
+    python app.py recal REFERENCES.csv OUTPUT.csv [--forgetting 0.99] [--initial K_B.csv]
+"""
+import argparse
+import math
+import sys
+
+import numpy as np
+
+from calibration import CalibrationModel
+from tracing import traced
+
+DEFAULT_FORGETTING = 0.99
+# initial P without a prior: the first samples determine (k, b) almost alone
+DEFAULT_P0 = 1e6
+# initial P when starting from a known calibration: worth a few reference samples
+PRIOR_P0 = 1.0
+MAX_TRACE = 1e6
+DEFAULT_K_TOL = 0.05   # relative change of the slope
+DEFAULT_B_TOL = 0.01   # change of the intercept, A units
+# samples a channel without a reference calibration needs before its estimate becomes the reference
+WARMUP_SAMPLES = 20
+
+
+def _check_forgetting(forgetting):
+    forgetting = np.asarray(forgetting, dtype=float)
+    if not ((forgetting > 0) & (forgetting <= 1)).all():
+        raise ValueError("коэффициент забывания должен быть в (0, 1]")
+    return forgetting
+
+
+# -----------------------------
+# One curve
+# -----------------------------
+class RecursiveFit:
+    """RLS of A on x = log10(C) with forgetting factor; O(1) per sample.
+
+    Points with C <= 0 (or non-finite values) are ignored, as in
+    CalibrationModel.fit(). k and b are None until two samples were seen.
+    """
+
+    def __init__(self, forgetting=DEFAULT_FORGETTING, k=None, b=None, p0=None):
+        self.forgetting = float(_check_forgetting(forgetting))
+        prior = k is not None and b is not None
+        self.n = 2 if prior else 0  # a prior calibration counts as fitted
+        self._k = float(k) if prior else 0.0
+        self._b = float(b) if prior else 0.0
+        if p0 is None:
+            p0 = PRIOR_P0 if prior else DEFAULT_P0
+        self.p00, self.p01, self.p11 = float(p0), 0.0, float(p0)
+
+    @classmethod
+    @traced("fit.rls_from_points")
+    def from_points(cls, points, forgetting=DEFAULT_FORGETTING):
+        """The state after feeding (A, C) points in order, computed in one vectorized pass."""
+        fit = cls(forgetting)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        A, C = points[:, 0], points[:, 1]
+        mask = np.isfinite(A) & (C > 0)
+        x, y = np.log10(C[mask]), A[mask]
+        n = len(x)
+        if n < 2:
+            fit.add_many(A, C)
+            return fit
+        # the weighted normal equations the recursion would have built
+        w = fit.forgetting ** np.arange(n - 1, -1, -1, dtype=float)
+        sw, sx, sxx = w.sum(), w @ x, w @ (x * x)
+        sy, sxy = w @ y, w @ (x * y)
+        det = sw * sxx - sx * sx
+        if not det > 1e-12 * sw * sxx:
+            fit.add_many(A, C)  # all at one concentration: let the recursion handle it
+            return fit
+        fit._k = (sw * sxy - sx * sy) / det
+        fit._b = (sxx * sy - sx * sxy) / det
+        fit.p00, fit.p01, fit.p11 = sw / det, -sx / det, sxx / det
+        fit.n = n
+        fit._limit_trace()
+        return fit
+
+    def add(self, x, y):
+        """One sample in (x = log10(C), y = A)."""
+        lam = self.forgetting
+        p00, p01, p11 = self.p00, self.p01, self.p11
+        g0 = p00 * x + p01          # P·φ, φ = (x, 1)
+        g1 = p01 * x + p11
+        s = lam + x * g0 + g1
+        e = y - (self._k * x + self._b)
+        self._k += g0 / s * e
+        self._b += g1 / s * e
+        self.p00 = (p00 - g0 * g0 / s) / lam
+        self.p01 = (p01 - g0 * g1 / s) / lam
+        self.p11 = (p11 - g1 * g1 / s) / lam
+        self.n += 1
+        if lam < 1.0:
+            self._limit_trace()
+
+    def _limit_trace(self):
+        trace = self.p00 + self.p11
+        if trace > MAX_TRACE:
+            f = MAX_TRACE / trace
+            self.p00 *= f
+            self.p01 *= f
+            self.p11 *= f
+
+    def add_point(self, A, C):
+        if C > 0 and math.isfinite(A):
+            self.add(math.log10(C), A)
+
+    def add_many(self, A, C):
+        """Add arrays of points in order (one O(1) update each)."""
+        A = np.asarray(A, dtype=float).ravel()
+        C = np.asarray(C, dtype=float).ravel()
+        mask = np.isfinite(A) & (C > 0)
+        for x, y in zip(np.log10(C[mask]).tolist(), A[mask].tolist()):
+            self.add(x, y)
+
+    # ---------- results ----------
+    @property
+    def k(self):
+        return self._k if self.n >= 2 else None
+
+    @property
+    def b(self):
+        return self._b if self.n >= 2 else None
+
+    @property
+    def memory(self):
+        """Effective number of samples remembered, 1/(1 − λ) (inf without forgetting)."""
+        return math.inf if self.forgetting >= 1.0 else 1.0 / (1.0 - self.forgetting)
+
+    def model(self):
+        return CalibrationModel(self.k, self.b)
+
+
+# -----------------------------
+# Many channels
+# -----------------------------
+class RecursiveFitBank:
+    """RecursiveFit for n channels at once; state as arrays of shape (n,).
+
+    forgetting may differ per channel. k/b of channels with fewer than two
+    samples are NaN.
+    """
+
+    def __init__(self, n_channels, forgetting=DEFAULT_FORGETTING, k=None, b=None, p0=None):
+        n = int(n_channels)
+        self.forgetting = np.broadcast_to(_check_forgetting(forgetting), (n,)).copy()
+        k = np.full(n, np.nan) if k is None else np.array(k, dtype=float).reshape(n)
+        b = np.full(n, np.nan) if b is None else np.array(b, dtype=float).reshape(n)
+        prior = np.isfinite(k) & np.isfinite(b)  # channels starting from a known calibration
+        self.n = np.where(prior, 2, 0).astype(np.int64)
+        self._k = np.where(prior, k, 0.0)
+        self._b = np.where(prior, b, 0.0)
+        self.p00 = np.where(prior, PRIOR_P0, DEFAULT_P0) if p0 is None else np.full(n, float(p0))
+        self.p01 = np.zeros(n)
+        self.p11 = self.p00.copy()
+
+    def __len__(self):
+        return len(self.n)
+
+    @traced("fit.rls_bank_update")
+    def update(self, A, C):
+        """One sample per channel (arrays of shape (n,)); NaN A or C <= 0 leaves a channel as is."""
+        A = np.asarray(A, dtype=float)
+        C = np.asarray(C, dtype=float)
+        use = np.isfinite(A) & (C > 0)
+        if not use.any():
+            return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(use, np.log10(np.where(use, C, 1.0)), 0.0)
+        y = np.where(use, A, 0.0)
+        lam = self.forgetting
+        p00, p01, p11 = self.p00, self.p01, self.p11
+        g0 = p00 * x + p01
+        g1 = p01 * x + p11
+        s = lam + x * g0 + g1
+        e = y - (self._k * x + self._b)
+        self._k = np.where(use, self._k + g0 / s * e, self._k)
+        self._b = np.where(use, self._b + g1 / s * e, self._b)
+        q00 = (p00 - g0 * g0 / s) / lam
+        q01 = (p01 - g0 * g1 / s) / lam
+        q11 = (p11 - g1 * g1 / s) / lam
+        # windup cap, as in RecursiveFit
+        f = np.minimum(1.0, MAX_TRACE / (q00 + q11))
+        self.p00 = np.where(use, q00 * f, p00)
+        self.p01 = np.where(use, q01 * f, p01)
+        self.p11 = np.where(use, q11 * f, p11)
+        self.n += use
+
+    def update_series(self, A, C):
+        """Samples of shape (T, n): T update() steps in time order."""
+        A = np.asarray(A, dtype=float)
+        C = np.asarray(C, dtype=float)
+        for a, c in zip(A, C):
+            self.update(a, c)
+
+    @property
+    def k(self):
+        return np.where(self.n >= 2, self._k, np.nan)
+
+    @property
+    def b(self):
+        return np.where(self.n >= 2, self._b, np.nan)
+
+    def channel(self, i):
+        """Channel i as a RecursiveFit (a copy of its state)."""
+        fit = RecursiveFit(self.forgetting[i])
+        fit.n = int(self.n[i])
+        fit._k, fit._b = float(self._k[i]), float(self._b[i])
+        fit.p00, fit.p01, fit.p11 = float(self.p00[i]), float(self.p01[i]), float(self.p11[i])
+        return fit
+
+    def model(self, i):
+        k, b = self.k[i], self.b[i]
+        return CalibrationModel(k, b) if np.isfinite(k) and np.isfinite(b) else CalibrationModel()
+
+
+# -----------------------------
+# Drift monitor
+# -----------------------------
+class DriftMonitor:
+    """Compares running k, b of n channels with a reference calibration.
+
+    A channel is flagged while |k − k_ref| > k_tol·|k_ref| or |b − b_ref| > b_tol.
+    Channels without a reference (NaN/None) take the first valid values
+    they are checked with once ``ready`` (e.g. after WARMUP_SAMPLES). Every change into the flagged state is kept in
+    ``events`` as {"t", "channel", "k", "b", "dk", "db"}.
+    """
+
+    def __init__(self, k_ref, b_ref, k_tol=DEFAULT_K_TOL, b_tol=DEFAULT_B_TOL):
+        self.k_ref = np.atleast_1d(np.array(k_ref, dtype=float))
+        self.b_ref = np.atleast_1d(np.array(b_ref, dtype=float))
+        self.k_tol = float(k_tol)
+        self.b_tol = float(b_tol)
+        self.flagged = np.zeros(len(self.k_ref), dtype=bool)
+        self.dk = np.zeros(len(self.k_ref))  # relative
+        self.db = np.zeros(len(self.k_ref))
+        self.events = []
+
+    def check(self, k, b, t=None, ready=True):
+        """Update with the current k, b (arrays, or scalars for one channel); returns
+        the boolean array of channels that have just become flagged."""
+        k = np.atleast_1d(np.array(k, dtype=float))
+        b = np.atleast_1d(np.array(b, dtype=float))
+        valid = np.isfinite(k) & np.isfinite(b)
+        unset = ~(np.isfinite(self.k_ref) & np.isfinite(self.b_ref))
+        take = unset & valid & ready
+        self.k_ref[take] = k[take]
+        self.b_ref[take] = b[take]
+        valid &= ~unset | take
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dk = np.where(valid, (k - self.k_ref) / np.abs(self.k_ref), 0.0)
+            db = np.where(valid, b - self.b_ref, 0.0)
+        self.dk = np.nan_to_num(dk)
+        self.db = np.nan_to_num(db)
+        flagged = valid & ((np.abs(self.dk) > self.k_tol) | (np.abs(self.db) > self.b_tol))
+        new = flagged & ~self.flagged
+        for i in np.flatnonzero(new):
+            self.events.append({"t": t, "channel": int(i), "k": float(k[i]), "b": float(b[i]),
+                                "dk": float(self.dk[i]), "db": float(self.db[i])})
+        self.flagged = flagged
+        return new
+
+    def rebaseline(self, k, b, channels=None):
+        """Accept k, b (arrays over all channels, or scalars) as the new reference
+        for the given channels, or all."""
+        k = np.broadcast_to(np.asarray(k, dtype=float), self.k_ref.shape)
+        b = np.broadcast_to(np.asarray(b, dtype=float), self.b_ref.shape)
+        idx = slice(None) if channels is None else np.asarray(channels)
+        self.k_ref[idx] = k[idx]
+        self.b_ref[idx] = b[idx]
+        self.flagged[idx] = False
+        self.dk[idx] = 0.0
+        self.db[idx] = 0.0
+
+
+# -----------------------------
+# Command line: replay reference samples
+# -----------------------------
+def replay(frame, forgetting=DEFAULT_FORGETTING, initial=None, k_tol=DEFAULT_K_TOL, b_tol=DEFAULT_B_TOL):
+    """Run RLS over reference samples (columns channel, A, C[, t]) in file order.
+
+    Samples are grouped into rounds — the i-th sample of every channel —
+    and each round is one vectorized update of the bank. Returns
+    (channel labels, bank, monitor).
+    """
+    labels, codes = np.unique(frame["channel"].astype(str).to_numpy(), return_inverse=True)
+    n = len(labels)
+    k0 = np.full(n, np.nan)
+    b0 = np.full(n, np.nan)
+    if initial is not None:
+        index = {str(ch): i for i, ch in enumerate(labels)}
+        for ch, k, b in zip(initial["channel"].astype(str), initial["k"], initial["b"]):
+            if ch in index:
+                k0[index[ch]], b0[index[ch]] = k, b
+    bank = RecursiveFitBank(n, forgetting, k0, b0)
+    monitor = DriftMonitor(k0, b0, k_tol, b_tol)
+    A = frame["A"].to_numpy(dtype=float)
+    C = frame["C"].to_numpy(dtype=float)
+    t = frame["t"].to_numpy() if "t" in frame else np.arange(len(frame))
+    # round of every sample: its position among the samples of its channel
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=n)
+    rounds = np.empty(len(codes), dtype=np.int64)
+    rounds[order] = np.arange(len(codes)) - np.repeat(np.cumsum(counts) - counts, counts)
+    by_round = np.argsort(rounds, kind='stable')
+    ends = np.cumsum(np.bincount(rounds)) if len(rounds) else []
+    start = 0
+    for end in ends:
+        rows = by_round[start:end]
+        start = end
+        a = np.full(n, np.nan)
+        c = np.full(n, np.nan)
+        a[codes[rows]] = A[rows]
+        c[codes[rows]] = C[rows]
+        bank.update(a, c)
+        monitor.check(bank.k, bank.b, t[rows[-1]], ready=bank.n >= WARMUP_SAMPLES)
+    return labels, bank, monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py recal",
+                                     description="Online recalibration (RLS) from reference samples")
+    parser.add_argument("input", help="CSV of reference samples in time order: channel,A,C[,t]")
+    parser.add_argument("output", help="CSV of the final k, b and drift per channel ('-' for stdout)")
+    parser.add_argument("--forgetting", type=float, default=DEFAULT_FORGETTING,
+                        help="λ in (0, 1]; memory ≈ 1/(1 − λ) samples (default %(default)s)")
+    parser.add_argument("--initial", help="CSV channel,k,b: the current calibration (prior and drift reference; "
+                                          "otherwise the first estimate of each channel)")
+    parser.add_argument("--k-tol", type=float, default=DEFAULT_K_TOL, help="relative slope change flagged as drift")
+    parser.add_argument("--b-tol", type=float, default=DEFAULT_B_TOL, help="intercept change flagged as drift (A)")
+    parser.add_argument("--sep", default=",", help="delimiter (default ',')")
+    args = parser.parse_args(argv)
+    try:
+        _check_forgetting(args.forgetting)
+    except ValueError as e:
+        parser.error(str(e))
+
+    import pandas as pd
+    frame = pd.read_csv(args.input, sep=args.sep)
+    missing = {"channel", "A", "C"} - set(frame.columns)
+    if missing:
+        parser.error(f"{args.input}: нет столбцов {', '.join(sorted(missing))}")
+    initial = pd.read_csv(args.initial, sep=args.sep) if args.initial else None
+    labels, bank, monitor = replay(frame, args.forgetting, initial, args.k_tol, args.b_tol)
+
+    out = pd.DataFrame({"channel": labels, "k": bank.k, "b": bank.b, "samples": bank.n,
+                        "k_ref": monitor.k_ref, "b_ref": monitor.b_ref,
+                        "dk_rel": monitor.dk, "db": monitor.db, "drift": monitor.flagged})
+    out.to_csv(sys.stdout if args.output == '-' else args.output, index=False)
+    for ev in monitor.events:
+        sys.stderr.write(f"drift: channel {labels[ev['channel']]} at {ev['t']}: "
+                         f"k = {ev['k']:.6g} ({ev['dk']:+.1%}), b = {ev['b']:.6g} ({ev['db']:+.4g})\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+# robust.py
+"""Robust line fits y = k·x + b for outlier-heavy calibrations.
+
+All estimators work on the same (n, m) layout as calibration.fit_columns():
+x values X, responses Y and a boolean mask W of usable entries, one column
+per curve, and return the arrays k, b of shape (m,) (NaN where a column
+cannot be fitted).
+
+- Theil–Sen: median of pairwise slopes. Small columns are done for all
+  columns at once over the pair tensor; large ones use slope selection in
+  O(n log n) per step: the number of pairs with slope < s equals the number
+  of inversions of y - s·x in x order, counted by a vectorized radix pass.
+  A bracket from sampled pair slopes is narrowed by interpolation until only
+  a few pairs are left inside, which are then enumerated exactly.
+- Huber: IRLS with the MAD scale, every column updated in the same pass.
+- RANSAC: minimal two-point samples scored in batches against all columns,
+  stopped as soon as the adaptive trial count for the best inlier ratio is
+  reached, then a least-squares refit on the inliers.
+"""
+import math
+import warnings
+
+import numpy as np
+
+from tracing import traced
+
+METHOD_OLS = "ols"
+METHODS = {
+    "ols": "МНК",
+    "theil_sen": "Тейл–Сен",
+    "huber": "Хьюбер",
+    "ransac": "RANSAC",
+}
+
+HUBER_C = 1.345
+MAD_SCALE = 1.4826
+# max elements of one temporary (pairs × columns or trials × n × columns) array
+BATCH_ELEMENTS = 20_000_000
+# below this many points per column Theil–Sen takes all pairs directly
+THEIL_SEN_PAIRWISE_MAX = 1500
+# slope selection stops narrowing once this many pairs remain in the bracket
+_ENUMERATE_MAX = 2048
+_SAMPLE_PAIRS = 200_000
+RANSAC_MAX_TRIALS = 1000
+RANSAC_STOP_PROBABILITY = 0.99
+# trials drawn at once; the adaptive trial count is checked between batches
+RANSAC_TRIAL_BATCH = 64
+RANSAC_THRESHOLD_MADS = 2.5
+
+
+def check_method(method):
+    if method not in METHODS:
+        raise ValueError(f"неизвестный метод: {method} (допустимо: {', '.join(METHODS)})")
+    return method
+
+
+@traced("fit.robust")
+def robust_fit(X, Y, W, method, seed=0):
+    """k, b of every column with a robust method (see module docstring)."""
+    if method == "theil_sen":
+        return theil_sen_columns(X, Y, W, seed=seed)
+    if method == "huber":
+        return huber_columns(X, Y, W)
+    if method == "ransac":
+        return ransac_columns(X, Y, W, seed=seed)
+    raise ValueError(f"неизвестный робастный метод: {method}")
+
+
+def _weighted_line(X, Y, Wt):
+    """Weighted least squares per column, weights Wt (0 = left out)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sw = Wt.sum(axis=0)
+        mx = (Wt * np.where(Wt > 0, X, 0.0)).sum(axis=0) / sw
+        my = (Wt * np.where(Wt > 0, Y, 0.0)).sum(axis=0) / sw
+        dx = np.where(Wt > 0, X - mx, 0.0)
+        dy = np.where(Wt > 0, Y - my, 0.0)
+        sxx = (Wt * dx * dx).sum(axis=0)
+        sxy = (Wt * dx * dy).sum(axis=0)
+        ok = ((Wt > 0).sum(axis=0) >= 2) & (sxx > 0)
+        k = np.where(ok, sxy / sxx, np.nan)
+        b = np.where(ok, my - k * mx, np.nan)
+    return k, b
+
+
+def _nanmedian(A, axis):
+    # all-NaN columns (nothing to fit) give NaN without the warning
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(A, axis=axis)
+
+
+# -----------------------------
+# Theil–Sen
+# -----------------------------
+def theil_sen_columns(X, Y, W, seed=0):
+    n, m = Y.shape
+    k = np.full(m, np.nan)
+    pairs = n * (n - 1) // 2
+    if n <= THEIL_SEN_PAIRWISE_MAX and pairs:
+        step = max(1, BATCH_ELEMENTS // pairs)
+        i, j = np.triu_indices(n, 1)
+        for c0 in range(0, m, step):
+            sl = slice(c0, c0 + step)
+            Xc, Yc, Wc = X[:, sl], Y[:, sl], W[:, sl]
+            dx = Xc[j] - Xc[i]
+            ok = Wc[i] & Wc[j] & (dx != 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slopes = np.where(ok, (Yc[j] - Yc[i]) / dx, np.nan)
+            k[sl] = _nanmedian(slopes, axis=0)
+    else:
+        for c in range(m):
+            w = W[:, c]
+            k[c] = theil_sen_slope(X[w, c], Y[w, c], seed=seed)
+    b = _nanmedian(np.where(W, Y - k * X, np.nan), axis=0)
+    return k, np.where(np.isfinite(k), b, np.nan)
+
+
+def _inversions(p):
+    """Number of pairs i < j with p[i] > p[j] for a permutation p of 0..n-1.
+
+    Radix version of merge-sort counting: one level per bit from the top,
+    each level a stable zeros-then-ones partition inside the groups sharing
+    the higher bits, done with cumulative sums (O(n) per level).
+    """
+    n = len(p)
+    if n < 2:
+        return 0
+    seq = np.asarray(p, dtype=np.int64)
+    pos = np.arange(n)
+    total = 0
+    for level in range(int(n - 1).bit_length() - 1, -1, -1):
+        bit = (seq >> level) & 1
+        prefix = seq >> (level + 1)
+        start = np.empty(n, dtype=bool)
+        start[0] = True
+        np.not_equal(prefix[1:], prefix[:-1], out=start[1:])
+        starts = np.flatnonzero(start)
+        gid = np.cumsum(start) - 1
+        ones_excl = np.cumsum(bit) - bit
+        ones_before = ones_excl - ones_excl[starts][gid]
+        zero = bit == 0
+        total += int(ones_before[zero].sum())
+        zeros_excl = pos - ones_excl
+        ends = np.append(starts[1:], n) - 1
+        zeros_in = zeros_excl[ends] + (1 - bit[ends]) - zeros_excl[starts]
+        g0 = starts[gid]
+        newpos = np.where(zero, g0 + zeros_excl - zeros_excl[starts][gid], g0 + zeros_in[gid] + ones_before)
+        out = np.empty_like(seq)
+        out[newpos] = seq
+        seq = out
+    return total
+
+
+def _ranks(v):
+    r = np.empty(len(v), dtype=np.int64)
+    r[np.argsort(v, kind='stable')] = np.arange(len(v))
+    return r
+
+
+def _count_below(x, y, s):
+    """Pairs (x sorted, ties ordered by y) with slope < s."""
+    return _inversions(_ranks(y - s * x))
+
+
+def _enumerate(x, y, lo, hi):
+    """Sorted slopes in [lo, hi), assuming there are only a few of them.
+
+    Exactly those pairs change order between y - lo·x and y - hi·x; every
+    element taking part is out of place in one of the two orders, the rest
+    is skipped before the pairs are formed.
+    """
+    order = np.argsort(y - lo * x, kind='stable')
+    r_hi = (y - hi * x)[order]
+    before = np.maximum.accumulate(r_hi)
+    after = np.minimum.accumulate(r_hi[::-1])[::-1]
+    bad = np.zeros(len(r_hi), dtype=bool)
+    bad[1:] |= before[:-1] > r_hi[1:]
+    bad[:-1] |= after[1:] < r_hi[:-1]
+    cand = np.sort(order[bad])
+    if len(cand) < 2:
+        return np.empty(0)
+    i, j = np.triu_indices(len(cand), 1)
+    i, j = cand[i], cand[j]
+    dx = x[j] - x[i]
+    ok = dx != 0
+    s = (y[j][ok] - y[i][ok]) / dx[ok]
+    return np.sort(s[(s >= lo) & (s < hi)])
+
+
+def _select(x, y, k1, k2, lo, c_lo, hi, c_hi):
+    """Slopes of rank k1..k2 given count_below(lo) <= k1 < k2 < count_below(hi)."""
+    margin = _ENUMERATE_MAX // 8
+    history = [(lo, c_lo), (hi, c_hi)]
+    while c_hi - c_lo > _ENUMERATE_MAX:
+        if hi - lo <= 1e-14 * max(abs(lo), abs(hi), 1e-300):
+            return [0.5 * (lo + hi)] * (k2 - k1 + 1)
+        # secant through the last two evaluations (they close in on the
+        # target much faster than the bracket ends), aimed a little past the
+        # target away from the last landing so the bracket shrinks from both sides
+        (s0, c0), (s1, c1) = history[-2:]
+        target = k2 + 1 + margin if c1 <= k1 else k1 - margin
+        s = s1 + (s1 - s0) * (target - c1) / (c1 - c0) if c1 != c0 else lo
+        if not lo < s < hi:
+            s = lo + (hi - lo) * (0.5 * (k1 + k2 + 1) - c_lo) / (c_hi - c_lo)
+            if not lo < s < hi:
+                s = 0.5 * (lo + hi)
+        c = _count_below(x, y, s)
+        history.append((s, c))
+        if c <= k1:
+            lo, c_lo = s, c
+        elif c > k2:
+            hi, c_hi = s, c
+        else:
+            return (_select(x, y, k1, c - 1, lo, c_lo, s, c)
+                    + _select(x, y, c, k2, s, c, hi, c_hi))
+    slopes = _enumerate(x, y, lo, hi)
+    if not len(slopes):
+        return [0.5 * (lo + hi)] * (k2 - k1 + 1)
+    idx = np.clip(np.arange(k1, k2 + 1) - c_lo, 0, len(slopes) - 1)
+    return list(slopes[idx])
+
+
+def theil_sen_slope(x, y, seed=0):
+    """Median pairwise slope of one curve in O(n log n) per selection step."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    n = len(x)
+    _, counts = np.unique(x, return_counts=True)
+    total = n * (n - 1) // 2 - int((counts * (counts - 1) // 2).sum())
+    if total <= 0:
+        return np.nan
+    if n <= THEIL_SEN_PAIRWISE_MAX:
+        i, j = np.triu_indices(n, 1)
+        dx = x[j] - x[i]
+        ok = dx != 0
+        return float(np.median((y[j][ok] - y[i][ok]) / dx[ok]))
+    k1, k2 = (total - 1) // 2, total // 2
+
+    # bracket from the quantiles of randomly sampled pair slopes
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, n, _SAMPLE_PAIRS)
+    j = rng.integers(0, n, _SAMPLE_PAIRS)
+    dx = x[j] - x[i]
+    ok = dx != 0
+    sample = (y[j][ok] - y[i][ok]) / dx[ok]
+    q = (k1 + 0.5) / total
+    band = 4.0 * math.sqrt(q * (1 - q) / len(sample)) + 1.0 / len(sample)
+    lo, hi = np.quantile(sample, [max(q - band, 0.0), min(q + band, 1.0)])
+    width = max(hi - lo, 1e-12 * max(abs(lo), 1.0))
+    c_lo = _count_below(x, y, lo)
+    while c_lo > k1:
+        lo -= width
+        width *= 2
+        c_lo = _count_below(x, y, lo)
+    width = max(hi - lo, 1e-12 * max(abs(hi), 1.0))
+    c_hi = _count_below(x, y, hi)
+    while c_hi <= k2:
+        hi += width
+        width *= 2
+        c_hi = _count_below(x, y, hi)
+    return float(np.mean(_select(x, y, k1, k2, lo, c_lo, hi, c_hi)))
+
+
+# -----------------------------
+# Huber (IRLS)
+# -----------------------------
+def huber_columns(X, Y, W, c=HUBER_C, max_iter=50, tol=1e-10):
+    wt = W.astype(float)
+    k, b = _weighted_line(X, Y, wt)
+    for _ in range(max_iter):
+        with np.errstate(invalid='ignore'):
+            r = np.abs(np.where(W, Y - (k * X + b), np.nan))
+        cut = c * MAD_SCALE * _nanmedian(r, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            w = np.where(r <= cut, 1.0, cut / r)
+        w = np.where(W & np.isfinite(w), w, 0.0)
+        k_new, b_new = _weighted_line(X, Y, w)
+        with np.errstate(invalid='ignore'):
+            moved = (np.abs(k_new - k) > tol * (1 + np.abs(k))) | (np.abs(b_new - b) > tol * (1 + np.abs(b)))
+        k, b = k_new, b_new
+        if not moved.any():
+            break
+    return k, b
+
+
+# -----------------------------
+# RANSAC
+# -----------------------------
+def ransac_columns(X, Y, W, threshold=None, max_trials=RANSAC_MAX_TRIALS,
+                   stop_probability=RANSAC_STOP_PROBABILITY, seed=0):
+    """Two-point RANSAC for every column; threshold=None takes 2.5 robust
+    sigmas of the best (least median) candidate of the first batch.
+
+    All columns share one stream of uniform draws (scaled to each column's
+    number of usable points) and a column stops taking trials as soon as its
+    own adaptive count is reached, so a column gets the same fit whether it
+    is fitted alone or together with others.
+    """
+    n, m = Y.shape
+    X = np.broadcast_to(X, Y.shape)
+    batch = int(max(1, min(max_trials, RANSAC_TRIAL_BATCH)))
+    step = max(1, BATCH_ELEMENTS // (batch * max(n, 1)))
+    k = np.full(m, np.nan)
+    b = np.full(m, np.nan)
+    thr = None if threshold is None else np.broadcast_to(np.asarray(threshold, dtype=float), (m,))
+    for c0 in range(0, m, step):
+        sl = slice(c0, c0 + step)
+        k[sl], b[sl] = _ransac_block(X[:, sl], Y[:, sl], W[:, sl], None if thr is None else thr[sl],
+                                     batch, max_trials, stop_probability, seed)
+    return k, b
+
+
+def _ransac_block(X, Y, W, thr, batch, max_trials, stop_probability, seed):
+    n, m = Y.shape
+    cols = np.arange(m)
+    nv = W.sum(axis=0)
+    order = np.argsort(~W, axis=0, kind='stable')   # usable rows first
+    rng = np.random.default_rng(seed)
+    best = np.zeros(m, dtype=np.int64)
+    best_k = np.full(m, np.nan)
+    best_b = np.full(m, np.nan)
+    needed = np.where(nv >= 2, max_trials, 0)
+    done = 0
+    while done < needed.max(initial=0):
+        u = rng.random((2, batch, 1))
+        pick = np.minimum((u * nv).astype(np.int64), n - 1)
+        ii = order[pick[0], cols]
+        jj = order[pick[1], cols]
+        x1, y1 = X[ii, cols], Y[ii, cols]
+        dx = X[jj, cols] - x1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k = np.where(dx != 0, (Y[jj, cols] - y1) / dx, np.nan)
+        b = y1 - k * x1
+        with np.errstate(invalid='ignore'):
+            R = np.abs(Y[None] - (k[:, None, :] * X[None] + b[:, None, :]))
+        if thr is None:
+            med = _nanmedian(np.where(W[None], R, np.nan), axis=1)
+            with np.errstate(invalid='ignore'):
+                thr = RANSAC_THRESHOLD_MADS * MAD_SCALE * np.min(np.where(np.isfinite(med), med, np.inf), axis=0)
+            floor = 1e-9 * np.max(np.where(W, np.abs(Y), 0.0), axis=0, initial=0.0)
+            thr = np.where(np.isfinite(thr), np.maximum(thr, floor), 0.0)
+        with np.errstate(invalid='ignore'):
+            counts = ((R <= thr) & W[None]).sum(axis=1)
+        counts = np.where(np.isfinite(k), counts, -1)
+        t = counts.argmax(axis=0)
+        c = counts[t, cols]
+        better = (c > best) & (done < needed)
+        best = np.where(better, c, best)
+        best_k = np.where(better, k[t, cols], best_k)
+        best_b = np.where(better, b[t, cols], best_b)
+        done += batch
+        # adaptive trial count for the current best inlier ratio
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = best / np.maximum(nv, 1)
+            need = np.log(1 - stop_probability) / np.log(1 - ratio * ratio)
+        need = np.where(ratio >= 1, 0, np.where(np.isfinite(need), np.ceil(need), max_trials))
+        needed = np.where(nv >= 2, np.minimum(np.maximum(need, done), max_trials), 0)
+    if thr is None:
+        return best_k, best_b
+    with np.errstate(invalid='ignore'):
+        inliers = W & (np.abs(Y - (best_k * X + best_b)) <= thr)
+    return _weighted_line(X, Y, inliers.astype(float))
@@ -0,0 +1,458 @@
+# service.py
+"""Local prediction service: A → C over HTTP for other lab software.
+
+    python app.py serve CALIBRATION [--port 8765 | --unix /tmp/calib.sock] [--method huber] [--family auto]
+
+(--unix is not offered on Windows.)
+
+Endpoints (JSON in, JSON out):
+
+    POST /predict   {"symbol": "Ceftr", "condition": "water", "A": 1.5}      -> {"C": 4.07e-05}
+                    {"symbol": ..., "condition": ..., "A": [1.5, 1.7]}       -> {"C": [...]}
+                    {"items": [{"symbol", "condition", "A"}, ...]}           -> {"C": [...]}
+    GET  /metrics   latency percentiles, batch sizes, calibration state
+    GET  /health    {"ok": true, "calibration": {...}}
+    POST /reload    reload the calibration file now
+
+Conditions are the same strings as in ``app.py predict`` (water/no_water,
+1/0, true/false...). Unknown curves and impossible values give null.
+
+Requests that arrive within --batch-window-ms of each other are answered
+from one vectorized predict_codes() call (batch_predict.py), so a burst of
+single-reading requests costs one NumPy pass. The calibration is loaded with
+calib_format.load_table(), the same code as the editor's JSON import, into
+an immutable snapshot; the file is watched and a changed file is loaded off
+the event loop and swapped in between batches. Batches already being
+answered keep the snapshot they started with, so a reload never drops or
+mixes requests, and a file that fails to load leaves the old calibration in
+service. Every response carries its latency in a Server-Timing header;
+/metrics aggregates them over the last METRICS_WINDOW requests.
+
+Single-process asyncio, stdlib HTTP/1.1 with keep-alive; meant for
+localhost / a Unix socket, not for the open network.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from batch_predict import coefficient_matrix, condition_index, curve_models, predict_codes
+from calib_format import load_table
+from models import FAMILIES, FAMILY_AUTO, FAMILY_LINEAR
+from robust import METHODS, METHOD_OLS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 65_536
+DEFAULT_WATCH_INTERVAL_S = 1.0
+MAX_BODY = 64 << 20
+METRICS_WINDOW = 10_000
+# --unix only where asyncio supports Unix-domain sockets (not on Windows)
+HAS_UNIX_SOCKETS = hasattr(asyncio, "start_unix_server")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequestError(ValueError):
+    """A malformed request; answered with 400 and the message."""
+
+
+# -----------------------------
+# Calibration snapshot
+# -----------------------------
+class Calibration:
+    """Everything a prediction needs from one load of the calibration file. Never mutated."""
+
+    def __init__(self, path, method=METHOD_OLS, family=FAMILY_LINEAR, version=1):
+        stat = os.stat(path)
+        table = load_table(path)
+        table.set_method(method)
+        table.set_family(family)
+        self.path = path
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        self.version = version
+        self.loaded_at = time.time()
+        self.symbols = list(table.symbols)
+        self.sym_index = {s: i for i, s in enumerate(self.symbols)}
+        self.K, self.B = coefficient_matrix(table)
+        self.curves = curve_models(table)
+        self.method, self.family = method, family
+
+    def describe(self):
+        return {"path": self.path, "version": self.version, "symbols": len(self.symbols),
+                "method": self.method, "family": self.family,
+                "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.loaded_at))}
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# -----------------------------
+# Request decoding
+# -----------------------------
+def _decode_items(obj):
+    """[(symbol, condition, A array, scalar)] from a /predict body."""
+    if not isinstance(obj, dict):
+        raise RequestError("тело запроса должно быть JSON-объектом")
+    items = obj["items"] if "items" in obj else [obj]
+    if not isinstance(items, list):
+        raise RequestError("'items' должен быть списком")
+    out = []
+    for item in items:
+        if not isinstance(item, dict) or not {"symbol", "condition", "A"} <= item.keys():
+            raise RequestError("каждый элемент должен содержать symbol, condition и A")
+        scalar = not isinstance(item["A"], list)
+        try:
+            A = np.array([item["A"]] if scalar else item["A"], dtype=np.float64).ravel()
+        except (TypeError, ValueError):
+            raise RequestError("A должно быть числом или списком чисел") from None
+        out.append((str(item["symbol"]).strip(), item["condition"], A, scalar))
+    return out
+
+
+def _encode_c(values, scalar):
+    vals = [None if not math.isfinite(v) else v for v in values.tolist()]
+    return vals[0] if scalar else vals
+
+
+# -----------------------------
+# Micro-batching
+# -----------------------------
+class Batcher:
+    """Collects requests for batch_window seconds (or max_batch readings) and
+    answers them from one predict_codes() call."""
+
+    def __init__(self, service, window_s, max_batch):
+        self.service = service
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._pending = []   # (items, future)
+        self._rows = 0
+        self._timer = None
+
+    def submit(self, items):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((items, fut))
+        self._rows += sum(len(A) for _s, _c, A, _sc in items)
+        if self._rows >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_s, self.flush)
+        return fut
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._rows = self._pending, [], 0
+        if not pending:
+            return
+        cal = self.service.calibration   # one snapshot for the whole batch
+        rows, cols, As = [], [], []
+        for items, _fut in pending:
+            for symbol, condition, A, _scalar in items:
+                n = len(A)
+                rows.append(np.full(n, condition_index(condition), dtype=np.intp))
+                cols.append(np.full(n, cal.sym_index.get(symbol, -1), dtype=np.intp))
+                As.append(A)
+        try:
+            C = predict_codes(np.concatenate(rows), np.concatenate(cols), np.concatenate(As),
+                              cal.K, cal.B, cal.curves) if As else np.empty(0)
+        except Exception as e:
+            for _items, fut in pending:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.service.metrics.batch(len(pending), len(C))
+        pos = 0
+        for items, fut in pending:
+            out = []
+            for _symbol, _condition, A, scalar in items:
+                out.append(_encode_c(C[pos:pos + len(A)], scalar))
+                pos += len(A)
+            if not fut.done():
+                fut.set_result((out, cal.version))
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+class Metrics:
+    def __init__(self, window=METRICS_WINDOW):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.readings = 0
+        self.batches = 0
+        self.latency_ms = deque(maxlen=window)
+        self.queue_ms = deque(maxlen=window)
+        self.batch_requests = deque(maxlen=window)
+        self.batch_readings = deque(maxlen=window)
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_reload_error = None
+
+    def request(self, total_ms, queue_ms, readings):
+        self.requests += 1
+        self.readings += readings
+        self.latency_ms.append(total_ms)
+        self.queue_ms.append(queue_ms)
+
+    def batch(self, n_requests, n_readings):
+        self.batches += 1
+        self.batch_requests.append(n_requests)
+        self.batch_readings.append(n_readings)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return None
+        arr = np.fromiter(values, dtype=float)
+        p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+        return {"p50": p50, "p90": p90, "p99": p99, "max": float(arr.max()), "mean": float(arr.mean())}
+
+    def snapshot(self):
+        return {
+            "uptime_s": time.time() - self.started,
+            "requests": self.requests, "errors": self.errors, "readings": self.readings,
+            "batches": self.batches,
+            "latency_ms": self._summary(self.latency_ms),
+            "queue_ms": self._summary(self.queue_ms),
+            "requests_per_batch": self._summary(self.batch_requests),
+            "readings_per_batch": self._summary(self.batch_readings),
+            "reloads": self.reloads, "reload_errors": self.reload_errors,
+            "last_reload_error": self.last_reload_error,
+        }
+
+
+# -----------------------------
+# Service
+# -----------------------------
+class PredictionService:
+    def __init__(self, path, method=METHOD_OLS, family=FAMILY_LINEAR,
+                 batch_window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH,
+                 watch_interval=DEFAULT_WATCH_INTERVAL_S):
+        self.path = path
+        self.method, self.family = method, family
+        self.watch_interval = watch_interval
+        self.calibration = Calibration(path, method, family)
+        self._seen_stamp = self.calibration.stamp   # file state last tried
+        self.metrics = Metrics()
+        self.batcher = Batcher(self, batch_window_ms / 1000.0, max_batch)
+        self._reload_lock = None
+
+    # ---------- hot reload ----------
+    async def reload(self):
+        """Load the file off the event loop and swap the snapshot in; the old
+        one stays in service if loading fails. Returns the active snapshot."""
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            version = self.calibration.version + 1
+            loop = asyncio.get_running_loop()
+            try:
+                cal = await loop.run_in_executor(None, Calibration, self.path, self.method, self.family, version)
+            except Exception as e:
+                self.metrics.reload_errors += 1
+                self.metrics.last_reload_error = f"{type(e).__name__}: {e}"
+                raise
+            self.calibration = cal
+            self.metrics.reloads += 1
+            return cal
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            stamp = _file_stamp(self.path)
+            if stamp is not None and stamp != self._seen_stamp:
+                # a broken file is tried once, not on every tick
+                self._seen_stamp = stamp
+                try:
+                    await self.reload()
+                    sys.stderr.write(f"calibration reloaded (version {self.calibration.version})\n")
+                except Exception as e:
+                    sys.stderr.write(f"reload failed, keeping version {self.calibration.version}: {e}\n")
+
+    # ---------- HTTP ----------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                t0 = time.perf_counter()
+                status, payload, timing = await self.route(method, path, body)
+                total_ms = (time.perf_counter() - t0) * 1e3
+                extra = {"Server-Timing": f"total;dur={total_ms:.3f}" + (
+                    f", queue;dur={timing:.3f}" if timing is not None else "")}
+                keep = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, payload, extra, keep)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except RequestError as e:
+            _write_response(writer, 400, {"error": str(e)}, {}, False)
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def route(self, method, path, body):
+        """(status, JSON payload, queue ms or None) for one request."""
+        path = path.split("?", 1)[0]
+        try:
+            if path == "/predict":
+                if method != "POST":
+                    return 405, {"error": "POST only"}, None
+                return await self.predict(body)
+            if path == "/metrics" and method == "GET":
+                return 200, {"metrics": self.metrics.snapshot(), "calibration": self.calibration.describe()}, None
+            if path == "/health" and method == "GET":
+                return 200, {"ok": True, "calibration": self.calibration.describe()}, None
+            if path == "/reload" and method == "POST":
+                try:
+                    cal = await self.reload()
+                except Exception as e:
+                    return 500, {"error": f"reload failed: {e}", "calibration": self.calibration.describe()}, None
+                return 200, {"ok": True, "calibration": cal.describe()}, None
+            return 404, {"error": f"unknown endpoint {method} {path}"}, None
+        except RequestError as e:
+            self.metrics.errors += 1
+            return 400, {"error": str(e)}, None
+        except Exception as e:
+            self.metrics.errors += 1
+            return 500, {"error": f"{type(e).__name__}: {e}"}, None
+
+    async def predict(self, body):
+        t0 = time.perf_counter()
+        try:
+            obj = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(f"некорректный JSON: {e}") from None
+        items = _decode_items(obj)
+        t_queued = time.perf_counter()
+        out, version = await self.batcher.submit(items)
+        done = time.perf_counter()
+        self.metrics.request((done - t0) * 1e3, (done - t_queued) * 1e3, sum(len(i[2]) for i in items))
+        result = {"C": out if "items" in obj else out[0], "calibration_version": version}
+        return 200, result, (done - t_queued) * 1e3
+
+
+async def _read_request(reader):
+    """(method, path, headers, body) or None at EOF between requests."""
+    try:
+        line = await reader.readline()
+    except (ConnectionError, asyncio.LimitOverrunError):
+        return None
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) < 2:
+        raise RequestError("некорректная строка запроса")
+    method, path = parts[0].upper(), parts[1]
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise RequestError("некорректный Content-Length") from None
+    if length > MAX_BODY:
+        raise RequestError("слишком большой запрос")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _write_response(writer, status, payload, extra_headers, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode('utf-8')
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head += [f"{k}: {v}" for k, v in extra_headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None, ready=None):
+    """Run the service until cancelled; ready(address) is called once listening."""
+    if unix:
+        if not HAS_UNIX_SOCKETS:
+            raise OSError("Unix-сокеты недоступны на этой платформе")
+        if os.path.exists(unix):
+            os.remove(unix)
+        server = await asyncio.start_unix_server(service.handle, path=unix)
+        address = unix
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        address = "http://%s:%d" % server.sockets[0].getsockname()[:2]
+    watcher = asyncio.create_task(service.watch()) if service.watch_interval > 0 else None
+    if ready is not None:
+        ready(address)
+    # SIGTERM (service managers, kill) shuts down like Ctrl+C: cleanup below still runs.
+    # Windows event loops have no signal handlers; Ctrl+C (KeyboardInterrupt) still works there.
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if unix and os.path.exists(unix):
+            os.remove(unix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py serve", description="Local A → C prediction service")
+    parser.add_argument("calibration", help="calibration library (.json or .scal), watched for changes")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    if HAS_UNIX_SOCKETS:
+        parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--method", choices=list(METHODS), default=METHOD_OLS, help="fit method (default ols)")
+    parser.add_argument("--family", choices=list(FAMILIES) + [FAMILY_AUTO], default=FAMILY_LINEAR,
+                        help="curve family (default linear; auto = lowest AIC per curve)")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="how long to collect concurrent requests into one batch")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="readings per batch at most")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_WATCH_INTERVAL_S,
+                        help="seconds between checks of the calibration file (0 = no hot reload)")
+    args = parser.parse_args(argv)
+
+    service = PredictionService(args.calibration, args.method, args.family, args.batch_window_ms,
+                                args.max_batch, args.watch_interval)
+    try:
+        asyncio.run(serve(service, args.host, args.port, getattr(args, "unix", None),
+                          ready=lambda addr: sys.stderr.write(f"serving {args.calibration} on {addr}\n")))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
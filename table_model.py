@@ -0,0 +1,184 @@
+# table_model.py
+"""Qt model for the table editor, backed directly by NumPy arrays.
+
+Cells are formatted lazily in data() (only the visible ones are asked for)
+straight from the table's arrays, which are never copied (a memory-mapped
+library stays mapped). Edits are kept as a sparse {(row, col): value} of
+dirty cells over them, so "save" writes only what changed back into the
+CalibrationTable.
+
+Below the C rows a few read-only rows show the cross-validated quality of
+every column (validation.table_quality(), for the saved data and the
+table's current fit method and family).
+"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QBrush, QColor
+
+from validation import DEFAULT_FOLDS, table_quality
+
+DIRTY_BRUSH = QBrush(QColor(255, 244, 180))
+QUALITY_BRUSH = QBrush(QColor(232, 232, 232))
+# (header, validation summary, statistic)
+QUALITY_ROWS = (
+    ("LOO RMSE", "loo", "rmse"),
+    ("LOO Q²", "loo", "q2"),
+    (f"{DEFAULT_FOLDS}-fold RMSE", "kfold", "rmse"),
+)
+
+
+def parse_float(text):
+    """float() that also accepts a decimal comma; raises ValueError."""
+    return float(str(text).strip().replace(',', '.'))
+
+
+class CalibrationTableModel(QAbstractTableModel):
+    """Rows are C values, columns are symbols; one condition is shown at a time.
+
+    Both conditions keep their own dirty cells, so switching between them is
+    a model reset with no per-cell work and keeps unsaved edits.
+    """
+
+    def __init__(self, table, with_water=False, parent=None):
+        super().__init__(parent)
+        self.with_water = bool(with_water)
+        self._load(table)
+
+    def _load(self, table):
+        self.table = table
+        self._dirty = {False: {}, True: {}}  # (row, col) -> edited value, per condition
+        self._symbols = list(table.symbols)
+        self._c_values = table.c_values.copy()
+        self._dirty_headers = {Qt.Horizontal: set(), Qt.Vertical: set()}
+
+    # ---------- switching data ----------
+    def set_table(self, table):
+        """Show a (new or structurally changed) table; unsaved edits are dropped."""
+        self.beginResetModel()
+        self._load(table)
+        self.endResetModel()
+
+    def set_condition(self, with_water):
+        self.beginResetModel()
+        self.with_water = bool(with_water)
+        self.endResetModel()
+
+    def value(self, row, col):
+        """Cell of the condition currently shown, with unsaved edits."""
+        v = self._dirty[self.with_water].get((row, col))
+        return float(self.table.values(self.with_water)[row, col]) if v is None else v
+
+    # ---------- quality rows ----------
+    @property
+    def data_row_count(self):
+        """Number of editable C rows (the quality rows follow them)."""
+        return len(self._c_values)
+
+    def is_quality_row(self, row):
+        return row >= self.data_row_count
+
+    def _quality(self, row, col):
+        _label, summary, stat = QUALITY_ROWS[row - self.data_row_count]
+        value = table_quality(self.table, self.with_water)[summary][stat][col]
+        return "—" if value != value else f"{value:.4g}"
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._c_values) + (len(QUALITY_ROWS) if len(self._c_values) and self._symbols else 0)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._symbols)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r, c = index.row(), index.column()
+        if self.is_quality_row(r):
+            if role == Qt.DisplayRole:
+                return self._quality(r, c)
+            if role == Qt.BackgroundRole:
+                return QUALITY_BRUSH
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return str(self.value(r, c))
+        if role == Qt.BackgroundRole and (r, c) in self._dirty[self.with_water]:
+            return DIRTY_BRUSH
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole or self.is_quality_row(index.row()):
+            return False
+        try:
+            v = parse_float(value)
+        except ValueError:
+            return False
+        r, c = index.row(), index.column()
+        self._dirty[self.with_water][(r, c)] = v
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole, Qt.BackgroundRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self.is_quality_row(index.row()):
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            if orientation == Qt.Horizontal:
+                return self._symbols[section] if section < len(self._symbols) else None
+            if self.is_quality_row(section):
+                return QUALITY_ROWS[section - self.data_row_count][0] if section < self.rowCount() else None
+            return str(float(self._c_values[section]))
+        if role == Qt.BackgroundRole and section in self._dirty_headers[orientation]:
+            return DIRTY_BRUSH
+        return None
+
+    def setHeaderData(self, section, orientation, value, role=Qt.EditRole):
+        if role != Qt.EditRole:
+            return False
+        if orientation == Qt.Horizontal:
+            name = str(value).strip()
+            if not name:
+                return False
+            self._symbols[section] = name
+        elif self.is_quality_row(section):
+            return False
+        else:
+            try:
+                self._c_values[section] = parse_float(value)
+            except ValueError:
+                return False
+        self._dirty_headers[orientation].add(section)
+        self.headerDataChanged.emit(orientation, section, section)
+        return True
+
+    # ---------- dirty tracking ----------
+    def dirty_count(self):
+        return (sum(len(d) for d in self._dirty.values())
+                + sum(len(h) for h in self._dirty_headers.values()))
+
+    def commit(self):
+        """Write dirty cells and headers into the CalibrationTable; returns how many."""
+        count = 0
+        for with_water, dirty in self._dirty.items():
+            for (r, c), v in sorted(dirty.items()):
+                self.table.set_value(with_water, r, c, v)
+            count += len(dirty)
+            dirty.clear()
+        for section in sorted(self._dirty_headers[Qt.Horizontal]):
+            self.table.rename_column(section, self._symbols[section])
+        for section in sorted(self._dirty_headers[Qt.Vertical]):
+            self.table.set_c_value(section, self._c_values[section])
+        count += sum(len(h) for h in self._dirty_headers.values())
+        for h in self._dirty_headers.values():
+            h.clear()
+        if self.rowCount() and self.columnCount():
+            # quality rows follow the saved data
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1),
+                                  [Qt.DisplayRole, Qt.BackgroundRole])
+        self.headerDataChanged.emit(Qt.Horizontal, 0, max(self.columnCount() - 1, 0))
+        self.headerDataChanged.emit(Qt.Vertical, 0, max(self.rowCount() - 1, 0))
+        return count
@@ -0,0 +1,627 @@
+# timeseries.py
+"""Append-only on-disk store of acquired readings and computed results.
+
+    store = ReadingStore("readings")
+    store.append(t, channel, A, C, store.model_version(model))
+    store.query(t0, t1, channel=1)        # raw records of a time window
+    store.overview(t0, t1, channel=1)     # at most ~max_points rows, for plotting
+
+A store is a directory:
+
+    raw/000000.seg ...      records (t, channel, version, A, C)
+    r1/ r10/ ... r86400/    rollups per channel and bucket of ROLLUP_WIDTHS
+                            seconds: count, min/max/sum of A and C
+    models.json             model versions: id → equation of the calibration
+
+Every .seg file has room for a fixed number of records, stored column by
+column (all little-endian):
+
+    offset 0   magic   b"SCTSEG\\0\\0"           8 bytes
+    offset 8   version uint16                   (FORMAT_VERSION)
+    offset 10  flags   uint16                   (reserved, 0)
+    offset 12  hlen    uint32                   length of the JSON header
+    offset 16  count   uint64                   records written
+    offset 24  t_first float64                  time of the first record
+    offset 32  t_last  float64                  time of the last record
+    offset 40  header  UTF-8 JSON               {"capacity", "columns": [[name, dtype, offset], ...]}
+    ...        one block of capacity values per column, each at a DATA_ALIGN offset
+
+Records are appended in time order (timestamps are made non-decreasing on
+append), so segments follow each other in time and every t column is
+sorted: a window query picks its segments by their first/last times, finds
+its rows by binary search in the memory-mapped t column and copies only
+those. The count in the header is written after the records, so a crash
+loses at most the unfinished append, and full segments are never written
+again.
+
+Rollups are kept up to date on append: raw records go into the open 1 s
+buckets, buckets closed by the passing time are written to r1 and folded
+into the open 10 s buckets, and so on up to a day, so an append costs the
+same whatever the size of the store. Open buckets live in memory and are
+rebuilt from the next finer level when the store is opened. overview()
+reads the finest level that keeps a window under max_points rows, so a
+month of kHz readings plots from the hourly rollup.
+
+One writing process per store (other processes may open it readonly and
+see the data as of opening); thread-safe within a process.
+"""
+import argparse
+import bisect
+import csv
+import datetime
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+
+import numpy as np
+
+from tracing import traced
+
+MAGIC = b"SCTSEG\0\0"
+FORMAT_VERSION = 1
+DATA_ALIGN = 64
+SEGMENT_SUFFIX = ".seg"
+RAW_SEGMENT_RECORDS = 1 << 20      # 32 MiB per raw segment
+ROLLUP_SEGMENT_RECORDS = 1 << 16
+ROLLUP_WIDTHS = (1, 10, 60, 600, 3600, 86400)  # seconds; each divides the next
+OVERVIEW_POINTS = 2000
+MODELS_FILE = "models.json"
+
+RAW_COLUMNS = (("t", "<f8"), ("channel", "<u4"), ("version", "<u4"), ("a", "<f8"), ("c", "<f8"))
+ROLLUP_COLUMNS = (("t", "<f8"), ("channel", "<u4"), ("count", "<u8"), ("c_count", "<u8"),
+                  ("a_min", "<f8"), ("a_max", "<f8"), ("a_sum", "<f8"),
+                  ("c_min", "<f8"), ("c_max", "<f8"), ("c_sum", "<f8"))
+# how rollup columns of the same bucket are merged
+_REDUCE = (("count", np.add), ("c_count", np.add),
+           ("a_min", np.fmin), ("a_max", np.fmax), ("a_sum", np.add),
+           ("c_min", np.fmin), ("c_max", np.fmax), ("c_sum", np.add))
+
+_PREFIX = struct.Struct("<8sHHIQdd")
+_STATE = struct.Struct("<Qdd")
+_STATE_OFFSET = 16
+
+
+class FormatError(ValueError):
+    """The file is not a segment this version can read."""
+
+
+# -----------------------------
+# Column dicts
+# -----------------------------
+def _empty(columns):
+    return {name: np.empty(0, dtype=dtype) for name, dtype in columns}
+
+
+def _concat(parts, columns):
+    parts = [p for p in parts if len(p["t"])]
+    if not parts:
+        return _empty(columns)
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name, _ in columns}
+
+
+def _take(cols, index):
+    return {name: arr[index] for name, arr in cols.items()}
+
+
+def _raw_rows(raw):
+    """Raw records as single-record rollup rows."""
+    a, c = raw["a"], raw["c"]
+    finite = np.isfinite(c)
+    return {"t": raw["t"], "channel": raw["channel"],
+            "count": np.ones(len(a), dtype=np.uint64), "c_count": finite.astype(np.uint64),
+            "a_min": a, "a_max": a, "a_sum": np.where(np.isfinite(a), a, 0.0),
+            "c_min": c, "c_max": c, "c_sum": np.where(finite, c, 0.0)}
+
+
+def _combine(rows, width):
+    """Merge rollup rows that fall into the same (bucket of ``width`` s, channel)."""
+    if not len(rows["t"]):
+        return rows
+    bucket = np.floor(rows["t"] / width) * width
+    order = np.lexsort((rows["channel"], bucket))
+    b, ch = bucket[order], rows["channel"][order]
+    starts = np.flatnonzero(np.r_[True, (b[1:] != b[:-1]) | (ch[1:] != ch[:-1])])
+    out = {"t": b[starts], "channel": ch[starts]}
+    for name, ufunc in _REDUCE:
+        out[name] = ufunc.reduceat(rows[name][order], starts)
+    return out
+
+
+# -----------------------------
+# Segment files
+# -----------------------------
+def _align(n):
+    return (n + DATA_ALIGN - 1) // DATA_ALIGN * DATA_ALIGN
+
+
+class Segment:
+    """One fixed-capacity .seg file: appended through a file handle, read through a memory map."""
+
+    def __init__(self, path, readonly=True):
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise FormatError(f"{path}: файл слишком короткий")
+            magic, version, _flags, hlen, self.count, self.t_first, self.t_last = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                raise FormatError(f"{path}: не сегмент хранилища (неверная сигнатура)")
+            if version > FORMAT_VERSION:
+                raise FormatError(f"{path}: версия формата {version} новее поддерживаемой ({FORMAT_VERSION})")
+            header = json.loads(f.read(hlen).decode('utf-8'))
+        self.capacity = header["capacity"]
+        self.columns = [(name, np.dtype(dtype), offset) for name, dtype, offset in header["columns"]]
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        self._f = None if readonly else open(path, 'r+b', buffering=0)
+
+    @classmethod
+    def create(cls, path, columns, capacity):
+        header = {"capacity": capacity, "columns": []}
+        offset = _align(_PREFIX.size + 64 * (len(columns) + 2))  # room for the JSON header
+        for name, dtype in columns:
+            header["columns"].append([name, dtype, offset])
+            offset = _align(offset + capacity * np.dtype(dtype).itemsize)
+        raw = json.dumps(header).encode('utf-8')
+        assert _PREFIX.size + len(raw) <= header["columns"][0][2]
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, 0, len(raw), 0, np.nan, np.nan))
+            f.write(raw)
+            f.truncate(offset)  # sparse: blocks take disk space as they fill
+        os.replace(tmp, path)
+        return cls(path, readonly=False)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def seal(self):
+        """No more appends: release the write handle."""
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def close(self):
+        self.seal()
+        self._map = None
+
+    def column(self, name, count=None):
+        """Read-only view of the first ``count`` values (all written ones by default)."""
+        count = self.count if count is None else count
+        for col, dtype, offset in self.columns:
+            if col == name:
+                return self._map[offset:offset + count * dtype.itemsize].view(dtype)
+        raise KeyError(name)
+
+    def search(self, t0, t1):
+        """Row range [i0, i1) of the records with t0 <= t < t1."""
+        t = self.column("t")
+        return int(np.searchsorted(t, t0, 'left')), int(np.searchsorted(t, t1, 'left'))
+
+    def read(self, i0, i1):
+        return {name: np.array(self.column(name, i1)[i0:]) for name, _, _ in self.columns}
+
+    def append(self, cols, start=0):
+        """Write records cols[start:] up to the free room; returns how many were written."""
+        n = min(len(cols["t"]) - start, self.capacity - self.count)
+        if n <= 0:
+            return 0
+        for name, dtype, offset in self.columns:
+            self._f.seek(offset + self.count * dtype.itemsize)
+            self._f.write(np.ascontiguousarray(cols[name][start:start + n], dtype=dtype).tobytes())
+        if not self.count:
+            self.t_first = float(cols["t"][start])
+        self.t_last = float(cols["t"][start + n - 1])
+        self.count += n
+        # the count goes last: readers never see records that are not written yet
+        self._f.seek(_STATE_OFFSET)
+        self._f.write(_STATE.pack(self.count, self.t_first, self.t_last))
+        return n
+
+
+class _Series:
+    """Segments of one directory, in time order, with their first/last times as the time index."""
+
+    def __init__(self, directory, columns, capacity, readonly):
+        self.directory = directory
+        self.columns = columns
+        self.capacity = capacity
+        self.readonly = readonly
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        paths = sorted(glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)))
+        # only the last segment can still take records
+        self.segments = [Segment(p, readonly=readonly or i < len(paths) - 1) for i, p in enumerate(paths)]
+        self._next_index = int(os.path.basename(paths[-1])[:-len(SEGMENT_SUFFIX)]) + 1 if paths else 0
+        if self.segments and not self.segments[-1].count:
+            self.segments.pop().close()  # created, but the first append never completed
+        self._firsts = [s.t_first for s in self.segments]
+        self._lasts = [s.t_last for s in self.segments]
+
+    def __len__(self):
+        return sum(s.count for s in self.segments)
+
+    @property
+    def t_first(self):
+        return self._firsts[0] if self._firsts else None
+
+    @property
+    def t_last(self):
+        return self._lasts[-1] if self._lasts else None
+
+    def close(self):
+        for s in self.segments:
+            s.close()
+
+    def nbytes(self):
+        return sum(os.path.getsize(s.path) for s in self.segments)
+
+    def append(self, cols):
+        n = len(cols["t"])
+        done = 0
+        while done < n:
+            seg = self.segments[-1] if self.segments else None
+            if seg is None or seg.full:
+                if seg is not None:
+                    seg.seal()
+                path = os.path.join(self.directory, f"{self._next_index:06d}{SEGMENT_SUFFIX}")
+                self._next_index += 1
+                seg = Segment.create(path, self.columns, self.capacity)
+                self.segments.append(seg)
+                self._firsts.append(float(cols["t"][done]))
+                self._lasts.append(float(cols["t"][done]))
+            done += seg.append(cols, done)
+            self._lasts[-1] = seg.t_last
+
+    def overlapping(self, t0=-np.inf, t1=np.inf):
+        """Segments that may hold records with t0 <= t < t1 (binary search of the time index)."""
+        return self.segments[bisect.bisect_left(self._lasts, t0):bisect.bisect_left(self._firsts, t1)]
+
+    def chunks(self, t0=-np.inf, t1=np.inf):
+        """Records with t0 <= t < t1, one copied dict per segment touched."""
+        for seg in self.overlapping(t0, t1):
+            i0, i1 = seg.search(t0, t1)
+            if i1 > i0:
+                yield seg.read(i0, i1)
+
+    def read(self, t0=-np.inf, t1=np.inf):
+        return _concat(list(self.chunks(t0, t1)), self.columns)
+
+    def count(self, t0=-np.inf, t1=np.inf):
+        total = 0
+        for seg in self.overlapping(t0, t1):
+            i0, i1 = seg.search(t0, t1)
+            total += i1 - i0
+        return total
+
+
+class _Rollup:
+    """One rollup level: the stored closed buckets and the open ones in memory."""
+
+    def __init__(self, width, series):
+        self.width = width
+        self.series = series
+        self.pending = _empty(ROLLUP_COLUMNS)
+
+    def add(self, rows, now):
+        """Fold finer rows in; buckets that ended by ``now`` are written and returned."""
+        merged = _combine(_concat([self.pending, rows], ROLLUP_COLUMNS), self.width)
+        closed = merged["t"] + self.width <= now
+        done = _take(merged, closed)
+        self.pending = _take(merged, ~closed)
+        if len(done["t"]):
+            self.series.append(done)
+        return done
+
+
+# -----------------------------
+# Store
+# -----------------------------
+class ReadingStore:
+    """Readings (t, channel, A, C, model version) under one directory, see the module docstring."""
+
+    def __init__(self, path, readonly=False, segment_records=RAW_SEGMENT_RECORDS):
+        self.path = path
+        self.readonly = readonly
+        if readonly and not os.path.isdir(path):
+            raise FileNotFoundError(f"нет хранилища {path}")
+        self._lock = threading.Lock()
+        self.raw = _Series(os.path.join(path, "raw"), RAW_COLUMNS, segment_records, readonly)
+        self.rollups = [_Rollup(w, _Series(os.path.join(path, f"r{w}"), ROLLUP_COLUMNS,
+                                           ROLLUP_SEGMENT_RECORDS, readonly))
+                        for w in ROLLUP_WIDTHS]
+        self._t_last = self.raw.t_last if self.raw.t_last is not None else -np.inf
+        self._models = self._read_models()
+        self._last_model = (None, 0)
+        self._rebuild_open_buckets()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        with self._lock:
+            self.raw.close()
+            for level in self.rollups:
+                level.series.close()
+
+    def _rebuild_open_buckets(self):
+        """Refill the open buckets of every level from the next finer one (raw for 1 s)."""
+        # a readonly store must not write, so nothing is closed: all stays open
+        now = -np.inf if self.readonly else self._t_last
+        finer = self.raw
+        for level in self.rollups:
+            last = level.series.t_last
+            start = -np.inf if last is None else last + level.width
+            for chunk in finer.chunks(start):
+                level.add(_raw_rows(chunk) if finer is self.raw else chunk, now)
+            finer = level.series
+
+    # ---------- model versions ----------
+    def _read_models(self):
+        path = os.path.join(self.path, MODELS_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)["versions"]
+
+    def _write_models(self):
+        path = os.path.join(self.path, MODELS_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"versions": self._models}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def model_version(self, model):
+        """Version id recorded with readings converted by ``model`` (registered on
+        first use, keyed by its equation); 0 = no valid model."""
+        last, version = self._last_model
+        if model is last:
+            return version
+        if model is None or not model.is_valid:
+            version = 0
+        else:
+            equation = model.describe()
+            with self._lock:
+                for entry in self._models:
+                    if entry["equation"] == equation:
+                        version = entry["id"]
+                        break
+                else:
+                    if self.readonly:
+                        raise PermissionError("хранилище открыто только для чтения")
+                    version = len(self._models) + 1
+                    self._models.append({"id": version, "family": model.family, "equation": equation,
+                                         "registered": datetime.datetime.now().isoformat(timespec='seconds')})
+                    self._write_models()
+        self._last_model = (model, version)
+        return version
+
+    def models(self):
+        """[{"id", "family", "equation", "registered"}] of every model version."""
+        return list(self._models)
+
+    # ---------- writing ----------
+    @traced("store.append")
+    def append(self, t, channel, a, c, version=0):
+        """Append readings: arrays a, c (t, channel and version may be scalars for the batch).
+
+        Timestamps earlier than the last stored one (clock steps) are stored
+        at the last time, which keeps the time index sorted.
+        """
+        if self.readonly:
+            raise PermissionError("хранилище открыто только для чтения")
+        a = np.atleast_1d(np.asarray(a, dtype=np.float64))
+        n = len(a)
+        if n == 0:
+            return
+        with self._lock:
+            t = np.broadcast_to(np.asarray(t, dtype=np.float64), (n,))
+            t = np.maximum.accumulate(np.maximum(t, self._t_last))
+            cols = {"t": t,
+                    "channel": np.broadcast_to(np.asarray(channel, dtype=np.uint32), (n,)),
+                    "version": np.broadcast_to(np.asarray(version, dtype=np.uint32), (n,)),
+                    "a": a,
+                    "c": np.broadcast_to(np.asarray(c, dtype=np.float64), (n,))}
+            self.raw.append(cols)
+            self._t_last = float(t[-1])
+            rows = _raw_rows(cols)
+            for level in self.rollups:
+                rows = level.add(rows, self._t_last)
+
+    # ---------- reading ----------
+    @property
+    def time_range(self):
+        """(first, last) timestamp, or None when empty."""
+        if not len(self.raw.segments):
+            return None
+        return self.raw.t_first, self.raw.t_last
+
+    def __len__(self):
+        return len(self.raw)
+
+    @traced("store.query")
+    def query(self, t0=-np.inf, t1=np.inf, channel=None):
+        """Raw records with t0 <= t < t1 (of one channel, or all): {t, channel, version, a, c}."""
+        return _concat(list(self.iter_query(t0, t1, channel)), RAW_COLUMNS)
+
+    def iter_query(self, t0=-np.inf, t1=np.inf, channel=None):
+        """Like query(), one chunk per segment (for exports larger than memory)."""
+        with self._lock:
+            segments = self.raw.overlapping(t0, t1)
+        for seg in segments:
+            # the lock is held per chunk only, so a long export does not stall the writer
+            with self._lock:
+                i0, i1 = seg.search(t0, t1)
+                chunk = seg.read(i0, i1) if i1 > i0 else None
+            if chunk is None:
+                continue
+            yield chunk if channel is None else _take(chunk, chunk["channel"] == channel)
+
+    def rollup(self, width, t0=-np.inf, t1=np.inf, channel=None):
+        """Rollup rows of ``width`` seconds overlapping [t0, t1), including the open buckets."""
+        index = ROLLUP_WIDTHS.index(width)
+        start = np.floor(t0 / width) * width if np.isfinite(t0) else t0
+        with self._lock:
+            stored = self.rollups[index].series.read(start, t1)
+            # open buckets of this and the finer levels, merged at this width
+            live = _combine(_concat([level.pending for level in self.rollups[:index + 1]], ROLLUP_COLUMNS), width)
+        live = _take(live, (live["t"] >= start) & (live["t"] < t1))
+        rows = _concat([stored, live], ROLLUP_COLUMNS)
+        if channel is not None:
+            rows = _take(rows, rows["channel"] == channel)
+        return rows
+
+    @traced("store.overview")
+    def overview(self, t0=-np.inf, t1=np.inf, channel=None, max_points=OVERVIEW_POINTS):
+        """Rows to plot [t0, t1) with at most about max_points per channel.
+
+        Returns (width, rows): width 0 means raw records (as one-record rows),
+        otherwise the rollup level used. rows has the rollup columns plus
+        a_mean and c_mean (NaN where a bucket has no valid C).
+        """
+        span = self.time_range
+        if span is None:
+            return 0, _mean_columns(_empty(ROLLUP_COLUMNS))
+        lo, hi = max(t0, span[0]), min(t1, span[1] + 1e-9)
+        with self._lock:
+            raw_count = self.raw.count(t0, t1)
+        if raw_count <= max_points:
+            return 0, _mean_columns(_raw_rows(self.query(t0, t1, channel)))
+        width = ROLLUP_WIDTHS[-1]
+        for w in ROLLUP_WIDTHS:
+            if (hi - lo) / w <= max_points:
+                width = w
+                break
+        return width, _mean_columns(self.rollup(width, t0, t1, channel))
+
+    def channels(self):
+        """Channels that have readings (from the daily rollup, so cheap)."""
+        rows = self.rollup(ROLLUP_WIDTHS[-1])
+        return [int(ch) for ch in np.unique(rows["channel"])]
+
+    def info(self):
+        span = self.time_range
+        return {
+            "path": self.path,
+            "records": len(self),
+            "from": span[0] if span else None,
+            "to": span[1] if span else None,
+            "channels": self.channels(),
+            "segments": len(self.raw.segments),
+            "bytes": self.raw.nbytes() + sum(level.series.nbytes() for level in self.rollups),
+            "rollups": {w: len(level.series) for w, level in zip(ROLLUP_WIDTHS, self.rollups)},
+            "models": len(self._models),
+        }
+
+
+def _mean_columns(rows):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rows["a_mean"] = rows["a_sum"] / rows["count"]
+        rows["c_mean"] = np.where(rows["c_count"] > 0, rows["c_sum"] / rows["c_count"], np.nan)
+    return rows
+
+
+# -----------------------------
+# Command line
+# -----------------------------
+def parse_time(text):
+    """Epoch seconds or an ISO date/time (local time)."""
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.datetime.fromisoformat(text).timestamp()
+
+
+def _iso(t):
+    return datetime.datetime.fromtimestamp(t).isoformat(timespec='milliseconds')
+
+
+def export_csv(store, out, t0=-np.inf, t1=np.inf, channel=None, width=None, max_points=OVERVIEW_POINTS):
+    """Write raw records (width None), one rollup level, or an overview ("auto") as CSV."""
+    writer = csv.writer(out)
+    if width == "auto":
+        width, rows = store.overview(t0, t1, channel, max_points)
+        chunks = [rows]
+    elif width:
+        chunks = [_mean_columns(store.rollup(width, t0, t1, channel))]
+    else:
+        writer.writerow(["time", "t", "channel", "version", "A", "C"])
+        n = 0
+        for chunk in store.iter_query(t0, t1, channel):
+            for t, ch, v, a, c in zip(chunk["t"], chunk["channel"], chunk["version"], chunk["a"], chunk["c"]):
+                writer.writerow([_iso(t), repr(float(t)), int(ch), int(v), repr(float(a)), repr(float(c))])
+            n += len(chunk["t"])
+        return n
+    writer.writerow(["time", "t", "channel", "width", "count",
+                     "A_min", "A_mean", "A_max", "C_min", "C_mean", "C_max"])
+    n = 0
+    for rows in chunks:
+        for i in range(len(rows["t"])):
+            writer.writerow([_iso(rows["t"][i]), repr(float(rows["t"][i])), int(rows["channel"][i]), width,
+                             int(rows["count"][i])]
+                            + [repr(float(rows[k][i])) for k in ("a_min", "a_mean", "a_max",
+                                                                 "c_min", "c_mean", "c_max")])
+        n += len(rows["t"])
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py readings", description="Stored readings and results")
+    parser.add_argument("store", help="store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="size, time range, channels, model versions")
+    exp = sub.add_parser("export", help="a time window as CSV")
+    exp.add_argument("output", help="output CSV ('-' for stdout)")
+    exp.add_argument("--from", dest="t0", help="start (epoch seconds or ISO date/time)")
+    exp.add_argument("--to", dest="t1", help="end, exclusive")
+    exp.add_argument("--channel", type=int)
+    exp.add_argument("--level", default="raw",
+                     help="raw, auto (overview of about --max-points rows) or a rollup width in seconds "
+                          f"({', '.join(map(str, ROLLUP_WIDTHS))})")
+    exp.add_argument("--max-points", type=int, default=OVERVIEW_POINTS)
+    args = parser.parse_args(argv)
+
+    with ReadingStore(args.store, readonly=True) as store:
+        if args.command == "info":
+            info = store.info()
+            for key in ("from", "to"):
+                if info[key] is not None:
+                    info[key] = _iso(info[key])
+            info["model_versions"] = store.models()
+            json.dump(info, sys.stdout, indent=2, ensure_ascii=False)
+            sys.stdout.write("\n")
+            return 0
+        if args.level == "raw":
+            width = None
+        elif args.level == "auto":
+            width = "auto"
+        else:
+            width = int(args.level)
+            if width not in ROLLUP_WIDTHS:
+                parser.error(f"--level: нет уровня {width} с")
+        t0 = parse_time(args.t0)
+        t1 = parse_time(args.t1)
+        t0 = -np.inf if t0 is None else t0
+        t1 = np.inf if t1 is None else t1
+        if args.output == '-':
+            n = export_csv(store, sys.stdout, t0, t1, args.channel, width, args.max_points)
+        else:
+            with open(args.output, 'w', newline='', encoding='utf-8') as f:
+                n = export_csv(store, f, t0, t1, args.channel, width, args.max_points)
+        sys.stderr.write(f"{n} rows\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# tracing.py
+"""Switchable instrumentation: spans, per-span histograms, Chrome trace export.
+
+    @traced("fit.columns")           # decorator
+    def fit_columns(...): ...
+
+    with span("canvas.draw"):        # context span
+        canvas.draw()
+
+Tracing is off unless enable() is called (or CALIB_TRACE=1 is set in the
+environment). Off, a decorated call costs one global flag check and span()
+returns a shared no-op object, so the instrumentation can stay on the hot
+paths. On, every span records
+
+- an event (name, start, duration, thread, depth) in a bounded ring of the
+  last MAX_EVENTS spans, exported as a Chrome trace (chrome://tracing,
+  Perfetto) by export_chrome();
+- a histogram of its durations in power-of-two microsecond buckets, with
+  count/total/max, summarised by stats() / export_json();
+- the breakdown of the last finished top-level span of at least
+  FRAME_MIN_US (a "frame": one UI handler with everything it called), for
+  the in-app overlay.
+
+Qt-free; the overlay lives in app.py.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+MAX_EVENTS = 200_000
+N_BUCKETS = 40  # bucket i holds durations in [2^(i-1), 2^i) µs
+FRAME_MAX = 500  # spans kept per frame breakdown
+FRAME_MIN_US = 1000  # shorter top-level spans (timer ticks) do not replace the last frame
+
+_enabled = os.environ.get("CALIB_TRACE", "") not in ("", "0")
+_lock = threading.Lock()
+_local = threading.local()
+_events = deque(maxlen=MAX_EVENTS)
+_hist = {}        # name -> [count, total_us, max_us, buckets]
+_last_frame = []  # [(name, depth, dur_us)] of the last top-level span
+_t0 = time.perf_counter()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget all recorded events and histograms."""
+    global _last_frame
+    with _lock:
+        _events.clear()
+        _hist.clear()
+        _last_frame = []
+
+
+# -----------------------------
+# Spans
+# -----------------------------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start", "depth", "children")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        self.children = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        _local.stack.pop()
+        _record(self, end)
+        return False
+
+
+def span(name):
+    """Context manager timing the enclosed block under ``name`` (no-op when off)."""
+    return _Span(name) if _enabled else _NULL
+
+
+def traced(name=None):
+    """Decorator: time every call of the function as a span."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _record(s, end):
+    global _last_frame
+    dur_us = (end - s.start) * 1e6
+    bucket = min(max(int(dur_us), 0).bit_length(), N_BUCKETS - 1)
+    frame = [(s.name, s.depth, dur_us)] + s.children
+    with _lock:
+        _events.append((s.name, (s.start - _t0) * 1e6, dur_us, threading.get_ident(), s.depth))
+        h = _hist.get(s.name)
+        if h is None:
+            h = _hist[s.name] = [0, 0.0, 0.0, [0] * N_BUCKETS]
+        h[0] += 1
+        h[1] += dur_us
+        h[2] = max(h[2], dur_us)
+        h[3][bucket] += 1
+        if s.depth == 0 and dur_us >= FRAME_MIN_US:
+            _last_frame = frame
+    if s.depth:
+        # children in call order under the parent
+        children = _local.stack[-1].children
+        if len(children) < FRAME_MAX:
+            children.extend(frame[:FRAME_MAX - len(children)])
+
+
+# -----------------------------
+# Results
+# -----------------------------
+def _quantile(buckets, count, q):
+    """Upper bound (µs) of the bucket holding quantile q."""
+    target = q * count
+    seen = 0
+    for i, c in enumerate(buckets):
+        seen += c
+        if seen >= target and c:
+            return float(1 << i)
+    return 0.0
+
+
+def stats():
+    """{name: {count, total_ms, mean_ms, max_ms, p50_ms, p90_ms, p99_ms, buckets}};
+    quantiles are bucket upper bounds (within a factor of two)."""
+    with _lock:
+        items = [(name, h[0], h[1], h[2], list(h[3])) for name, h in _hist.items()]
+    out = {}
+    for name, count, total, mx, buckets in items:
+        out[name] = {
+            "count": count,
+            "total_ms": total / 1e3,
+            "mean_ms": total / count / 1e3,
+            "max_ms": mx / 1e3,
+            "p50_ms": _quantile(buckets, count, 0.5) / 1e3,
+            "p90_ms": _quantile(buckets, count, 0.9) / 1e3,
+            "p99_ms": _quantile(buckets, count, 0.99) / 1e3,
+            "buckets": buckets,
+        }
+    return out
+
+
+def last_frame():
+    """[(name, depth, duration µs)] of the last finished top-level span, in call order."""
+    return list(_last_frame)
+
+
+def chrome_trace():
+    """The recorded events as a Chrome trace object ("X" complete events)."""
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    return {"traceEvents": [
+        {"name": name, "ph": "X", "ts": round(ts, 3), "dur": round(dur, 3), "pid": pid, "tid": tid,
+         "args": {"depth": depth}}
+        for name, ts, dur, tid, depth in events
+    ], "displayTimeUnit": "ms"}
+
+
+def export_chrome(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(), f)
+
+
+def export_json(path):
+    """Histograms and summaries of every span name."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"bucket_edges_us": [0] + [1 << i for i in range(N_BUCKETS)], "spans": stats()},
+                  f, indent=2, ensure_ascii=False)
+
+
+def format_frame(frame=None, limit=20):
+    """Text breakdown of a frame for the overlay: one indented line per span."""
+    frame = last_frame() if frame is None else frame
+    return "\n".join(f"{'  ' * depth + name:<36}{dur / 1e3:9.2f} ms" for name, depth, dur in frame[:limit])
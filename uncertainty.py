@@ -0,0 +1,180 @@
+# uncertainty.py
+"""Confidence intervals for the calibration A = k·log10(C) + b.
+
+Analytic intervals use the textbook OLS standard errors with Student's t;
+the inverse prediction C(A0) uses the classical calibration formula
+(delta method, including the noise of the new reading). Bootstrap intervals
+resample the (A, C) pairs: all resamples are drawn as one (B, n) index matrix
+and fitted with a single closed-form least-squares pass over the rows, in
+memory-bounded batches and optionally sharded over a process pool.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+DEFAULT_LEVEL = 0.95
+DEFAULT_N_BOOT = 2000
+# max elements of one (batch, n) resample matrix (~8 MB of indices)
+BATCH_ELEMENTS = 1_000_000
+
+
+def _xy(A, C):
+    A = np.asarray(A, dtype=float).ravel()
+    C = np.asarray(C, dtype=float).ravel()
+    mask = (C > 0) & np.isfinite(A) & np.isfinite(C)
+    return np.log10(C[mask]), A[mask]
+
+
+# -----------------------------
+# Student's t quantile (no scipy dependency)
+# -----------------------------
+def t_cdf(t, df):
+    """CDF of Student's t for integer df (Abramowitz & Stegun 26.7.3/26.7.4)."""
+    df = int(df)
+    if df > 300:
+        return NormalDist().cdf(t)
+    theta = math.atan2(abs(t), math.sqrt(df))
+    s, c = math.sin(theta), math.cos(theta)
+    c2 = c * c
+    if df % 2 == 1:
+        term, total = c, c if df > 1 else 0.0
+        for i in range(3, df, 2):
+            term *= c2 * (i - 1) / i
+            total += term
+        a = 2.0 / math.pi * (theta + s * total)
+    else:
+        term, total = 1.0, 1.0
+        for i in range(2, df, 2):
+            term *= c2 * (i - 1) / i
+            total += term
+        a = s * total
+    p = 0.5 + 0.5 * a
+    return p if t >= 0 else 1.0 - p
+
+
+def t_ppf(p, df):
+    """Quantile of Student's t (bisection on t_cdf; df >= 1)."""
+    if df > 300:
+        return NormalDist().inv_cdf(p)
+    lo, hi = -1e3, 1e3
+    for _ in range(100):
+        mid = 0.5 * (lo + hi)
+        if t_cdf(mid, df) < p:
+            lo = mid
+        else:
+            hi = mid
+    return 0.5 * (lo + hi)
+
+
+# -----------------------------
+# Analytic intervals
+# -----------------------------
+def analytic_intervals(A, C, level=DEFAULT_LEVEL, A0=None):
+    """OLS intervals. Returns {"k": (lo, hi), "b": (lo, hi), "C": (lo, hi) or None},
+    or None with fewer than 3 usable points."""
+    x, y = _xy(A, C)
+    n = len(x)
+    if n < 3:
+        return None
+    mx, my = x.mean(), y.mean()
+    sxx = float(((x - mx) ** 2).sum())
+    if sxx <= 0:
+        return None
+    k = float(((x - mx) * (y - my)).sum()) / sxx
+    b = my - k * mx
+    s2 = float(((y - (k * x + b)) ** 2).sum()) / (n - 2)
+    t = t_ppf(0.5 + level / 2, n - 2)
+    se_k = math.sqrt(s2 / sxx)
+    se_b = math.sqrt(s2 * (1.0 / n + mx * mx / sxx))
+    out = {"k": (k - t * se_k, k + t * se_k), "b": (b - t * se_b, b + t * se_b), "C": None}
+    if A0 is not None and k != 0:
+        x0 = (A0 - b) / k
+        se_x0 = math.sqrt(s2) / abs(k) * math.sqrt(1.0 + 1.0 / n + (x0 - mx) ** 2 / sxx)
+        out["C"] = (10 ** (x0 - t * se_x0), 10 ** (x0 + t * se_x0))
+    return out
+
+
+# -----------------------------
+# Bootstrap
+# -----------------------------
+def _fit_rows(X, Y):
+    """Closed-form slope/intercept of every row of (B, n) matrices at once."""
+    mx = X.mean(axis=1, keepdims=True)
+    my = Y.mean(axis=1, keepdims=True)
+    dx = X - mx
+    sxx = np.einsum('ij,ij->i', dx, dx)
+    sxy = np.einsum('ij,ij->i', dx, Y - my)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(sxx > 0, sxy / sxx, np.nan)
+    b = my[:, 0] - k * mx[:, 0]
+    return k, b
+
+
+def bootstrap_coefficients(x, y, n_boot=DEFAULT_N_BOOT, seed=None):
+    """k and b of n_boot pair resamples (arrays of length n_boot, NaN if degenerate)."""
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    batch = max(1, min(n_boot, BATCH_ELEMENTS // max(n, 1)))
+    ks, bs = [], []
+    done = 0
+    while done < n_boot:
+        m = min(batch, n_boot - done)
+        idx = rng.integers(0, n, size=(m, n))
+        k, b = _fit_rows(x[idx], y[idx])
+        ks.append(k)
+        bs.append(b)
+        done += m
+    return np.concatenate(ks), np.concatenate(bs)
+
+
+def _shard(args):
+    x, y, n_boot, seed = args
+    return bootstrap_coefficients(x, y, n_boot, seed)
+
+
+def bootstrap_intervals(A, C, level=DEFAULT_LEVEL, A0=None, n_boot=DEFAULT_N_BOOT, seed=None, workers=1):
+    """Percentile bootstrap intervals, same keys as analytic_intervals().
+
+    For C(A0) each resample also adds one resampled residual to A0, so the
+    interval covers the noise of the new reading like the analytic one.
+    With workers > 1 the resamples are split into shards over a process pool
+    (independent streams from one SeedSequence).
+    """
+    x, y = _xy(A, C)
+    n = len(x)
+    if n < 3:
+        return None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seq = np.random.SeedSequence(seed)
+    if workers > 1 and n_boot >= 2 * workers:
+        sizes = [n_boot // workers + (i < n_boot % workers) for i in range(workers)]
+        jobs = [(x, y, m, s) for m, s in zip(sizes, seq.spawn(workers))]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_shard, jobs))
+        k_b = np.concatenate([p[0] for p in parts])
+        b_b = np.concatenate([p[1] for p in parts])
+    else:
+        k_b, b_b = bootstrap_coefficients(x, y, n_boot, seq)
+    ok = np.isfinite(k_b)
+    k_b, b_b = k_b[ok], b_b[ok]
+    if not len(k_b):
+        return None
+    q = [50 * (1 - level), 50 * (1 + level)]
+    out = {"k": tuple(np.percentile(k_b, q)), "b": tuple(np.percentile(b_b, q)), "C": None}
+    if A0 is not None:
+        mx, my = x.mean(), y.mean()
+        dx = x - mx
+        k = float(dx @ (y - my)) / float(dx @ dx)
+        resid = (y - (k * x + my - k * mx)) * math.sqrt(n / (n - 2))
+        rng = np.random.default_rng(seq.spawn(1)[0])
+        a0 = A0 + rng.choice(resid, size=len(k_b))
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            c_b = 10 ** ((a0 - b_b) / k_b)
+        c_b = c_b[np.isfinite(c_b) & (k_b != 0)]
+        if len(c_b):
+            out["C"] = tuple(np.percentile(c_b, q))
+    return out
@@ -0,0 +1,198 @@
+# unmixing.py
+"""Multi-analyte unmixing: all concentrations from one multi-channel reading.
+
+Every symbol column of the table is one sensor channel with its own
+calibration curve. Cross-sensitivity follows the Nikolsky–Eisenman form
+
+    A_i = f_i(log10(Σ_j S_ij · c_j))
+
+where f_i is channel i's fitted curve (the table's method and family) and S
+is the selectivity matrix (channels × analytes, identity when the channels
+are perfectly selective). Inverting f_i gives the apparent concentration
+y_i = f_i⁻¹(A_i), so a reading becomes the linear system S·c = y, solved by
+least squares with c >= 0.
+
+The system is factorized once per table version and selectivity: the
+Cholesky factor of SᵀS gives the pseudo-inverse (SᵀS)⁻¹Sᵀ, so millions of
+readings are one matrix product; only rows with negative components go on
+to a vectorized projected coordinate descent for the non-negative solution.
+
+    python app.py unmix CALIBRATION INPUT OUTPUT [--water] [--selectivity S.csv]
+"""
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from calib_format import load_table
+from csv_loader import LoadCancelled
+from jobs import run_cli
+from tracing import traced
+
+DEFAULT_CHUNK_ROWS = 200_000
+NNLS_MAX_SWEEPS = 500
+NNLS_TOL = 1e-12
+
+
+class Unmixer:
+    """Solver for one table condition; reuse it for many batches of readings."""
+
+    def __init__(self, table, with_water, selectivity=None, analytes=None):
+        self.table = table
+        self.with_water = bool(with_water)
+        self.channels = list(table.symbols)
+        if selectivity is None:
+            selectivity = np.eye(len(self.channels))
+        S = np.asarray(selectivity, dtype=float)
+        if S.ndim != 2 or S.shape[0] != len(self.channels):
+            raise ValueError(f"матрица селективности должна иметь {len(self.channels)} строк (по каналам)")
+        self.S = S
+        self.analytes = list(analytes) if analytes is not None else (
+            self.channels if S.shape[1] == len(self.channels) else [f"c{j + 1}" for j in range(S.shape[1])])
+        self._digest = hashlib.sha1(np.ascontiguousarray(S).tobytes()).hexdigest()
+
+    def _system(self):
+        """Channel models and the factorized normal equations, cached per table version."""
+        key = ("unmix", self.with_water, self.table.method, self.table.family, self._digest)
+        return self.table.cached(key, self._factorize)
+
+    def _factorize(self):
+        S = self.S
+        G = S.T @ S
+        try:
+            L = np.linalg.cholesky(G)
+        except np.linalg.LinAlgError:
+            raise ValueError("матрица селективности вырождена: не все аналиты различимы по каналам") from None
+        Linv = np.linalg.inv(L)
+        pinv = Linv.T @ Linv @ S.T
+        models = [self.table.model(s, self.with_water) for s in self.channels]
+        return {"G": G, "pinv": pinv, "models": models}
+
+    def apparent(self, A):
+        """Per-channel apparent concentrations y = f_i⁻¹(A_i), shape (N, channels)."""
+        A = np.atleast_2d(np.asarray(A, dtype=float))
+        models = self._system()["models"]
+        Y = np.full(A.shape, np.nan)
+        for i, model in enumerate(models):
+            if model.is_valid:
+                Y[:, i] = model.predict_C(A[:, i])
+        return Y
+
+    @traced("unmix.solve")
+    def solve(self, A, nonneg=True):
+        """Concentration vectors (N, analytes) for readings A (N, channels).
+
+        Rows with a channel that cannot be inverted come out as NaN.
+        """
+        system = self._system()
+        Y = self.apparent(A)
+        bad = ~np.isfinite(Y).all(axis=1)
+        Y[bad] = 0.0
+        C = Y @ system["pinv"].T
+        if nonneg:
+            neg = np.flatnonzero((C < 0).any(axis=1))
+            if len(neg):
+                C[neg] = _nnls_rows(system["G"], Y[neg] @ self.S, np.maximum(C[neg], 0.0))
+        C[bad] = np.nan
+        return C
+
+
+def _nnls_rows(G, H, C):
+    """min ½cᵀGc - hᵀc, c >= 0 for every row of H at once (projected coordinate descent)."""
+    diag = np.diag(G)
+    for _ in range(NNLS_MAX_SWEEPS):
+        moved = np.zeros(len(C))
+        for j in range(G.shape[0]):
+            old = C[:, j].copy()
+            C[:, j] = np.maximum(0.0, old + (H[:, j] - C @ G[:, j]) / diag[j])
+            moved = np.maximum(moved, np.abs(C[:, j] - old))
+        if moved.max(initial=0.0) <= NNLS_TOL * max(1.0, np.abs(C).max(initial=0.0)):
+            break
+    return C
+
+
+def load_selectivity(path, channels):
+    """Selectivity CSV: header ``channel,<analyte>...``, one row per channel symbol.
+
+    Channels missing from the file are perfectly selective for the analyte of
+    the same name (or have no cross-sensitivity at all).
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(path, index_col=0)
+    frame.index = [str(s).strip() for s in frame.index]
+    frame.columns = [str(s).strip() for s in frame.columns]
+    unknown = [s for s in frame.index if s not in channels]
+    if unknown:
+        raise ValueError("неизвестные каналы в матрице селективности: " + ", ".join(unknown))
+    analytes = list(frame.columns)
+    S = np.zeros((len(channels), len(analytes)))
+    for i, ch in enumerate(channels):
+        if ch in frame.index:
+            S[i] = frame.loc[ch].to_numpy(dtype=float)
+        elif ch in analytes:
+            S[i, analytes.index(ch)] = 1.0
+    return S, analytes
+
+
+def unmix_file(unmixer, src, dst, chunk_rows=DEFAULT_CHUNK_ROWS, sep=',', progress=None, cancel=None):
+    """Stream a CSV of readings (one column per channel symbol) to a CSV of
+    concentrations (one C_<analyte> column per analyte); returns the row count."""
+    import pandas as pd
+
+    total = os.path.getsize(src) or 1
+    rows = 0
+    out = sys.stdout if dst == '-' else open(dst, 'w', encoding='utf-8', newline='')
+    try:
+        with open(src, 'rb') as fh:
+            reader = pd.read_csv(fh, sep=sep, chunksize=chunk_rows, engine='c')
+            for i, frame in enumerate(reader):
+                if cancel is not None and cancel():
+                    raise LoadCancelled()
+                missing = [s for s in unmixer.channels if s not in frame.columns]
+                if missing:
+                    raise ValueError("в файле нет каналов: " + ", ".join(missing))
+                A = frame[unmixer.channels].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+                C = unmixer.solve(A)
+                pd.DataFrame(C, columns=["C_" + a for a in unmixer.analytes]).to_csv(out, header=(i == 0), index=False)
+                rows += len(frame)
+                if progress is not None:
+                    progress(min(fh.tell() / total, 1.0))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py unmix", description="Multi-channel readings → all concentrations")
+    parser.add_argument("calibration", help="calibration library (.json or .scal)")
+    parser.add_argument("input", help="CSV with one A column per channel symbol")
+    parser.add_argument("output", help="output CSV ('-' for stdout)")
+    parser.add_argument("--water", action="store_true", help="use the with-water calibration")
+    parser.add_argument("--selectivity", help="CSV selectivity matrix (rows: channels, columns: analytes)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--sep", default=",", help="input delimiter (default ',')")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress on stderr")
+    args = parser.parse_args(argv)
+
+    table = load_table(args.calibration)
+    S = analytes = None
+    if args.selectivity:
+        S, analytes = load_selectivity(args.selectivity, table.symbols)
+    unmixer = Unmixer(table, args.water, S, analytes)
+    try:
+        rows = run_cli(unmix_file, unmixer, args.input, args.output, chunk_rows=args.chunk_rows, sep=args.sep,
+                       quiet=args.quiet)
+    except LoadCancelled:
+        sys.stderr.write("cancelled\n")
+        return 130
+    if not args.quiet:
+        sys.stderr.write(f"{rows} rows\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# validation.py
+"""Cross-validation of calibration curves: leave-one-out and k-fold.
+
+For the least-squares log-linear model LOO needs no refits: the LOO residual
+of point i is e_i / (1 - h_i) with the leverage h_i = 1/n + (x_i - x̄)²/Sxx,
+so the whole (C × symbols) matrix is validated in one vectorized pass.
+Robust methods and nonlinear families are validated by refitting: every
+fold is one masked batch fit over all columns.
+
+Summary per column: rmse (out-of-sample), q2 = 1 - PRESS / Σ(y - ȳ)², and
+max_abs (largest out-of-sample residual).
+"""
+import numpy as np
+
+from calibration import fit_columns
+from models import FAMILY_LINEAR, evaluate, select_models
+from robust import METHOD_OLS
+from tracing import traced
+
+DEFAULT_FOLDS = 5
+
+
+def _prepare(x, Y, mask):
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    x = np.asarray(x, dtype=float)
+    X = np.broadcast_to(x[:, None] if x.ndim == 1 else x, Y.shape)
+    W = np.isfinite(X) & np.isfinite(Y)
+    if mask is not None:
+        W &= np.broadcast_to(mask if np.ndim(mask) == 2 else np.asarray(mask)[:, None], Y.shape)
+    return X, Y, W
+
+
+def summarize(residuals, Y, W):
+    """rmse, q2, max_abs and n of out-of-sample residuals (n, m)."""
+    ok = W & np.isfinite(residuals)
+    n = ok.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        e2 = np.where(ok, residuals * residuals, 0.0)
+        press = e2.sum(axis=0)
+        my = np.where(ok, Y, 0.0).sum(axis=0) / n
+        sst = np.where(ok, (Y - my) ** 2, 0.0).sum(axis=0)
+        rmse = np.where(n > 0, np.sqrt(press / n), np.nan)
+        q2 = np.where((n > 0) & (sst > 0), 1.0 - press / sst, np.nan)
+        max_abs = np.where(n > 0, np.max(np.where(ok, np.abs(residuals), 0.0), axis=0, initial=0.0), np.nan)
+    return {"rmse": rmse, "q2": q2, "max_abs": max_abs, "n": n}
+
+
+def loo_residuals_linear(x, Y, mask=None):
+    """Closed-form LOO residuals of the least-squares line for every column, (n, m)."""
+    X, Y, W = _prepare(x, Y, mask)
+    fit = fit_columns(X, Y, mask=W)
+    n = fit["n"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mx = np.where(W, X, 0.0).sum(axis=0) / n
+        sxx = np.where(W, (X - mx) ** 2, 0.0).sum(axis=0)
+        h = 1.0 / n + (X - mx) ** 2 / sxx
+        # with only two points the line interpolates them and LOO is undefined
+        e = np.where(W & (n > 2), fit["residuals"] / (1.0 - h), np.nan)
+    return e
+
+
+def cv_residuals(x, Y, folds, mask=None, method=METHOD_OLS, family=FAMILY_LINEAR):
+    """Out-of-fold residuals (n, m) for a row → fold assignment ``folds``.
+
+    Each fold is fitted with the given method/family on the other rows, for
+    all columns at once. As in CalibrationTable.fit_curves(), the linear
+    candidate of a nonlinear/"auto" selection is fitted with ``method``.
+    """
+    X, Y, W = _prepare(x, Y, mask)
+    folds = np.asarray(folds)
+    out = np.full(Y.shape, np.nan)
+    for f in np.unique(folds):
+        test = folds == f
+        train = W & ~test[:, None]
+        if family == FAMILY_LINEAR:
+            fit = fit_columns(X, Y, mask=train, method=method)
+            with np.errstate(invalid='ignore'):
+                out[test] = Y[test] - (fit["k"] * X[test] + fit["b"])
+        else:
+            linear = None
+            if method != METHOD_OLS:
+                fit = fit_columns(X, Y, mask=train, method=method)
+                linear = (fit["k"], fit["b"])
+            chosen = select_models(X, Y, family, linear=linear, mask=train)
+            for j, (fam, params, _aic, _xr) in enumerate(chosen):
+                if np.isfinite(params).all():
+                    with np.errstate(invalid='ignore', over='ignore'):
+                        out[test, j] = Y[test, j] - evaluate(fam, params, X[test, j])
+    return np.where(W, out, np.nan)
+
+
+def fold_assignment(n, folds=DEFAULT_FOLDS, seed=0):
+    """Random balanced fold index per row (LOO when folds >= n)."""
+    folds = max(1, min(int(folds), n))
+    perm = np.random.default_rng(seed).permutation(n)
+    out = np.empty(n, dtype=np.int64)
+    out[perm] = np.arange(n) % folds
+    return out
+
+
+@traced("fit.cross_validate")
+def cross_validate(x, Y, mask=None, method=METHOD_OLS, family=FAMILY_LINEAR, folds=DEFAULT_FOLDS, seed=0):
+    """LOO and k-fold summaries for every column.
+
+    Returns {"loo": summary, "kfold": summary} (see summarize()).
+    """
+    X, Yv, W = _prepare(x, Y, mask)
+    n = Yv.shape[0]
+    if method == METHOD_OLS and family == FAMILY_LINEAR:
+        loo = loo_residuals_linear(X, Yv, W)
+    else:
+        loo = cv_residuals(X, Yv, np.arange(n), W, method, family)
+    kf = cv_residuals(X, Yv, fold_assignment(n, folds, seed), W, method, family)
+    return {"loo": summarize(loo, Yv, W), "kfold": summarize(kf, Yv, W)}
+
+
+def table_quality(table, with_water, folds=DEFAULT_FOLDS):
+    """cross_validate() of every curve of one condition with the table's
+    method and family, cached until the next edit."""
+    key = ("cv", bool(with_water), table.method, table.family, folds)
+    return table.cached(key, lambda: cross_validate(
+        table.log_c(), table.values(with_water), method=table.method, family=table.family, folds=folds))